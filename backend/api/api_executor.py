@@ -0,0 +1,224 @@
+"""
+Общий исполнитель вызовов Google Calendar API для google_sync и delete_events:
+небольшой пул потоков, квота по алгоритму token bucket и повтор ответов
+429/403/5xx с экспоненциальной задержкой и случайным разбросом (jitter).
+Квота выдаётся на проект, поэтому исполнитель один на процесс — get_executor().
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import metrics
+
+# Квота Calendar API по умолчанию — около 600 запросов в минуту на пользователя
+DEFAULT_RATE = 10.0       # запросов в секунду
+DEFAULT_BURST = 20        # сколько запросов можно отправить разом после простоя
+DEFAULT_WORKERS = 4
+MAX_RETRIES = 5
+BASE_DELAY = 0.5          # секунды, задержка перед первым повтором
+MAX_DELAY = 32.0
+RETRY_STATUSES = {403, 429, 500, 502, 503, 504}
+
+
+def http_status(exception) -> int | None:
+    """Код ответа HttpError (googleapiclient и подделки из tests.fakes) или None."""
+    resp = getattr(exception, "resp", None)
+    return getattr(resp, "status", None)
+
+
+def is_retryable(exception) -> bool:
+    return http_status(exception) in RETRY_STATUSES
+
+
+def transport_errors() -> tuple:
+    """
+    Сетевые ошибки клиента Google API без HTTP-ответа: таймаут и обрыв сокета
+    (OSError), google.auth TransportError, ошибки httplib2. Библиотеки Google —
+    необязательные зависимости, поэтому их классы добавляются, только если установлены.
+    """
+    errors = [OSError]
+    try:
+        from google.auth.exceptions import TransportError
+        errors.append(TransportError)
+    except ImportError:
+        pass
+    try:
+        from httplib2 import HttpLib2Error
+        errors.append(HttpLib2Error)
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+def _observe_call(start: float, outcome: str):
+    """Метрики одного HTTP-вызова Google API: итог (ok или код ответа) и длительность."""
+    metrics.EXTERNAL_CALLS.labels("google", outcome).inc()
+    metrics.EXTERNAL_SECONDS.labels("google").observe(time.perf_counter() - start)
+
+
+class TokenBucket:
+    """Потокобезопасное ведро токенов: rate токенов в секунду, не больше capacity."""
+
+    def __init__(self, rate: float, capacity: int, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1) -> float:
+        """
+        Забирает tokens токенов, при нехватке ждёт. Запрос больше capacity
+        (пакет из 50 операций) дожидается полного ведра и уводит баланс в минус,
+        так что следующие вызовы подождут. Возвращает время ожидания в секундах.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                need = min(tokens, self.capacity)
+                if self._tokens >= need:
+                    self._tokens -= tokens
+                    return waited
+                delay = (need - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+class PerThread:
+    """Ленивый объект на поток: factory() вызывается один раз в каждом потоке."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._local = threading.local()
+
+    def get(self):
+        obj = getattr(self._local, "obj", None)
+        if obj is None:
+            obj = self._local.obj = self._factory()
+        return obj
+
+
+class ApiExecutor:
+    """
+    Выполняет вызовы API с учётом квоты и повторами.
+    call(fn) — один вызов (fn делает ровно один HTTP-запрос, cost — сколько
+    операций квоты он расходует), map(fn, items) — параллельно на пуле,
+    run_batch(service, requests) — пакетный запрос с повтором отдельных операций.
+    Счётчики — в stats().
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST,
+                 workers: int = DEFAULT_WORKERS, max_retries: int = MAX_RETRIES,
+                 base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY,
+                 sleep=time.sleep):
+        self.bucket = TokenBucket(rate, burst, sleep=sleep)
+        self.workers = workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._pool = None
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "operations": 0, "retries": 0,
+                       "failures": 0, "throttled_s": 0.0, "backoff_s": 0.0}
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, value in deltas.items():
+                self._stats[name] += value
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def backoff(self, attempt: int) -> float:
+        """Экспоненциальная задержка с полным разбросом: случайное в [0, base * 2^attempt]."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        self._count(backoff_s=delay)
+        self._sleep(delay)
+        return delay
+
+    def call(self, fn, cost: int = 1):
+        """Выполняет fn() с ожиданием квоты; 429/403/5xx повторяются до max_retries раз."""
+        for attempt in range(self.max_retries + 1):
+            self._count(throttled_s=self.bucket.acquire(cost), requests=1, operations=cost)
+            start = time.perf_counter()
+            try:
+                result = fn()
+            except Exception as e:
+                _observe_call(start, str(http_status(e) or "error"))
+                if not is_retryable(e) or attempt == self.max_retries:
+                    self._count(failures=1)
+                    raise
+                self._count(retries=1)
+                print(f"[API] HTTP {http_status(e)}, повтор {attempt + 1}/{self.max_retries}")
+                self.backoff(attempt)
+                continue
+            _observe_call(start, "ok")
+            return result
+
+    def map(self, fn, items):
+        """fn(item) для каждого item на пуле потоков; результаты — в порядке items."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix="google-api")
+        return self._pool.map(fn, items)
+
+    def run_batch(self, service, requests: list) -> dict:
+        """
+        Выполняет [(request_id, request), ...] пакетным запросом service.
+        Операции, получившие 429/403/5xx внутри пакета, отправляются повторно
+        следующим пакетом после задержки. Возвращает {request_id: (response, exception)}.
+        """
+        results = {}
+        pending = list(requests)
+        for attempt in range(self.max_retries + 1):
+            def collect(request_id, response, exception):
+                results[request_id] = (response, exception)
+
+            def send():
+                batch = service.new_batch_http_request(callback=collect)
+                for request_id, request in pending:
+                    batch.add(request, request_id=request_id)
+                batch.execute()
+
+            self.call(send, cost=len(pending))
+            errors = {rid: results.get(rid, (None, None))[1] for rid, _ in pending}
+            retry = [] if attempt == self.max_retries else [
+                (rid, req) for rid, req in pending if is_retryable(errors[rid])
+            ]
+            self._count(failures=sum(e is not None for e in errors.values()) - len(retry))
+            if not retry:
+                return results
+            self._count(retries=len(retry))
+            print(f"[API] {len(retry)} операций пакета получили отказ по квоте, "
+                  f"повтор {attempt + 1}/{self.max_retries}")
+            pending = retry
+            self.backoff(attempt)
+        return results
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=True)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ApiExecutor:
+    """Общий на процесс исполнитель: квота одна на все модули."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ApiExecutor()
+        return _executor
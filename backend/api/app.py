@@ -0,0 +1,69 @@
+"""
+Фабрика Flask-приложения API.
+
+create_app(config) собирает приложение и регистрирует эндпоинты из
+backend.api.routes при создании. Схему БД оно не трогает, а только сверяет
+её версию: миграции выполняются один раз до запуска воркеров.
+
+    python -m backend.api.migrations && gunicorn -w 4 "backend.api.app:create_app()"
+    python -m backend.api.app --port 5000      # разработка: миграция и сервер
+
+Ключи config: DATABASE (путь к БД, по умолчанию DB_PATH / DATABASE_PATH),
+JOB_WORKERS (потоков очереди задач в процессе API; 0 — только ставить в очередь),
+EVENT_LISTENER (сброс кешей по шине событий), MIGRATE_ON_START (выполнить
+миграцию при создании — для тестов и одиночного процесса).
+
+С несколькими воркерами /metrics складывает их значения только при общем
+каталоге снимков (см. backend.metrics), очищенном перед запуском:
+
+    rm -rf /run/mai-metrics && METRICS_MULTIPROC_DIR=/run/mai-metrics gunicorn -w 4 ...
+"""
+import argparse
+
+from flask import Flask
+
+from backend.database.database import DB_PATH
+
+
+def create_app(config: dict | None = None) -> Flask:
+    from flask_cors import CORS
+    from backend.api.jobs import DEFAULT_WORKERS
+    from backend.api.migrations import SCHEMA_VERSION, migrate, schema_version
+
+    app = Flask(__name__, static_folder="static", template_folder="templates")
+    app.config.update(
+        DATABASE=str(DB_PATH),
+        JOB_WORKERS=DEFAULT_WORKERS,
+        EVENT_LISTENER=True,
+        MIGRATE_ON_START=False,
+    )
+    app.config.update(config or {})
+    CORS(app)
+
+    db_path = app.config["DATABASE"]
+    if app.config["MIGRATE_ON_START"]:
+        migrate(db_path)
+    elif schema_version(db_path) < SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Схема БД {db_path} устарела: выполните python -m backend.api.migrations --db {db_path}"
+        )
+
+    from backend.api.routes import bp
+    app.register_blueprint(bp)
+    return app
+
+
+def main():
+    p = argparse.ArgumentParser(description="API расписания (сервер разработки)")
+    p.add_argument("--db", default=str(DB_PATH))
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=5000)
+    args = p.parse_args()
+    # одиночный процесс: миграция здесь же, до приёма запросов
+    app = create_app({"DATABASE": args.db, "MIGRATE_ON_START": True})
+    # без reloader: второй процесс разработки держал бы ещё одну копию кешей и воркеров
+    app.run(host=args.host, port=args.port, debug=False, use_reloader=False, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Общая фабрика клиента Google Calendar API для google_sync и delete_events.
+
+Учётные данные читаются из service_account.json один раз на процесс, а сервис
+строится один раз на поток (httplib2 внутри googleapiclient не потокобезопасен)
+по discovery-документу, который поставляется вместе с google-api-python-client,
+без сетевого запроса и файлового кеша. Сами библиотеки Google импортируются
+при первом вызове, так что модули, которые их не используют, не платят за импорт.
+"""
+import os
+import sys
+import threading
+
+BASE_DIR               = os.path.dirname(os.path.abspath(__file__))
+SERVICE_ACCOUNT_FILE   = os.path.join(BASE_DIR, "service_account.json")
+CALENDAR_ID            = "be410167da6282a13f52aad85d4ab444e8b456ecaf5da50495e0b782b566426f@group.calendar.google.com"
+SCOPES                 = ["https://www.googleapis.com/auth/calendar"]
+
+_lock = threading.Lock()
+_credentials = None
+_generation = 0  # растёт при сбросе кеша, чтобы потоки перестроили свои сервисы
+_local = threading.local()
+
+
+def get_credentials():
+    """Учётные данные сервисного аккаунта, загружаются один раз на процесс."""
+    global _credentials
+    with _lock:
+        if _credentials is None:
+            if not os.path.exists(SERVICE_ACCOUNT_FILE):
+                print(f"Файл учетных данных не найден: {SERVICE_ACCOUNT_FILE}")
+                sys.exit(1)
+            from google.oauth2 import service_account
+            _credentials = service_account.Credentials.from_service_account_file(
+                SERVICE_ACCOUNT_FILE, scopes=SCOPES
+            )
+        return _credentials
+
+
+def get_calendar_service():
+    """Сервис Google Calendar текущего потока; строится при первом обращении потока."""
+    cached = getattr(_local, "service", None)
+    if cached is not None and cached[0] == _generation:
+        return cached[1]
+    from googleapiclient.discovery import build
+    service = build(
+        "calendar", "v3", credentials=get_credentials(),
+        static_discovery=True, cache_discovery=False,
+    )
+    _local.service = (_generation, service)
+    return service
+
+
+def reset_calendar_service():
+    """Сбрасывает кеш (например, после замены service_account.json)."""
+    global _credentials, _generation
+    with _lock:
+        _credentials = None
+        _generation += 1
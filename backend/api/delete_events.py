@@ -1,33 +1,23 @@
-import os
+import argparse
 import datetime
 import sqlite3
-import time
-
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 
 from backend.database.database import DB_PATH
+from backend.api.api_executor import PerThread, get_executor, http_status, transport_errors
+from backend.api.calendar_service import CALENDAR_ID, get_calendar_service
 
-# Ваш Calendar ID и пути
-CALENDAR_ID = 'be410167da6282a13f52aad85d4ab444e8b456ecaf5da50495e0b782b566426f@group.calendar.google.com'
-SCOPES = ['https://www.googleapis.com/auth/calendar']
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-SERVICE_ACCOUNT_FILE = os.path.join(BASE_DIR, 'service_account.json')
+BATCH_SIZE = 50  # максимум операций в одном пакетном HTTP-запросе Calendar API
 MOSCOW_TZ = datetime.timezone(datetime.timedelta(hours=3))
 
 
-def get_calendar_service():
-    creds = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-    return build("calendar", "v3", credentials=creds)
-
-
 def delete_events_in_range(start_date_str, end_date_str):
     """
     Удаляет события из Google Calendar в диапазоне дат [start_date, end_date].
     Формат дат на входе 'DD.MM.YYYY'.
     """
+    from googleapiclient.errors import HttpError
+    network_errors = transport_errors()
+
     # 1) Парсим входные даты
     try:
         sd = datetime.datetime.strptime(start_date_str, '%d.%m.%Y')
@@ -39,22 +29,22 @@ def delete_events_in_range(start_date_str, end_date_str):
     time_min = sd.replace(tzinfo=MOSCOW_TZ).isoformat()
     time_max = ed.replace(tzinfo=MOSCOW_TZ).isoformat()
 
-    service = get_calendar_service()
+    executor = get_executor()
 
     # 2) Постранично получаем все события
     page_token = None
     all_events = []
     while True:
         try:
-            resp = service.events().list(
+            resp = executor.call(get_calendar_service().events().list(
                 calendarId=CALENDAR_ID,
                 timeMin=time_min,
                 timeMax=time_max,
                 singleEvents=True,
                 orderBy='startTime',
                 pageToken=page_token
-            ).execute()
-        except HttpError as e:
+            ).execute)
+        except (HttpError, *network_errors) as e:
             print(f"Ошибка при list: {e}")
             return
 
@@ -68,43 +58,124 @@ def delete_events_in_range(start_date_str, end_date_str):
         print("Нет событий в указанном диапазоне.")
         return
 
-    # 3) Удаляем одно за другим с backoff
-    for ev in all_events:
+    # 3) Удаляем параллельно на пуле исполнителя: темп задаёт квота,
+    #    429/403/5xx повторяются с экспоненциальной задержкой
+    def delete_one(ev):
         eid = ev.get('id')
         summary = ev.get('summary', '<без названия>')
-        success = False
+        try:
+            executor.call(get_calendar_service().events().delete(
+                calendarId=CALENDAR_ID,
+                eventId=eid
+            ).execute)
+        except HttpError as e:
+            if http_status(e) in (404, 410):  # уже удалено
+                return True
+            print(f"Не удалось удалить событие ID={eid}: {e}")
+            return False
+        except network_errors as e:
+            # таймаут или обрыв соединения — неудача этого события, а не всей очистки
+            print(f"Не удалось удалить событие ID={eid}: {e!r}")
+            return False
+        print(f"Удалено: {summary} (ID={eid})")
+        return True
+
+    deleted = sum(executor.map(delete_one, all_events))
+    stats = executor.stats()
+    print(f"Удаление завершено: {deleted} из {len(all_events)}, "
+          f"повторов {stats['retries']}, ожидание квоты {stats['throttled_s']:.1f}s.")
+
+
+def _synced_events(conn: sqlite3.Connection, group: str | None, weeks) -> list[str]:
+    """id событий из calendar_sync, ограниченные группой и/или неделями."""
+    sql = "SELECT event_id FROM calendar_sync WHERE 1=1"
+    params = []
+    if group:
+        sql += " AND instr(', ' || groups || ', ', ', ' || ? || ', ') > 0"
+        params.append(group)
+    if weeks:
+        sql += f" AND week IN ({','.join('?' * len(weeks))})"
+        params.extend(weeks)
+    return [r[0] for r in conn.execute(sql, params)]
+
+
+def delete_synced_events(group: str | None = None, weeks=None, service=None, db_path=None) -> dict:
+    """
+    Удаляет из Google Calendar только созданные нами события — по таблице
+    calendar_sync, с необязательным ограничением по группе и неделям.
+    Удаление идёт пакетами по BATCH_SIZE (≈N/50 HTTP-вызовов), и после каждого
+    пакета в той же транзакции стираются строки calendar_sync и google_event_id
+    в occupied_rooms, так что следующая синхронизация создаст события заново.
+    db_path — БД с calendar_sync (по умолчанию DB_PATH).
+    Возвращает {"deleted": ..., "failed": ...}.
+    """
+    conn = sqlite3.connect(db_path or DB_PATH)
+    try:
+        event_ids = _synced_events(conn, group, weeks)
+        if not event_ids:
+            print("Нет синхронизированных событий для удаления.")
+            return {"deleted": 0, "failed": 0}
 
-        for attempt in range(1, 4):  # до 3 попыток
+        executor = get_executor()
+        services = PerThread(lambda: service) if service else PerThread(get_calendar_service)
+
+        def send(chunk):
+            svc = services.get()
             try:
-                service.events().delete(
-                    calendarId=CALENDAR_ID,
-                    eventId=eid
-                ).execute()
-                print(f"Удалено: {summary} (ID={eid})")
-                success = True
-                break
-            except HttpError as e:
-                code = e.resp.status
-                # при rate limit делаем экспоненциальную задержку
-                if code in (429, 403):
-                    wait = 2 ** (attempt - 1)
-                    print(f"Rate limit ({code}), попытка {attempt}/3. Ждём {wait}s...")
-                    time.sleep(wait)
-                    continue
+                return chunk, executor.run_batch(svc, [
+                    (eid, svc.events().delete(calendarId=CALENDAR_ID, eventId=eid))
+                    for eid in chunk
+                ]), None
+            except Exception as e:
+                return chunk, None, e
+
+        chunks = [event_ids[i:i + BATCH_SIZE] for i in range(0, len(event_ids), BATCH_SIZE)]
+        deleted = failed = 0
+        for chunk, results, error in executor.map(send, chunks):
+            if error is not None:
+                print(f"Ошибка пакетного удаления ({len(chunk)} событий): {error}")
+                failed += len(chunk)
+                continue
+            gone = []
+            for eid in chunk:
+                _, exception = results.get(eid, (None, None))
+                # 404/410 — события уже нет, состояние тоже можно чистить
+                if exception is None or http_status(exception) in (404, 410):
+                    gone.append((eid,))
                 else:
-                    print(f"Ошибка удаления {eid}: {e}")
-                    break
-
-        if not success:
-            print(f"Не удалось удалить событие ID={eid} после 3 попыток.")
-
-        # небольшой таймаут между запросами, чтобы не спамить API
-        time.sleep(0.1)
-
-    print("Удаление всех попавших в диапазон событий завершено.")
-
-
-if __name__ == '__main__':
+                    print(f"Не удалось удалить событие ID={eid}: {exception}")
+            with conn:
+                conn.executemany("DELETE FROM calendar_sync WHERE event_id = ?", gone)
+                conn.executemany(
+                    "UPDATE occupied_rooms SET google_event_id = NULL WHERE google_event_id = ?", gone
+                )
+                # водяные знаки синхронизаций больше не соответствуют календарю
+                conn.execute("DELETE FROM meta WHERE key LIKE 'calendar_sync.%'")
+            deleted += len(gone)
+            failed += len(chunk) - len(gone)
+    finally:
+        conn.close()
+
+    print(f"Удалено синхронизированных событий: {deleted}, ошибок: {failed}.")
+    return {"deleted": deleted, "failed": failed}
+
+
+def main():
+    p = argparse.ArgumentParser(description="Удаление событий из Google Calendar")
+    p.add_argument("--synced", action="store_true",
+                   help="удалить только наши события по calendar_sync (пакетами)")
+    p.add_argument("--group", help="только события этой группы (с --synced)")
+    p.add_argument("--week", type=int, action="append", help="только эти недели (с --synced)")
+    p.add_argument("--db", default=str(DB_PATH), help="путь к БД (с --synced)")
+    args = p.parse_args()
+
+    if args.synced:
+        delete_synced_events(args.group, args.week, db_path=args.db)
+        return
     sd = input("Дата начала (DD.MM.YYYY): ").strip()
     ed = input("Дата конца   (DD.MM.YYYY): ").strip()
     delete_events_in_range(sd, ed)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,293 +1,420 @@
+import base64
+import hashlib
+import json
 import os
-import sys
 import sqlite3
 import datetime
-import re
 from collections import defaultdict
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 
-from backend.database.database import DB_PATH  # единственный источник пути к БД
+from backend.database.database import DB_PATH, get_meta, set_meta  # единственный источник пути к БД
+from backend.api.api_executor import PerThread, get_executor, http_status
+from backend.api.calendar_service import CALENDAR_ID, get_calendar_service
 
 # Параметры Google Calendar API
-BASE_DIR               = os.path.dirname(os.path.abspath(__file__))
-SERVICE_ACCOUNT_FILE   = os.path.join(BASE_DIR, "service_account.json")
-CALENDAR_ID            = "be410167da6282a13f52aad85d4ab444e8b456ecaf5da50495e0b782b566426f@group.calendar.google.com"
-SCOPES                 = ["https://www.googleapis.com/auth/calendar"]
 MOSCOW_TZ              = datetime.timezone(datetime.timedelta(hours=3))
+BATCH_SIZE             = 50  # максимум операций в одном пакетном HTTP-запросе Calendar API
+# Как часто сверять calendar_sync с самим календарём: событие, удалённое в Google
+# вручную, иначе так и осталось бы «синхронизированным» по совпадающему хешу
+RECONCILE_INTERVAL     = datetime.timedelta(hours=float(os.getenv("CALENDAR_RECONCILE_HOURS", "24")))
 
 
-def get_calendar_service():
-    """Создаёт сервис Google Calendar из service_account.json."""
-    if not os.path.exists(SERVICE_ACCOUNT_FILE):
-        print(f"Файл учетных данных не найден: {SERVICE_ACCOUNT_FILE}")
-        sys.exit(1)
-    creds = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES
-    )
-    return build("calendar", "v3", credentials=creds)
-
-
-def ensure_google_event_id_column():
-    """Добавляет колонку google_event_id в occupied_rooms, если её нет."""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("PRAGMA table_info(occupied_rooms)")
-    cols = [c[1] for c in cur.fetchall()]
-    if "google_event_id" not in cols:
-        cur.execute("ALTER TABLE occupied_rooms ADD COLUMN google_event_id TEXT")
-        conn.commit()
-    conn.close()
-
-
-def parse_date_str(day_str: str) -> datetime.date | None:
+def lesson_event_id(week, date_iso: str, start_time: str, end_time: str,
+                    room: str, subject: str) -> str:
     """
-    Парсит строку вида '12 мая' или '12 мая 2025' в datetime.date.
-    Если год не указан — берёт текущий, и если дата давно в прошлом (>60 дней),
-    переключается на следующий год.
+    Детерминированный id события Google Calendar по ключу занятия.
+    Одно и то же занятие получает один и тот же id при любой пересборке
+    occupied_rooms и из синхронизации любой группы. Google допускает в id
+    только символы base32hex (0-9, a-v) длиной 5..1024 — sha1 в base32hex
+    даёт ровно 32 таких символа.
     """
-    months = {
-        "января":   1, "февраля":  2, "марта":    3, "апреля":   4,
-        "мая":      5, "июня":     6, "июля":     7, "августа":  8,
-        "сентября": 9, "октября": 10, "ноября":  11, "декабря": 12
-    }
-    match = re.search(r'(\d{1,2})\s+([а-яА-Я]+)(?:\s+(\d{4}))?', day_str)
-    if not match:
-        return None
+    raw = "|".join(str(part) for part in (week, date_iso, start_time, end_time, room, subject))
+    digest = hashlib.sha1(raw.encode("utf-8")).digest()
+    return base64.b32hexencode(digest).decode("ascii").lower().rstrip("=")
 
-    day_num   = int(match.group(1))
-    month_word= match.group(2).lower()
-    year      = int(match.group(3)) if match.group(3) else datetime.date.today().year
 
-    if month_word not in months:
-        return None
+def body_hash(body: dict) -> str:
+    """Хеш тела события: по нему синхронизация понимает, что событие не менялось."""
+    raw = json.dumps(body, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
 
-    candidate = datetime.date(year, months[month_word], day_num)
-    today     = datetime.date.today()
-    # если дата слишком давно в прошлом, переключаемся на следующий год
-    if candidate < today and (today - candidate).days > 60:
-        candidate = datetime.date(year + 1, months[month_word], day_num)
-    return candidate
+OCCUPIED_COLUMNS = """rowid, week, day, start_time, end_time,
+                   room, subject, teacher, group_name, groups, google_event_id, date"""
 
 
-def sync_group_to_calendar(group_name: str):
+def _group_events(rows) -> dict:
     """
-    Синхронизирует все записи occupied_rooms для заданной группы в Google Calendar:
-    создаёт новые события или обновляет по google_event_id.
+    Группирует строки occupied_rooms
+    (rowid, week, day, start_time, end_time, room, subject, teacher, group_name, groups,
+    google_event_id, date) в уникальные события по (week, дата, time, room, subject) — тому же ключу,
+    из которого строится lesson_event_id (он кладётся в data["event_id"]).
     """
-    print(f"[GOOGLE_SYNC] sync_group_to_calendar вызван для группы: {group_name}")
-    ensure_google_event_id_column()
-    service = get_calendar_service()
-
-    # Читаем данные из occupied_rooms (вместо PARSER_DB — единый DB_PATH)
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT rowid, week, day, start_time, end_time,
-               room, subject, teacher, group_name, google_event_id
-        FROM occupied_rooms
-        WHERE group_name = ?
-    """, (group_name,))
-    rows = cursor.fetchall()
-    # не закрываем курсор, т.к. придётся обновлять google_event_id ниже
-    # conn.close() пока отложим
-
-    # Группируем по одинаковым событиям
     events_dict = defaultdict(lambda: {
-        "rowids": [], "groups": set(), "google_event_id": None,
-        "day_str": None, "time_str": None
+        "rowids": [], "groups": set(), "teachers": set(), "google_event_id": None,
+        "week": None, "day_str": None, "time_str": None, "date": None, "event_id": None
     })
-    for (rowid, week, day_str, start_t, end_t,
-         room, subject, teacher, group_name_db, google_event_id) in rows:
+    for (rowid, week, day_str, start_t, end_t, room, subject,
+         teacher, group_name, groups, google_event_id, date_iso) in rows:
         time_str = f"{start_t} - {end_t}"
-        key = (week, day_str, time_str, room, subject, teacher)
-        events_dict[key]["rowids"].append(rowid)
-        events_dict[key]["groups"].add(group_name_db)
-        events_dict[key]["day_str"] = day_str
-        events_dict[key]["time_str"] = time_str
+        # ISO-дату проставляют пересчёт occupied_rooms и миграция; без неё событие пропускается
+        event_date = datetime.date.fromisoformat(date_iso) if date_iso else None
+        key = (week, event_date.isoformat() if event_date else day_str, time_str, room, subject)
+        data = events_dict[key]
+        data["rowids"].append(rowid)
+        data["groups"].update(g for g in (groups or group_name or "").split(", ") if g)
+        if teacher:
+            data["teachers"].add(teacher)
+        data["week"] = week
+        data["day_str"] = day_str
+        data["time_str"] = time_str
+        data["date"] = event_date
+        if event_date:
+            data["event_id"] = lesson_event_id(week, event_date.isoformat(), start_t, end_t,
+                                               room, subject)
         if google_event_id:
-            events_dict[key]["google_event_id"] = google_event_id
+            data["google_event_id"] = google_event_id
+    return events_dict
+
+
+def _event_body(key, data) -> dict | None:
+    """Тело события Google Calendar (с детерминированным id) или None, если дату/время не разобрать."""
+    week, _, time_str, room, subject = key
+    aggregated_groups = ", ".join(sorted(data["groups"]))
+    teachers = ", ".join(sorted(data["teachers"]))
+
+    # Приводим поля к строкам
+    subject = str(subject) if subject else "No Subject"
+    room    = str(room) if room else ""
+
+    event_date = data["date"]
+    if not event_date:
+        print(f"[GOOGLE_SYNC] Не распознана дата: {data['day_str']}")
+        return None
+
+    start_str, end_str = time_str.split(" - ")
+    try:
+        start_dt = datetime.datetime.combine(event_date,
+                     datetime.datetime.strptime(start_str, "%H:%M").time())
+        end_dt   = datetime.datetime.combine(event_date,
+                     datetime.datetime.strptime(end_str,   "%H:%M").time())
+    except Exception as e:
+        print(f"[GOOGLE_SYNC] Ошибка парсинга времени '{time_str}': {e}")
+        return None
+
+    return {
+        'id':          data["event_id"],
+        'status':      'confirmed',  # снимает отмену, если событие с этим id было удалено
+        'summary':     subject,
+        'location':    room,
+        'description': f"Преподаватель: {teachers}\nГруппы: {aggregated_groups}\nНеделя: {week}",
+        'start':       {'dateTime': start_dt.isoformat(), 'timeZone': 'Europe/Moscow'},
+        'end':         {'dateTime': end_dt.isoformat(),   'timeZone': 'Europe/Moscow'},
+    }
+
+
+def _synced_hashes(conn: sqlite3.Connection, event_ids: list) -> dict:
+    """{event_id: body_hash} из calendar_sync для переданных id."""
+    hashes = {}
+    for start in range(0, len(event_ids), 500):
+        chunk = event_ids[start:start + 500]
+        marks = ",".join("?" * len(chunk))
+        hashes.update(conn.execute(
+            f"SELECT event_id, body_hash FROM calendar_sync WHERE event_id IN ({marks})", chunk
+        ))
+    return hashes
+
 
-    # Обрабатываем каждое уникальное событие
+def _stale_event_ids(conn: sqlite3.Connection, state_rows: list, current_ids: set) -> list:
+    """
+    Отобранные синхронизации строки calendar_sync (event_id, week), которых нет
+    среди текущих событий. Событие удаляется, только если его занятия больше
+    нет нигде в occupied_rooms — а не просто у синхронизируемой группы.
+    """
+    candidates = [(eid, week) for eid, week in state_rows if eid not in current_ids]
+    if not candidates:
+        return []
+    weeks = sorted({week for _, week in candidates})
+    marks = ",".join("?" * len(weeks))
+    rows = conn.execute(
+        f"SELECT {OCCUPIED_COLUMNS} FROM occupied_rooms WHERE week IN ({marks})", weeks
+    ).fetchall()
+    alive = {data["event_id"] for data in _group_events(rows).values()}
+    return [eid for eid, _ in candidates if eid not in alive]
+
+
+def _live_event_ids(service, dates: list) -> set:
+    """id неотменённых событий календаря за даты [min(dates)..max(dates)] (постранично)."""
+    executor = get_executor()
+    time_min = datetime.datetime.combine(min(dates), datetime.time(), MOSCOW_TZ)
+    time_max = datetime.datetime.combine(max(dates) + datetime.timedelta(days=1), datetime.time(), MOSCOW_TZ)
+    live, page_token = set(), None
+    while True:
+        resp = executor.call(service.events().list(
+            calendarId=CALENDAR_ID,
+            timeMin=time_min.isoformat(),
+            timeMax=time_max.isoformat(),
+            showDeleted=True,
+            pageToken=page_token,
+        ).execute)
+        live.update(item["id"] for item in resp.get("items", []) if item.get("status") != "cancelled")
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            return live
+
+
+def _push_events(conn: sqlite3.Connection, services: PerThread, events_dict: dict,
+                 stale_ids=(), progress=None, verify: bool = False) -> int:
+    """
+    Приводит Google Calendar к events_dict, отправляя только изменения:
+    тело события хешируется и сравнивается с calendar_sync, совпавшие
+    пропускаются, новые создаются, изменившиеся обновляются, а stale_ids
+    (исчезнувшие занятия) удаляются. Операции идут пакетами по BATCH_SIZE
+    через общий ApiExecutor: квота, повторы 429/403/5xx и параллельная отправка.
+    verify=True — хешам не верить вслепую: совпавшие события сверяются со списком
+    календаря, и удалённые там вручную отправляются заново.
+
+    id события детерминирован (lesson_event_id), поэтому insert с нашим id,
+    получивший 409 (уже существует), повторяется как update, а update,
+    получивший 404/410 (событие удалили в календаре), — как insert. После каждого
+    пакета одной транзакцией обновляются calendar_sync и occupied_rooms.google_event_id.
+    progress(done=, failed=, total=) — необязательный счётчик прогресса.
+    Возвращает число неудавшихся операций.
+    """
+    executor = get_executor()
+    ops = []
+    failed_bodies = 0
     for key, data in events_dict.items():
-        week, day_str, time_str, room, subject, teacher = key
-        aggregated_groups = ", ".join(sorted(data["groups"]))
-        prev_event_id     = data["google_event_id"]
-        rowids            = data["rowids"]
-
-        # Приводим поля к строкам
-        subject = str(subject) if subject else "No Subject"
-        teacher = str(teacher) if teacher else ""
-        room    = str(room) if room else ""
-
-        # Разбираем дату и время
-        event_date = parse_date_str(day_str)
-        if not event_date:
-            print(f"[GOOGLE_SYNC] Не распознана дата: {day_str}")
+        event_body = _event_body(key, data)
+        if event_body is None:
+            failed_bodies += 1
             continue
+        ops.append((data, event_body, body_hash(event_body)))
 
-        start_str, end_str = time_str.split(" - ")
+    hashes = _synced_hashes(conn, [body["id"] for _, body, _ in ops])
+    live = None
+    unchanged = [data["date"] for data, body, digest in ops if hashes.get(body["id"]) == digest]
+    if verify and unchanged:
         try:
-            start_dt = datetime.datetime.combine(event_date,
-                         datetime.datetime.strptime(start_str, "%H:%M").time())
-            end_dt   = datetime.datetime.combine(event_date,
-                         datetime.datetime.strptime(end_str,   "%H:%M").time())
+            live = _live_event_ids(services.get(), unchanged)
         except Exception as e:
-            print(f"[GOOGLE_SYNC] Ошибка парсинга времени '{time_str}': {e}")
+            print(f"[GOOGLE_SYNC] Не удалось сверить события с календарём: {e}")
+            failed_bodies += len(unchanged)
+            live = set()
+    pending, id_fixes = [], []
+    for data, event_body, digest in ops:
+        event_id = event_body["id"]
+        if hashes.get(event_id) == digest and (live is None or event_id in live):
+            # Событие не менялось — только чиним ссылку, если её потеряла пересборка
+            if data["google_event_id"] != event_id:
+                id_fixes.extend((event_id, rid) for rid in data["rowids"])
             continue
-
-        # Формируем тело события
-        event_body = {
-            'summary':     subject,
-            'location':    room,
-            'description': f"Преподаватель: {teacher}\nГруппы: {aggregated_groups}\nНеделя: {week}",
-            'start':       {'dateTime': start_dt.isoformat(), 'timeZone': 'Europe/Moscow'},
-            'end':         {'dateTime': end_dt.isoformat(),   'timeZone': 'Europe/Moscow'},
-        }
-
-        # Создаём или обновляем событие
+        action = "update" if event_id in hashes else "insert"
+        pending.append((action, event_id, data, event_body, digest))
+    pending.extend(("delete", event_id, None, None, None) for event_id in stale_ids)
+
+    skipped = len(ops) - (len(pending) - len(stale_ids))
+    if id_fixes:
+        with conn:
+            conn.executemany("UPDATE occupied_rooms SET google_event_id = ? WHERE rowid = ?", id_fixes)
+    if progress:
+        progress(total=len(events_dict) + len(stale_ids))
+        progress(done=skipped, failed=failed_bodies)
+
+    def request_for(service, action, event_id, event_body):
+        events = service.events()
+        if action == "update":
+            return events.update(calendarId=CALENDAR_ID, eventId=event_id, body=event_body)
+        if action == "delete":
+            return events.delete(calendarId=CALENDAR_ID, eventId=event_id)
+        return events.insert(calendarId=CALENDAR_ID, body=event_body)
+
+    def send(chunk):
+        """HTTP-часть пакета — выполняется на пуле исполнителя, в своём сервисе на поток."""
+        service = services.get()
+        actions = [op[0] for op in chunk]
         try:
-            if prev_event_id:
-                updated = service.events().update(
-                    calendarId=CALENDAR_ID,
-                    eventId=prev_event_id,
-                    body=event_body
-                ).execute()
-                new_id = updated['id']
-                print(f"[GOOGLE_SYNC] Обновлено событие {new_id}")
-            else:
-                created = service.events().insert(
-                    calendarId=CALENDAR_ID,
-                    body=event_body
-                ).execute()
-                new_id = created['id']
-                print(f"[GOOGLE_SYNC] Создано событие {new_id}")
-
-            # Сохраняем google_event_id обратно в БД
-            for rid in rowids:
-                cursor.execute(
-                    "UPDATE occupied_rooms SET google_event_id = ? WHERE rowid = ?",
-                    (new_id, rid)
-                )
-            conn.commit()
-
+            results = executor.run_batch(service, [
+                (str(i), request_for(service, action, event_id, event_body))
+                for i, (action, event_id, _, event_body, _) in enumerate(chunk)
+            ])
+            # Второй проход: insert -> 409 -> update, update -> 404/410 -> insert
+            retry = {}
+            for i, action in enumerate(actions):
+                _, exception = results.get(str(i), (None, None))
+                status = http_status(exception)
+                if (action, status) in (("insert", 409), ("update", 404), ("update", 410)):
+                    retry[i] = "update" if action == "insert" else "insert"
+            if retry:
+                results.update(executor.run_batch(service, [
+                    (str(i), request_for(service, action, chunk[i][1], chunk[i][3]))
+                    for i, action in retry.items()
+                ]))
+                actions = [retry.get(i, action) for i, action in enumerate(actions)]
         except Exception as e:
-            print(f"[GOOGLE_SYNC] Ошибка при синхронизации события {key}: {e}")
+            return chunk, None, None, e
+        return chunk, actions, results, None
+
+    totals = {"insert": 0, "update": 0, "delete": 0, "failed": failed_bodies}
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    chunks = [pending[start:start + BATCH_SIZE] for start in range(0, len(pending), BATCH_SIZE)]
+    # Пакеты уходят параллельно, а их результаты пишутся в БД здесь, в потоке conn
+    for chunk, actions, results, error in executor.map(send, chunks):
+        if error is not None:
+            print(f"[GOOGLE_SYNC] Ошибка пакетного запроса ({len(chunk)} операций): {error}")
+            totals["failed"] += len(chunk)
+            if progress:
+                progress(failed=len(chunk))
+            continue
 
-    conn.close()
-    print("[GOOGLE_SYNC] Синхронизация группы завершена!")
+        id_updates, state_rows, deleted = [], [], []
+        counts = {"insert": 0, "update": 0, "delete": 0, "failed": 0}
+        for i, (_, event_id, data, event_body, digest) in enumerate(chunk):
+            action = actions[i]
+            _, exception = results.get(str(i), (None, None))
+            # удалённое раньше событие (404/410) для нас тоже удалено
+            if exception is not None and not (
+                    action == "delete" and http_status(exception) in (404, 410)):
+                print(f"[GOOGLE_SYNC] Ошибка {action} события {event_id}: {exception}")
+                counts["failed"] += 1
+                continue
+            counts[action] += 1
+            if action == "delete":
+                deleted.append((event_id,))
+                continue
+            id_updates.extend((event_id, rid) for rid in data["rowids"])
+            state_rows.append((event_id, data["week"], data["date"].isoformat(),
+                               ", ".join(sorted(data["groups"])), digest, now))
+
+        # Состояние синхронизации и google_event_id — одной транзакцией на пакет
+        with conn:
+            conn.executemany(
+                "UPDATE occupied_rooms SET google_event_id = ? WHERE rowid = ?", id_updates
+            )
+            conn.executemany("""
+                INSERT INTO calendar_sync (event_id, week, date, groups, body_hash, synced_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(event_id) DO UPDATE SET
+                    week = excluded.week, date = excluded.date, groups = excluded.groups,
+                    body_hash = excluded.body_hash, synced_at = excluded.synced_at
+            """, state_rows)
+            conn.executemany("DELETE FROM calendar_sync WHERE event_id = ?", deleted)
+        for name, value in counts.items():
+            totals[name] += value
+        if progress:
+            progress(done=counts["insert"] + counts["update"] + counts["delete"],
+                     failed=counts["failed"])
+
+    print(f"[GOOGLE_SYNC] Итог: пропущено {skipped}, создано {totals['insert']}, "
+          f"обновлено {totals['update']}, удалено {totals['delete']}, ошибок {totals['failed']}")
+    return totals["failed"]
+
+
+def _services(service=None) -> PerThread:
+    """
+    Переданный сервис (тесты, подделка) общий для всех потоков, иначе —
+    кешированный сервис каждого потока пула из get_calendar_service.
+    """
+    if service is not None:
+        return PerThread(lambda: service)
+    return PerThread(lambda: get_calendar_service())
 
 
-def sync_events_in_date_range(start_date: datetime.date, end_date: datetime.date):
+def _sync_scope(conn: sqlite3.Connection, services: PerThread, scope: str, rows, state_rows, progress) -> None:
     """
-    Синхронизирует в Google Calendar все события из occupied_rooms,
-    попадающие в диапазон [start_date..end_date].
+    Общая часть синхронизаций: водяной знак calendar_sync.<scope> хранит
+    occupancy.version последней полностью успешной синхронизации этой области.
+    Если с тех пор occupied_rooms не пересчитывались, API не вызывается вовсе —
+    кроме сверки с календарём раз в RECONCILE_INTERVAL
+    (отметка calendar_sync.<scope>.verified_at).
     """
-    print(f"[GOOGLE_SYNC] sync_events_in_date_range: {start_date} — {end_date}")
-    ensure_google_event_id_column()
-    service = get_calendar_service()
-
-    # Читаем все записи
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT rowid, week, day, start_time, end_time,
-               room, subject, teacher, group_name, google_event_id
-        FROM occupied_rooms
-    """)
-    all_rows = cursor.fetchall()
-
-    # Фильтруем по дате
-    rows = []
-    for (rowid, week, day_str, start_t, end_t,
-         room, subject, teacher, group_name, google_event_id) in all_rows:
-        date_obj = parse_date_str(day_str)
-        if date_obj and start_date <= date_obj <= end_date:
-            rows.append((rowid, week, day_str, start_t, end_t,
-                         room, subject, teacher, group_name, google_event_id))
-
-    if not rows:
-        print("[GOOGLE_SYNC] Нет записей для указанного периода.")
-        conn.close()
+    version = get_meta(conn, "occupancy.version")
+    mark_key = f"calendar_sync.{scope}"
+    verified_key = f"{mark_key}.verified_at"
+    now = datetime.datetime.now(datetime.timezone.utc)
+    verified_at = get_meta(conn, verified_key)
+    verify = (not verified_at
+              or now - datetime.datetime.fromisoformat(verified_at) >= RECONCILE_INTERVAL)
+    if not verify and version is not None and get_meta(conn, mark_key) == version:
+        print(f"[GOOGLE_SYNC] {scope}: изменений с версии {version} нет, пропускаем.")
+        if progress:
+            progress(total=0)
         return
 
-    # Группируем аналогично sync_group_to_calendar
-    events_dict = defaultdict(lambda: {
-        "rowids": [], "groups": set(), "google_event_id": None,
-        "day_str": None, "time_str": None
-    })
-    for (rowid, week, day_str, start_t, end_t,
-         room, subject, teacher, group_name, google_event_id) in rows:
-        time_str = f"{start_t} - {end_t}"
-        key = (week, day_str, time_str, room, subject, teacher)
-        events_dict[key]["rowids"].append(rowid)
-        events_dict[key]["groups"].add(group_name)
-        events_dict[key]["day_str"] = day_str
-        events_dict[key]["time_str"] = time_str
-        if google_event_id:
-            events_dict[key]["google_event_id"] = google_event_id
+    events_dict = _group_events(rows)
+    current_ids = {data["event_id"] for data in events_dict.values() if data["event_id"]}
+    stale_ids = _stale_event_ids(conn, state_rows, current_ids)
+    failed = _push_events(conn, services, events_dict, stale_ids, progress, verify=verify)
+    if not failed:
+        with conn:
+            if version is not None:
+                set_meta(conn, mark_key, version)
+            if verify:
+                set_meta(conn, verified_key, now.isoformat())
 
-    # Обрабатываем каждое событие
-    for key, data in events_dict.items():
-        week, day_str, time_str, room, subject, teacher = key
-        aggregated_groups = ", ".join(sorted(data["groups"]))
-        prev_event_id     = data["google_event_id"]
-        rowids            = data["rowids"]
 
-        subject = str(subject) if subject else "No Subject"
-        teacher = str(teacher) if teacher else ""
-        room    = str(room) if room else ""
-
-        date_obj = parse_date_str(day_str)
-        if not date_obj:
-            continue
+def sync_group_to_calendar(group_name: str, service=None, progress=None, db_path=None):
+    """
+    Синхронизирует все занятия группы из occupied_rooms в Google Calendar.
+    Занятие, общее для нескольких групп, попадает сюда и при синхронизации
+    любой из них (через колонку groups) и пишется в одно и то же событие.
+    db_path — БД с occupied_rooms (по умолчанию DB_PATH; очередь задач передаёт свою).
+    """
+    print(f"[GOOGLE_SYNC] sync_group_to_calendar вызван для группы: {group_name}")
+    services = _services(service)
 
-        start_str, end_str = time_str.split(" - ")
-        try:
-            start_dt = datetime.datetime.combine(date_obj,
-                         datetime.datetime.strptime(start_str, "%H:%M").time())
-            end_dt   = datetime.datetime.combine(date_obj,
-                         datetime.datetime.strptime(end_str,   "%H:%M").time())
-        except Exception as e:
-            print(f"[GOOGLE_SYNC] Ошибка парсинга времени '{time_str}': {e}")
-            continue
+    # Читаем данные из occupied_rooms (вместо PARSER_DB — единый DB_PATH)
+    conn = sqlite3.connect(db_path or DB_PATH)
+    try:
+        rows = conn.execute(f"""
+            SELECT {OCCUPIED_COLUMNS}
+            FROM occupied_rooms
+            WHERE group_name = ?
+               OR instr(', ' || groups || ', ', ', ' || ? || ', ') > 0
+        """, (group_name, group_name)).fetchall()
+        state_rows = conn.execute("""
+            SELECT event_id, week FROM calendar_sync
+            WHERE instr(', ' || groups || ', ', ', ' || ? || ', ') > 0
+        """, (group_name,)).fetchall()
+        _sync_scope(conn, services, f"group:{group_name}", rows, state_rows, progress)
+    finally:
+        conn.close()
+    print("[GOOGLE_SYNC] Синхронизация группы завершена!")
 
-        event_body = {
-            'summary':     subject,
-            'location':    room,
-            'description': f"Преподаватель: {teacher}\nГруппы: {aggregated_groups}\nНеделя: {week}",
-            'start':       {'dateTime': start_dt.isoformat(), 'timeZone': 'Europe/Moscow'},
-            'end':         {'dateTime': end_dt.isoformat(),   'timeZone': 'Europe/Moscow'},
-        }
 
-        try:
-            if prev_event_id:
-                updated = service.events().update(
-                    calendarId=CALENDAR_ID,
-                    eventId=prev_event_id,
-                    body=event_body
-                ).execute()
-                new_id = updated['id']
-                print(f"[GOOGLE_SYNC] Обновлено событие {new_id}")
-            else:
-                created = service.events().insert(
-                    calendarId=CALENDAR_ID,
-                    body=event_body
-                ).execute()
-                new_id = created['id']
-                print(f"[GOOGLE_SYNC] Создано событие {new_id}")
-
-            for rid in rowids:
-                cursor.execute(
-                    "UPDATE occupied_rooms SET google_event_id = ? WHERE rowid = ?",
-                    (new_id, rid)
-                )
-            conn.commit()
+def range_rows(conn: sqlite3.Connection, start_date: datetime.date, end_date: datetime.date) -> list:
+    """Строки occupied_rooms за [start_date..end_date] — индексный BETWEEN по ISO-дате."""
+    return conn.execute(
+        f"SELECT {OCCUPIED_COLUMNS} FROM occupied_rooms WHERE date BETWEEN ? AND ?",
+        (start_date.isoformat(), end_date.isoformat())
+    ).fetchall()
 
-        except Exception as e:
-            print(f"[GOOGLE_SYNC] Ошибка при синхронизации события {key}: {e}")
 
-    conn.close()
+def sync_events_in_date_range(start_date: datetime.date, end_date: datetime.date,
+                              service=None, progress=None, db_path=None):
+    """
+    Синхронизирует в Google Calendar все события из occupied_rooms,
+    попадающие в диапазон [start_date..end_date]. db_path — как у sync_group_to_calendar.
+    """
+    print(f"[GOOGLE_SYNC] sync_events_in_date_range: {start_date} — {end_date}")
+    services = _services(service)
+
+    conn = sqlite3.connect(db_path or DB_PATH)
+    try:
+        rows = range_rows(conn, start_date, end_date)
+        state_rows = conn.execute(
+            "SELECT event_id, week FROM calendar_sync WHERE date BETWEEN ? AND ?",
+            (start_date.isoformat(), end_date.isoformat())
+        ).fetchall()
+
+        if not rows and not state_rows:
+            print("[GOOGLE_SYNC] Нет записей для указанного периода.")
+            if progress:
+                progress(total=0)
+            return
+
+        _sync_scope(conn, services, f"range:{start_date}:{end_date}", rows, state_rows, progress)
+    finally:
+        conn.close()
     print("[GOOGLE_SYNC] Синхронизация по диапазону завершена!")
 
 
@@ -0,0 +1,204 @@
+"""
+iCalendar-ленты (RFC 5545) прямо из таблицы schedule: группа, преподаватель,
+аудитория. Клиенты календарей подписываются на URL и опрашивают его сами —
+без Google API. Готовая лента кешируется в процессе по версии данных, её ETag
+и Last-Modified позволяют отвечать 304 на повторные опросы.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+
+from backend import metrics
+from backend.database.dates import lesson_columns
+
+PRODID = "-//MAI Schedule//Расписание МАИ//RU"
+TZID = "Europe/Moscow"
+# Москва живёт в UTC+3 без перехода на летнее время с 2014 года
+VTIMEZONE = [
+    "BEGIN:VTIMEZONE",
+    f"TZID:{TZID}",
+    "BEGIN:STANDARD",
+    "DTSTART:19700101T000000",
+    "TZOFFSETFROM:+0300",
+    "TZOFFSETTO:+0300",
+    "TZNAME:MSK",
+    "END:STANDARD",
+    "END:VTIMEZONE",
+]
+FEED_KINDS = ("group", "teacher", "room")
+CACHE_SIZE = 512  # лент в кеше процесса
+
+_cache_lock = threading.Lock()
+_cache = OrderedDict()  # (kind, name) -> (version, feed)
+
+_FEED_SQL = {
+    "group": "g.name = ?",
+    "teacher": "EXISTS (SELECT 1 FROM json_each(s.teachers) WHERE value = ?)",
+    "room": "EXISTS (SELECT 1 FROM json_each(s.rooms) WHERE value = ?)",
+}
+
+
+def feed_version(conn: sqlite3.Connection) -> tuple:
+    """
+    Версия данных для лент: последний id changes_log (его пишут триггеры при
+    любой вставке, удалении и UPDATE строки schedule), время этого изменения
+    и время последнего парсинга — из двух последних берётся Last-Modified.
+    """
+    row = conn.execute("""
+        SELECT (SELECT coalesce(max(id), 0) FROM changes_log),
+               (SELECT changed_at FROM changes_log ORDER BY id DESC LIMIT 1),
+               (SELECT max(parsed_at) FROM parser_pairs)
+    """).fetchone()
+    return tuple(row)
+
+
+def _escape(text: str) -> str:
+    return (str(text).replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def _fold(line: str) -> str:
+    """Переносит строку длиннее 75 октетов (RFC 5545, 3.1), не разрывая символы UTF-8."""
+    out, current = [], ""
+    for ch in line:
+        limit = 75 if not out else 74  # у продолжения первый октет — пробел
+        if len((current + ch).encode("utf-8")) > limit:
+            out.append(current)
+            current = ""
+        current += ch
+    out.append(current)
+    return "\r\n ".join(out)
+
+
+def lesson_uid(date_iso: str, start: int, end: int, subject: str, rooms: list) -> str:
+    """UID занятия: одинаков в любой ленте и при любом перепарсинге."""
+    raw = "|".join([date_iso, str(start), str(end), subject, ",".join(sorted(rooms))])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest() + "@mai-schedule"
+
+
+def load_lessons(conn: sqlite3.Connection, kind: str, name: str) -> list[dict]:
+    """
+    Занятия ленты kind ("group", "teacher", "room") с датой и временем в минутах.
+    Одно занятие нескольких групп в ленте преподавателя или аудитории — одно
+    событие со списком групп. Строки, дату или время которых не разобрать, пропускаются.
+    """
+    rows = conn.execute(f"""
+        SELECT s.week, s.date, s.time, s.date_iso, s.start_min, s.end_min,
+               s.subject, s.teachers, s.rooms, g.name
+        FROM schedule s
+        JOIN groups g ON g.id = s.group_id
+        WHERE {_FEED_SQL[kind]}
+    """, (name,)).fetchall()
+
+    lessons = {}
+    resolved = {}
+    for week, date_str, time_str, date_iso, start, end, subject, teachers, rooms, group in rows:
+        date_iso, start, end = lesson_columns(week, date_str, time_str, date_iso, start, end, resolved)
+        if date_iso is None or start is None:
+            continue
+        try:
+            teachers, rooms = json.loads(teachers), json.loads(rooms)
+        except (TypeError, ValueError):
+            teachers, rooms = [], []
+        uid = lesson_uid(date_iso, start, end, subject, rooms)
+        lesson = lessons.setdefault(uid, {
+            "uid": uid, "date": date.fromisoformat(date_iso), "start": start, "end": end,
+            "subject": subject, "teachers": teachers, "rooms": rooms, "groups": set(),
+        })
+        lesson["groups"].add(group)
+    return sorted(lessons.values(), key=lambda l: (l["date"], l["start"], l["uid"]))
+
+
+def _local_time(day, minutes: int) -> str:
+    return f"{day:%Y%m%d}T{minutes // 60:02d}{minutes % 60:02d}00"
+
+
+def build_calendar(title: str, lessons: list[dict], stamp: datetime) -> str:
+    """Текст VCALENDAR; DTSTAMP — время версии данных, чтобы лента была детерминированной."""
+    dtstamp = stamp.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(title)}",
+        f"X-WR-TIMEZONE:{TZID}",
+        *VTIMEZONE,
+    ]
+    for lesson in lessons:
+        description = []
+        if lesson["teachers"]:
+            description.append("Преподаватель: " + ", ".join(lesson["teachers"]))
+        description.append("Группы: " + ", ".join(sorted(lesson["groups"])))
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{lesson['uid']}",
+            f"DTSTAMP:{dtstamp}",
+            f"DTSTART;TZID={TZID}:{_local_time(lesson['date'], lesson['start'])}",
+            f"DTEND;TZID={TZID}:{_local_time(lesson['date'], lesson['end'])}",
+            f"SUMMARY:{_escape(lesson['subject'])}",
+            f"LOCATION:{_escape(', '.join(lesson['rooms']))}",
+            f"DESCRIPTION:{_escape(chr(10).join(description))}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_fold(line) for line in lines) + "\r\n"
+
+
+def _last_modified(*stamps: str | None) -> datetime:
+    """Самая поздняя из отметок времени (changed_at триггеров — UTC без пояса)."""
+    latest = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    for stamp in stamps:
+        if not stamp:
+            continue
+        try:
+            moment = datetime.fromisoformat(stamp)
+        except ValueError:
+            continue
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        latest = max(latest, moment.replace(microsecond=0))
+    return latest
+
+
+def invalidate():
+    """Сбрасывает кеш лент (по событию шины об изменении расписания)."""
+    with _cache_lock:
+        _cache.clear()
+
+
+def get_feed(conn: sqlite3.Connection, kind: str, name: str) -> dict | None:
+    """
+    Лента {"body", "etag", "last_modified"} или None, если для неё нет занятий.
+    Берётся из кеша процесса (LRU на CACHE_SIZE лент), пока не сменилась feed_version.
+    """
+    version = feed_version(conn)
+    key = (kind, name)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == version:
+            _cache.move_to_end(key)
+            metrics.CACHE_REQUESTS.labels("ics", "hit").inc()
+            return cached[1]
+
+    metrics.CACHE_REQUESTS.labels("ics", "miss").inc()
+    lessons = load_lessons(conn, kind, name)
+    feed = None
+    if lessons:
+        last_modified = _last_modified(version[1], version[2])
+        body = build_calendar(name, lessons, last_modified)
+        feed = {
+            "body": body,
+            "etag": hashlib.sha1(body.encode("utf-8")).hexdigest(),
+            "last_modified": last_modified,
+        }
+    with _cache_lock:
+        _cache[key] = (version, feed)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return feed
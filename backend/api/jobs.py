@@ -0,0 +1,273 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from backend import metrics
+from backend.database.database import DB_PATH
+
+# Как часто простаивающий воркер заглядывает в очередь (задачи из других процессов)
+POLL_INTERVAL = 2.0
+# Задача в статусе running без отметок прогресса дольше этого — воркер упал, вернуть в очередь
+STALE_AFTER = timedelta(minutes=10)
+DEFAULT_WORKERS = 2
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def init_jobs_table(conn: sqlite3.Connection):
+    """Создаёт таблицу очереди фоновых задач."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id            INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind          TEXT    NOT NULL,
+        params        TEXT    NOT NULL,  -- JSON
+        dedup_key     TEXT,
+        status        TEXT    NOT NULL DEFAULT 'queued'
+                      CHECK (status IN ('queued', 'running', 'done', 'failed')),
+        total         INTEGER,
+        done          INTEGER NOT NULL DEFAULT 0,
+        failed        INTEGER NOT NULL DEFAULT 0,
+        error         TEXT,
+        created_at    TEXT    NOT NULL,
+        started_at    TEXT,
+        heartbeat_at  TEXT,
+        finished_at   TEXT
+    );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs(dedup_key, status);")
+    conn.commit()
+
+
+class JobQueue:
+    """Персистентная очередь задач в SQLite: переживает перезапуск API."""
+
+    def __init__(self, db_path=DB_PATH):
+        # таблицу jobs создаёт migrate() до запуска воркеров, здесь DDL не нужен
+        self.db_path = db_path
+        self._wakeup = threading.Condition()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def enqueue(self, kind: str, params: dict, dedup_key: str | None = None) -> tuple[int, bool]:
+        """
+        Ставит задачу в очередь. Если задача с тем же dedup_key ещё ждёт
+        выполнения — новая не создаётся. Возвращает (id задачи, склеена ли).
+        """
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if dedup_key is not None:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE dedup_key = ? AND status = 'queued' LIMIT 1",
+                    (dedup_key,)
+                ).fetchone()
+                if row:
+                    conn.execute("COMMIT")
+                    return row["id"], True
+            cur = conn.execute(
+                "INSERT INTO jobs (kind, params, dedup_key, created_at) VALUES (?, ?, ?, ?)",
+                (kind, json.dumps(params, ensure_ascii=False), dedup_key, _now())
+            )
+            conn.execute("COMMIT")
+            job_id = cur.lastrowid
+        finally:
+            conn.close()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id, False
+
+    def get(self, job_id: int) -> dict | None:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        return job
+
+    def claim(self) -> dict | None:
+        """Забирает старейшую ожидающую задачу (и возвращает в очередь зависшие)."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            stale = (datetime.now(timezone.utc) - STALE_AFTER).isoformat()
+            conn.execute("""
+                UPDATE jobs SET status = 'queued', started_at = NULL, heartbeat_at = NULL,
+                                done = 0, failed = 0, total = NULL
+                WHERE status = 'running' AND heartbeat_at < ?
+            """, (stale,))
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            now = _now()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, heartbeat_at = ? WHERE id = ?",
+                (now, now, row["id"])
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return self.get(row["id"])
+
+    def progress(self, job_id: int, done: int = 0, failed: int = 0, total: int | None = None):
+        """Прибавляет счётчики выполненных/упавших шагов, total — сколько всего шагов."""
+        conn = self._connect()
+        try:
+            conn.execute("""
+                UPDATE jobs SET done = done + ?, failed = failed + ?,
+                                total = coalesce(?, total), heartbeat_at = ?
+                WHERE id = ?
+            """, (done, failed, total, _now(), job_id))
+        finally:
+            conn.close()
+
+    def finish(self, job_id: int, error: str | None = None):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                ("failed" if error else "done", error, _now(), job_id)
+            )
+        finally:
+            conn.close()
+
+    def wait(self, timeout: float):
+        """Ждёт постановки новой задачи в этом процессе (или таймаута)."""
+        with self._wakeup:
+            self._wakeup.wait(timeout)
+
+
+def _run_sync_group(params: dict, progress, db_path):
+    from backend.api.google_sync import sync_group_to_calendar
+    sync_group_to_calendar(params["group"], progress=progress, db_path=db_path)
+
+
+def _run_sync_range(params: dict, progress, db_path):
+    from backend.api.google_sync import sync_events_in_date_range
+    sync_events_in_date_range(
+        datetime.fromisoformat(params["start_date"]).date(),
+        datetime.fromisoformat(params["end_date"]).date(),
+        progress=progress, db_path=db_path
+    )
+
+
+# kind задачи -> обработчик(params, progress, db_path); db_path — БД очереди задачи
+HANDLERS = {
+    "sync_group": _run_sync_group,
+    "sync_range": _run_sync_range,
+}
+
+
+class WorkerPool:
+    """Пул потоков, разбирающих очередь задач."""
+
+    def __init__(self, queue: JobQueue, workers: int = DEFAULT_WORKERS,
+                 handlers: dict | None = None, poll_interval: float = POLL_INTERVAL):
+        self.queue = queue
+        self.handlers = handlers if handlers is not None else HANDLERS
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self, timeout: float | None = None):
+        self._stop.set()
+        with self.queue._wakeup:
+            self.queue._wakeup.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+
+    def run_one(self) -> bool:
+        """Выполняет одну задачу из очереди; False — очередь пуста."""
+        job = self.queue.claim()
+        if job is None:
+            return False
+        job_id = job["id"]
+
+        def progress(done=0, failed=0, total=None):
+            self.queue.progress(job_id, done=done, failed=failed, total=total)
+
+        print(f"[JOBS] #{job_id} {job['kind']} {job['params']} — старт")
+        try:
+            handler = self.handlers[job["kind"]]
+            handler(job["params"], progress, self.queue.db_path)
+        except (Exception, SystemExit) as e:
+            # SystemExit бросает get_calendar_service без файла ключа — воркер должен выжить
+            print(f"[JOBS] #{job_id} ошибка: {e!r}")
+            self.queue.finish(job_id, error=repr(e))
+        else:
+            print(f"[JOBS] #{job_id} готово")
+            self.queue.finish(job_id)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self.run_one():
+                self.queue.wait(self.poll_interval)
+
+
+_default_lock = threading.Lock()
+_queues = {}  # путь к БД -> JobQueue
+_pools = {}   # путь к БД -> WorkerPool
+
+
+def get_queue(db_path=DB_PATH) -> JobQueue:
+    """Очередь процесса над БД db_path (по умолчанию — основной)."""
+    key = str(db_path)
+    with _default_lock:
+        if key not in _queues:
+            _queues[key] = JobQueue(db_path)
+        return _queues[key]
+
+
+def ensure_workers(workers: int = DEFAULT_WORKERS, db_path=DB_PATH) -> WorkerPool:
+    """Запускает пул воркеров очереди db_path при первом обращении."""
+    queue = get_queue(db_path)
+    with _default_lock:
+        if str(db_path) not in _pools:
+            _pools[str(db_path)] = WorkerPool(queue, workers).start()
+        return _pools[str(db_path)]
+
+
+def main():
+    p = argparse.ArgumentParser(description="Отдельный процесс-воркер очереди задач")
+    p.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                   help=f"Число потоков (по умолчанию {DEFAULT_WORKERS})")
+    p.add_argument("--metrics-port", type=int,
+                   help="Отдавать метрики Prometheus (вызовы Google API) на этом порту")
+    args = p.parse_args()
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    pool = ensure_workers(args.workers)
+    print(f"[JOBS] Воркеры запущены: {args.workers}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
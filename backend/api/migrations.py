@@ -0,0 +1,92 @@
+"""
+Схема БД приложения: создание и обновление таблиц одним шагом перед запуском
+воркеров API, а не при импорте и не в каждом воркере.
+
+    python -m backend.api.migrations            # основная БД
+    python -m backend.api.migrations --db /tmp/university.db
+
+Миграция идемпотентна и выполняется под файловой блокировкой <БД>.migrate.lock,
+так что одновременный запуск из нескольких процессов не гоняет DDL наперегонки:
+второй дождётся первого и увидит, что версия схемы уже актуальна.
+create_app только сверяет версию (один SELECT).
+"""
+import argparse
+import os
+import sqlite3
+from contextlib import contextmanager
+
+from backend.database.database import DB_PATH, get_meta, set_meta
+
+# Повышать при каждом изменении DDL, которое должно дойти до работающих БД
+# (2 — триггер schedule_reset_resolved; 3 — колонки и даты occupied_rooms,
+# которые раньше доводила каждая синхронизация с Google Calendar; 4 — даты
+# occupied_rooms без угадывания года, по номеру недели)
+SCHEMA_VERSION = 4
+SCHEMA_KEY = "schema.version"
+
+
+def schema_version(db_path=DB_PATH) -> int:
+    """Версия схемы БД; 0 — БД не размечена (нет файла или таблицы meta)."""
+    if not os.path.exists(db_path):
+        return 0
+    conn = sqlite3.connect(db_path, timeout=5)
+    try:
+        return int(get_meta(conn, SCHEMA_KEY, "0"))
+    except sqlite3.OperationalError:  # нет таблицы meta
+        return 0
+    finally:
+        conn.close()
+
+
+@contextmanager
+def _migration_lock(db_path):
+    with open(f"{db_path}.migrate.lock", "w") as lock:
+        try:
+            import fcntl
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        except ImportError:  # Windows
+            import msvcrt
+            msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+        yield
+
+
+def migrate(db_path=DB_PATH) -> bool:
+    """
+    Создаёт и обновляет таблицы парсера, API, очереди задач и уведомлений.
+    Возвращает True, если схема менялась.
+    """
+    # DDL нужен только здесь: импорт таблиц очереди и outbox не должен грузить воркеры API
+    from backend.api.jobs import init_jobs_table
+    from backend.database.database import create_app_tables, init_db, upgrade_occupied_rooms
+    from backend.notifier.outbox import init_outbox_table
+    from backend.notifier.subscriptions import init_subscriptions_table
+
+    with _migration_lock(db_path):
+        if schema_version(db_path) >= SCHEMA_VERSION:
+            return False
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            init_db(conn)
+            create_app_tables(conn)
+            upgrade_occupied_rooms(conn)
+            init_jobs_table(conn)
+            init_outbox_table(conn)
+            init_subscriptions_table(conn)
+            set_meta(conn, SCHEMA_KEY, SCHEMA_VERSION)
+            conn.commit()
+        finally:
+            conn.close()
+    print(f"[MIGRATE] Схема {db_path} обновлена до версии {SCHEMA_VERSION}")
+    return True
+
+
+def main():
+    p = argparse.ArgumentParser(description="Создание и обновление схемы БД")
+    p.add_argument("--db", default=str(DB_PATH))
+    args = p.parse_args()
+    if not migrate(args.db):
+        print(f"[MIGRATE] Схема {args.db} актуальна (версия {SCHEMA_VERSION})")
+
+
+if __name__ == "__main__":
+    main()
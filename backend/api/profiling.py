@@ -0,0 +1,138 @@
+"""
+Профилирование API по запросу, включается переменными окружения.
+
+  API_PROFILE=1            разбивка времени запроса по фазам (connect — открытие
+                           соединения, query — запрос с выборкой строк, decode —
+                           json.loads teachers/rooms, serialize — jsonify) в
+                           заголовке Server-Timing и в логе для медленных запросов;
+  API_PROFILE_SAMPLE=0.1   доля запросов под cProfile; дамп .prof сохраняется,
+                           только если запрос медленнее API_PROFILE_SLOW_MS (200);
+  API_PROFILE_DIR          куда класть дампы (backend/api/profiles);
+  API_SLOW_QUERY_MS=50     журнал медленных запросов query_db/execute_db: SQL,
+                           форма параметров, длительность и EXPLAIN QUERY PLAN
+                           (в режиме API_PROFILE включён с порогом 50 мс);
+  API_SLOW_QUERY_LOG       файл журнала (backend/api/logs/slow_queries.jsonl).
+
+Дамп смотреть так: python -m pstats backend/api/profiles/<файл>.prof
+Без API_PROFILE и API_SLOW_QUERY_MS всё это сводится к проверке флага.
+"""
+import cProfile
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(__file__)
+
+ENABLED = os.getenv("API_PROFILE", "") == "1"
+SAMPLE_RATE = float(os.getenv("API_PROFILE_SAMPLE", "0.1"))
+SLOW_REQUEST_MS = float(os.getenv("API_PROFILE_SLOW_MS", "200"))
+PROFILE_DIR = os.getenv("API_PROFILE_DIR", os.path.join(HERE, "profiles"))
+SLOW_QUERY_MS = float(os.getenv("API_SLOW_QUERY_MS", "50" if ENABLED else "0"))  # 0 — журнал выключен
+SLOW_QUERY_LOG = os.getenv("API_SLOW_QUERY_LOG", os.path.join(HERE, "logs", "slow_queries.jsonl"))
+
+_local = threading.local()
+# В Python 3.12+ профилировщик может быть активен только один на процесс
+_profiler_lock = threading.Lock()
+_log_lock = threading.Lock()
+_NOOP = nullcontext()
+
+
+class _Phase:
+    __slots__ = ("name", "phases", "start")
+
+    def __init__(self, name: str, phases: dict):
+        self.name = name
+        self.phases = phases
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.phases[self.name] = self.phases.get(self.name, 0.0) + time.perf_counter() - self.start
+
+
+def phase(name: str):
+    """with phase("decode"): ... — время блока прибавляется к фазе текущего запроса."""
+    phases = getattr(_local, "phases", None) if ENABLED else None
+    return _NOOP if phases is None else _Phase(name, phases)
+
+
+def start_request():
+    if not ENABLED:
+        return
+    _local.phases = {}
+    _local.started = time.perf_counter()
+    _local.profiler = None
+    if random.random() < SAMPLE_RATE and _profiler_lock.acquire(blocking=False):
+        _local.profiler = cProfile.Profile()
+        _local.profiler.enable()
+
+
+def _dump(profiler: cProfile.Profile, method: str, route: str, total_ms: float) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe_route = re.sub(r"[^\w.-]+", "_", route).strip("_") or "root"
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    path = os.path.join(PROFILE_DIR, f"{stamp}-{method}-{safe_route}-{total_ms:.0f}ms.prof")
+    profiler.dump_stats(path)
+    return path
+
+
+def finish_request(response, method: str, route: str):
+    """Добавляет Server-Timing; медленный запрос пишет в лог (и дамп, если был под cProfile)."""
+    phases = getattr(_local, "phases", None)
+    if not ENABLED or phases is None:
+        return response
+    total = time.perf_counter() - _local.started
+    profiler = _local.profiler
+    _local.phases = _local.profiler = None
+    if profiler is not None:
+        profiler.disable()
+        _profiler_lock.release()
+
+    phases["other"] = max(0.0, total - sum(phases.values()))
+    phases["total"] = total
+    response.headers["Server-Timing"] = ", ".join(
+        f"{name};dur={seconds * 1000:.2f}" for name, seconds in phases.items()
+    )
+    total_ms = total * 1000
+    if total_ms >= SLOW_REQUEST_MS:
+        breakdown = " ".join(f"{n}={s * 1000:.1f}" for n, s in phases.items() if n != "total")
+        line = f"[PROFILE] {method} {route} {total_ms:.0f} мс: {breakdown}"
+        if profiler is not None:
+            line += f", профиль {_dump(profiler, method, route, total_ms)}"
+        print(line)
+    return response
+
+
+def _params_shape(args):
+    """Типы параметров без значений: в журнал не попадают email, пароли и т.п."""
+    if isinstance(args, dict):
+        return {key: type(value).__name__ for key, value in args.items()}
+    return [type(value).__name__ for value in args]
+
+
+def log_query(conn, sql: str, args, seconds: float):
+    """Пишет запрос в журнал медленных, если он дольше API_SLOW_QUERY_MS."""
+    if not SLOW_QUERY_MS or seconds * 1000 < SLOW_QUERY_MS:
+        return
+    try:
+        plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", args).fetchall()]
+    except Exception as e:  # DDL, несколько выражений и т.п.
+        plan = [f"нет плана: {e}"]
+    entry = {
+        "at": datetime.now(timezone.utc).isoformat(),
+        "duration_ms": round(seconds * 1000, 2),
+        "sql": " ".join(sql.split()),
+        "params": _params_shape(args),
+        "plan": plan,
+    }
+    directory = os.path.dirname(SLOW_QUERY_LOG)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _log_lock, open(SLOW_QUERY_LOG, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
@@ -1,52 +1,136 @@
+"""
+Эндпоинты API (Blueprint). Приложение собирает backend.api.app.create_app:
+оно регистрирует этот модуль при создании, а схему БД готовит отдельный
+шаг миграции (backend.api.migrations), так что импорт здесь не трогает БД.
+Модули с numpy (занятость, загрузка аудиторий) и outbox импортируются
+в своих эндпоинтах, чтобы не замедлять запуск воркера.
+"""
+import atexit
+import hashlib
 import sqlite3
 import json
+import threading
+import time
 from functools import wraps
 from datetime import datetime
-from flask import Flask, request, jsonify, g
-from flask_cors import CORS
-from backend.database.database import (
-    DB_PATH,
-    init_db,  # создаёт parser_pairs + groups
-    create_app_tables  # создаёт users, schedule, occupied_rooms, free_rooms, changes_log
-)
-from backend.api.google_sync import (
-    sync_group_to_calendar,
-    sync_events_in_date_range
+from flask import Blueprint, current_app, request, jsonify, g
+from backend import metrics
+from backend.database.dates import parse_hhmm, resolve_lesson
+from backend.database.events import SCHEDULE_CHANGED, Subscriber, publish
+from backend.database import room_index
+from backend.database.room_index import (
+    DAY_START,
+    DAY_END,
+    get_room_index,
+    find_free_slots
 )
+from backend.api.jobs import DEFAULT_WORKERS, get_queue, ensure_workers
+from backend.api import ics, profiling
+from backend.api.ics import get_feed
+
+bp = Blueprint("api", __name__)
+
+
+def _db_path():
+    return current_app.config["DATABASE"]
+
+
+# ——— Сброс кешей процесса по событиям шины ——— #
+_cache_listener_lock = threading.Lock()
+
+
+def _invalidate_caches(events):
+    room_index.invalidate()
+    ics.invalidate()
+
 
-app = Flask(__name__, static_folder='static', template_folder='templates')
-CORS(app)
+@bp.before_app_request
+def ensure_cache_listener():
+    """
+    Поток процесса, сбрасывающий кеши индекса аудиторий и iCalendar-лент,
+    как только парсер или API публикуют изменение расписания.
+    EVENT_LISTENER=False в конфиге — не запускать (кеши живут на отпечатках данных).
+    Поток поднимается при первом запросе, а не при создании приложения:
+    мастер-процесс, форкающий воркеры, его не держит.
+    """
+    app = current_app._get_current_object()
+    if "cache_listener" in app.extensions or not app.config.get("EVENT_LISTENER", True):
+        return
+    with _cache_listener_lock:
+        if "cache_listener" not in app.extensions:
+            subscriber = Subscriber("api-cache", [SCHEDULE_CHANGED], _db_path(), durable=False)
+            listener = threading.Thread(
+                target=subscriber.listen, args=(_invalidate_caches,),
+                name="api-cache-events", daemon=True
+            )
+            listener.start()
+            atexit.register(subscriber.close)
+            app.extensions["cache_listener"] = subscriber
 
-# ——— Инициализация БД ———
-# 1) парсер-таблицы (init_db)
-# 2) таблицы приложения (create_app_tables)
-conn = sqlite3.connect(DB_PATH, timeout=5)
-init_db(conn)
-create_app_tables(conn)
-conn.close()
+
+# ——— Метрики запросов ——— #
+@bp.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    profiling.start_request()
+
+
+@bp.after_app_request
+def observe_request(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        # шаблон маршрута, а не путь: /calendar/<group>.ics — одна метка на все группы
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.HTTP_REQUEST_SECONDS.labels(
+            request.method, route, str(response.status_code)
+        ).observe(time.perf_counter() - started)
+        profiling.finish_request(response, request.method, route)
+    return response
+
+
+@bp.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Метрики процесса в текстовом формате Prometheus."""
+    return current_app.response_class(metrics.render(), mimetype=metrics.CONTENT_TYPE)
 
 
 # ——— Утилиты для работы с БД ———
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH, timeout=5)
+    # время каждого execute попадает в sqlite_query_duration_seconds
+    with profiling.phase("connect"):
+        conn = sqlite3.connect(_db_path(), timeout=5, factory=metrics.TimedConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
 
 def query_db(query: str, args=(), one: bool = False):
-    conn = get_db_connection()
-    cur = conn.execute(query, args)
-    rows = cur.fetchall()
+    with profiling.phase("connect"):
+        conn = sqlite3.connect(_db_path(), timeout=5)
+    conn.row_factory = sqlite3.Row
+    # замеряется вместе с выборкой всех строк, не только шаг до первой
+    with profiling.phase("query"):
+        start = time.perf_counter()
+        cur = conn.execute(query, args)
+        rows = cur.fetchall()
+        elapsed = time.perf_counter() - start
+    metrics.SQL_QUERY_SECONDS.labels(metrics.statement_label(query)).observe(elapsed)
+    profiling.log_query(conn, query, args, elapsed)
     cur.close()
     conn.close()
     return rows[0] if one and rows else rows
 
 
 def execute_db(query: str, args=()):
-    conn = sqlite3.connect(DB_PATH, timeout=5)
+    with profiling.phase("connect"):
+        conn = sqlite3.connect(_db_path(), timeout=5)
     cur = conn.cursor()
-    cur.execute(query, args)
-    conn.commit()
+    with profiling.phase("query"):
+        start = time.perf_counter()
+        cur.execute(query, args)
+        conn.commit()
+        elapsed = time.perf_counter() - start
+    metrics.SQL_QUERY_SECONDS.labels(metrics.statement_label(query)).observe(elapsed)
+    profiling.log_query(conn, query, args, elapsed)
     last_id = cur.lastrowid
     cur.close()
     conn.close()
@@ -79,7 +163,7 @@ def get_jwt_identity():
 
 
 # ——— Регистрация и логин ——— #
-@app.route("/register", methods=["POST"])
+@bp.route("/register", methods=["POST"])
 def register_user():
     data = request.get_json(force=True)
     try:
@@ -92,7 +176,7 @@ def register_user():
     return jsonify({"msg": "Пользователь зарегистрирован"}), 201
 
 
-@app.route("/login", methods=["POST"])
+@bp.route("/login", methods=["POST"])
 def login_user():
     data = request.get_json(force=True)
     row = query_db(
@@ -106,14 +190,14 @@ def login_user():
 
 
 # ——— Группы ——— #
-@app.route("/groups", methods=["GET"])
+@bp.route("/groups", methods=["GET"])
 def get_groups():
     rows = query_db("SELECT name FROM groups")
     return jsonify([r["name"] for r in rows]), 200
 
 
 # ——— Расписание ——— #
-@app.route("/schedule", methods=["GET"])
+@bp.route("/schedule", methods=["GET"])
 def get_schedule():
     group = request.args.get("group")
     week = request.args.get("week")
@@ -137,29 +221,31 @@ def get_schedule():
     )
     result = []
 
-    for r in rows:
-        # teachers и rooms хранятся как JSON-строки
-        try:
-            teachers = json.loads(r["teachers"])
-        except:
-            teachers = []
-        try:
-            rooms = json.loads(r["rooms"])
-        except:
-            rooms = []
-        result.append({
-            "id": r["id"],
-            "date": r["date"],
-            "time": r["time"],
-            "subject": r["subject"],
-            "teachers": teachers,
-            "rooms": rooms,
-            "is_custom": bool(r["is_custom"])
-        })
-    return jsonify(result), 200
-
-
-@app.route("/schedule", methods=["POST"])
+    with profiling.phase("decode"):
+        for r in rows:
+            # teachers и rooms хранятся как JSON-строки
+            try:
+                teachers = json.loads(r["teachers"])
+            except:
+                teachers = []
+            try:
+                rooms = json.loads(r["rooms"])
+            except:
+                rooms = []
+            result.append({
+                "id": r["id"],
+                "date": r["date"],
+                "time": r["time"],
+                "subject": r["subject"],
+                "teachers": teachers,
+                "rooms": rooms,
+                "is_custom": bool(r["is_custom"])
+            })
+    with profiling.phase("serialize"):
+        return jsonify(result), 200
+
+
+@bp.route("/schedule", methods=["POST"])
 @jwt_required()
 def add_schedule():
     user = get_jwt_identity()
@@ -177,11 +263,14 @@ def add_schedule():
     teachers_json = json.dumps(data.get("teachers", []))
     rooms_json = json.dumps(data.get("rooms", []))
 
+    date_iso, start_min, end_min = resolve_lesson(data["week"], data["date"], data["time"])
+
     execute_db(
         """
         INSERT INTO schedule
-            (group_id, week, date, time, subject, teachers, rooms, is_custom)
-        VALUES (?, ?, ?, ?, ?, ?, ?, 1)
+            (group_id, week, date, time, subject, teachers, rooms, is_custom,
+             date_iso, start_min, end_min)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?, ?)
         """,
         (
             group_id,
@@ -190,15 +279,23 @@ def add_schedule():
             data["time"],
             data["subject"],
             teachers_json,
-            rooms_json
+            rooms_json,
+            date_iso,
+            start_min,
+            end_min
         )
     )
+    conn = get_db_connection()
+    try:
+        publish(conn, SCHEDULE_CHANGED, {"group_id": group_id, "week": data["week"]})
+    finally:
+        conn.close()
 
     return jsonify({"msg": "Занятие добавлено"}), 201
 
 
 # ——— Аудитории ——— #
-@app.route("/occupied_rooms", methods=["GET"])
+@bp.route("/occupied_rooms", methods=["GET"])
 def occupied_rooms():
     rows = query_db(
         "SELECT week, day, start_time, end_time, room, subject, teacher, group_name "
@@ -218,34 +315,172 @@ def occupied_rooms():
     ]), 200
 
 
-@app.route("/free_rooms", methods=["GET"])
+@bp.route("/free_rooms", methods=["GET"])
 def free_rooms():
-    rows = query_db(
-        "SELECT week, day, start_time, end_time, room FROM free_rooms"
-    )
+    """
+    Свободные аудитории, вычисленные из масок room_slots.
+    По умолчанию — только IT-аудитории; ?all=1 — все аудитории кампуса, ?week=N — одна неделя.
+    """
+    week = request.args.get("week", type=int)
+    from backend.database.filter_db import ALLOWED_IT_ROOMS
+    from backend.database.occupancy import load_grid, free_slots
+
+    rooms = None if request.args.get("all") == "1" else sorted(ALLOWED_IT_ROOMS)
+    conn = get_db_connection()
+    try:
+        grid = load_grid(conn, rooms=rooms, week=week)
+    finally:
+        conn.close()
     return jsonify([
         {
-            "week": r["week"],
-            "day": r["day"],
-            "start_time": r["start_time"],
-            "end_time": r["end_time"],
-            "room": r["room"],
-        } for r in rows
+            "week": w,
+            "day": d,
+            "start_time": s,
+            "end_time": e,
+            "room": r,
+        } for w, d, s, e, r in free_slots(grid)
     ]), 200
 
 
+@bp.route("/rooms/find", methods=["GET"])
+def find_rooms():
+    """
+    Поиск свободных окон по интервальному индексу занятости.
+    Параметры: start_date, end_date (DD.MM.YYYY), duration (мин., по умолчанию 90),
+    earliest/latest (HH:MM), rooms (через запятую) или room_set=it,
+    count (сколько аудиторий одновременно), adjacent (0/1), limit.
+    """
+    args = request.args
+    sd = args.get("start_date")
+    ed = args.get("end_date", sd)
+    if not sd:
+        return jsonify({"error": "Параметр start_date обязателен"}), 400
+    try:
+        sd_dt = datetime.strptime(sd, "%d.%m.%Y").date()
+        ed_dt = datetime.strptime(ed, "%d.%m.%Y").date()
+    except ValueError as e:
+        return jsonify({"error": f"Неверный формат даты: {e}"}), 400
+    if ed_dt < sd_dt:
+        return jsonify({"error": "Дата окончания раньше даты начала"}), 400
+
+    try:
+        duration = int(args.get("duration", 90))
+        count = int(args.get("count", 1))
+        limit = int(args.get("limit", 20))
+        earliest = parse_hhmm(args["earliest"]) if args.get("earliest") else DAY_START
+        latest = parse_hhmm(args["latest"]) if args.get("latest") else DAY_END
+    except ValueError as e:
+        return jsonify({"error": f"Неверный параметр: {e}"}), 400
+    if duration <= 0 or count <= 0 or limit <= 0 or latest <= earliest:
+        return jsonify({"error": "Неверные ограничения поиска"}), 400
+
+    rooms = None
+    if args.get("room_set") == "it":
+        from backend.database.filter_db import ALLOWED_IT_ROOMS
+        rooms = set(ALLOWED_IT_ROOMS)
+    elif args.get("rooms"):
+        rooms = {r.strip() for r in args["rooms"].split(",") if r.strip()}
+
+    conn = get_db_connection()
+    try:
+        index = get_room_index(conn)
+    finally:
+        conn.close()
+    slots = find_free_slots(
+        index, sd_dt, ed_dt, duration,
+        earliest=earliest, latest=latest, rooms=rooms, count=count,
+        adjacent=args.get("adjacent", "1") != "0", limit=limit
+    )
+    return jsonify(slots), 200
+
+
+@bp.route("/rooms/utilization", methods=["GET"])
+def rooms_utilization():
+    """
+    Загрузка аудиторий: по аудиториям, корпусам, неделям, дням недели и парам,
+    пиковые часы и неиспользуемые аудитории. ?week=N, ?building=ГУК Б.
+    Отчёт кешируется по версии данных занятости, ответ помечается ETag,
+    так что повторный опрос без изменений получает 304.
+    """
+    from backend.database.utilization import get_utilization
+
+    week = request.args.get("week", type=int)
+    building = request.args.get("building")
+    conn = get_db_connection()
+    try:
+        report, version = get_utilization(conn, week=week, building=building)
+    finally:
+        conn.close()
+    resp = jsonify(report)
+    # хеш, а не сам ключ: building бывает кириллицей, а заголовок — только latin-1
+    resp.set_etag(hashlib.sha1(f"{version}|{week}|{building}".encode("utf-8")).hexdigest())
+    return resp.make_conditional(request)
+
+
+# ——— iCalendar-ленты ——— #
+def ics_response(kind: str, name: str):
+    """
+    Лента .ics из schedule: клиенты календарей опрашивают её сами, без Google API.
+    ETag и Last-Modified меняются только с данными, повторный опрос получает 304.
+    """
+    conn = get_db_connection()
+    try:
+        feed = get_feed(conn, kind, name)
+    finally:
+        conn.close()
+    if feed is None:
+        return jsonify({"error": "Нет занятий для этой ленты"}), 404
+    resp = current_app.response_class(feed["body"], mimetype="text/calendar")
+    resp.set_etag(feed["etag"])
+    resp.last_modified = feed["last_modified"]
+    resp.cache_control.public = True
+    resp.cache_control.max_age = 300
+    return resp.make_conditional(request)
+
+
+@bp.route("/calendar/<group>.ics", methods=["GET"])
+def group_calendar(group: str):
+    return ics_response("group", group)
+
+
+@bp.route("/calendar/teacher/<teacher>.ics", methods=["GET"])
+def teacher_calendar(teacher: str):
+    return ics_response("teacher", teacher)
+
+
+@bp.route("/calendar/room/<room>.ics", methods=["GET"])
+def room_calendar(room: str):
+    return ics_response("room", room)
+
+
 # ——— Синхронизация с Google ——— #
-@app.route("/calendar/sync_group", methods=["POST"])
+def enqueue_job(kind: str, params: dict, dedup_key: str):
+    """
+    Ставит задачу в очередь и при необходимости поднимает пул воркеров процесса.
+    JOB_WORKERS=0 в конфиге — задачи только копятся (их разбирает
+    отдельный `python -m backend.api.jobs`).
+    """
+    job_id, coalesced = get_queue(_db_path()).enqueue(kind, params, dedup_key=dedup_key)
+    workers = current_app.config.get("JOB_WORKERS", DEFAULT_WORKERS)
+    if workers > 0:
+        ensure_workers(workers, _db_path())
+    return jsonify({
+        "job_id": job_id,
+        "coalesced": coalesced,
+        "status_url": f"/jobs/{job_id}",
+    }), 202
+
+
+@bp.route("/calendar/sync_group", methods=["POST"])
 @jwt_required()
 def sync_group_calendar():
     data = request.get_json(force=True)
     if not data.get("group"):
         return jsonify({"error": "Укажите группу"}), 400
-    sync_group_to_calendar(data["group"])
-    return jsonify({"msg": f"Расписание группы {data['group']} добавлено в Google Calendar"}), 200
+    return enqueue_job("sync_group", {"group": data["group"]}, f"sync_group:{data['group']}")
 
 
-@app.route("/calendar/sync_range", methods=["POST"])
+@bp.route("/calendar/sync_range", methods=["POST"])
 def sync_range_calendar():
     data = request.get_json(force=True)
     sd = data.get("start_date")
@@ -259,10 +494,31 @@ def sync_range_calendar():
         return jsonify({"error": f"Неверный формат даты: {e}"}), 400
     if ed_dt < sd_dt:
         return jsonify({"error": "Дата окончания раньше даты начала"}), 400
-    sync_events_in_date_range(sd_dt, ed_dt)
-    return jsonify({"msg": f"Синхронизированы события с {sd_dt} по {ed_dt}"}), 200
+    params = {"start_date": sd_dt.isoformat(), "end_date": ed_dt.isoformat()}
+    return enqueue_job("sync_range", params, f"sync_range:{sd_dt}:{ed_dt}")
+
+
+@bp.route("/jobs/<int:job_id>", methods=["GET"])
+def job_status(job_id: int):
+    job = get_queue(_db_path()).get(job_id)
+    if job is None:
+        return jsonify({"error": "Задача не найдена"}), 404
+    return jsonify(job), 200
+
+
+# ——— Уведомления ——— #
+@bp.route("/notifier/outbox", methods=["GET"])
+def notifier_outbox():
+    """Глубина очереди уведомлений и задержка доставки."""
+    from backend.notifier.outbox import outbox_stats
+
+    conn = get_db_connection()
+    try:
+        return jsonify(outbox_stats(conn)), 200
+    finally:
+        conn.close()
 
 
 if __name__ == "__main__":
-    # Чтобы SQLite не блокироваться
-    app.run(debug=False, use_reloader=False, port=5000)
+    from backend.api.app import main
+    main()
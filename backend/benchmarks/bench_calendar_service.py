@@ -0,0 +1,81 @@
+"""
+Стоимость получения клиента Google Calendar: прежняя схема (чтение
+service_account.json и build() на каждую синхронизацию) против кеша
+calendar_service, плюс время холодного импорта модулей синхронизации.
+Ключ сервисного аккаунта генерируется на лету, в сеть бенчмарк не ходит.
+
+    python -m backend.benchmarks.bench_calendar_service --calls 50
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from backend.api import calendar_service
+
+
+def write_fake_key(path: str):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+    with open(path, "w") as f:
+        json.dump({
+            "type": "service_account", "project_id": "bench", "private_key_id": "0",
+            "private_key": pem, "client_email": "bench@bench.iam.gserviceaccount.com",
+            "client_id": "0", "token_uri": "https://oauth2.googleapis.com/token",
+        }, f)
+
+
+def uncached_service():
+    """Как раньше: учётные данные и build() заново на каждый вызов."""
+    from google.oauth2 import service_account
+    from googleapiclient.discovery import build
+
+    creds = service_account.Credentials.from_service_account_file(
+        calendar_service.SERVICE_ACCOUNT_FILE, scopes=calendar_service.SCOPES
+    )
+    return build("calendar", "v3", credentials=creds)
+
+
+def timed(fn, calls: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - t0) / calls * 1000
+
+
+def import_time(module: str) -> float:
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout) * 1000
+
+
+def main():
+    p = argparse.ArgumentParser(description="Бенчмарк фабрики клиента Google Calendar")
+    p.add_argument("--calls", type=int, default=50)
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        key_path = os.path.join(tmp, "service_account.json")
+        write_fake_key(key_path)
+        with mock.patch.object(calendar_service, "SERVICE_ACCOUNT_FILE", key_path):
+            calendar_service.reset_calendar_service()
+            print(f"без кеша     {timed(uncached_service, args.calls):>8.2f} мс на вызов")
+            print(f"с кешем      {timed(calendar_service.get_calendar_service, args.calls):>8.3f} мс на вызов")
+            calendar_service.reset_calendar_service()
+
+    for module in ("backend.api.app", "backend.api.routes", "backend.api.google_sync", "googleapiclient.discovery"):
+        print(f"импорт {module:<28} {import_time(module):>7.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
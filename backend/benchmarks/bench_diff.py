@@ -0,0 +1,85 @@
+"""
+Разбор пачки changes_log после повторного парсинга всего семестра:
+изменения сводятся к разнице занятий по неделям групп (fanout.diff_changes).
+Часть занятий меняет аудиторию, переносится или удаляется, остальные
+записываются повторно без изменений — как при `parser.py --force-db`.
+
+    python -m backend.benchmarks.bench_diff --groups 100 --weeks 16 --changed 0.05
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from backend.benchmarks.synthetic import generate
+from backend.database.database import save_schedule
+from backend.notifier.fanout import diff_changes, net_images
+
+
+def recrawl(conn: sqlite3.Connection, changed: float, seed: int = 0) -> int:
+    """Переписывает всё расписание: доля changed занятий меняется, остальные дублируются."""
+    rnd = random.Random(seed)
+    lessons = conn.execute(
+        "SELECT id, group_id, week, date, time, subject, teachers, rooms FROM schedule"
+    ).fetchall()
+    room_changes, moves, deletes, duplicates = [], [], [], {}
+    for sid, gid, week, date, time_, subject, teachers, rooms in lessons:
+        roll = rnd.random()
+        if roll < changed * 0.6:
+            room_changes.append((f'["ГУК Б-{rnd.randint(100, 999)}"]', sid))
+        elif roll < changed * 0.9:
+            moves.append((sid,))
+        elif roll < changed:
+            deletes.append((sid,))
+        else:
+            duplicates.setdefault((gid, week), []).append({
+                "date": date, "time": time_, "subject": subject,
+                "teachers": json.loads(teachers), "rooms": json.loads(rooms),
+            })
+    conn.executemany("UPDATE schedule SET rooms = ? WHERE id = ?", room_changes)
+    conn.executemany(
+        "UPDATE schedule SET time = '18:20 – 19:50', start_min = 1100, end_min = 1190 WHERE id = ?",
+        moves
+    )
+    conn.executemany("DELETE FROM schedule WHERE id = ?", deletes)
+    conn.commit()
+    for (gid, week), data in duplicates.items():
+        save_schedule(conn, gid, week, data)
+    return len(lessons)
+
+
+def main():
+    p = argparse.ArgumentParser(description="Бенчмарк разницы занятий по changes_log")
+    p.add_argument("--groups", type=int, default=100)
+    p.add_argument("--weeks", type=int, default=16)
+    p.add_argument("--changed", type=float, default=0.05)
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "diff.db")
+        generate(db_path, groups=args.groups, weeks=args.weeks)
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        start = conn.execute("SELECT max(id) FROM changes_log").fetchone()[0]
+        lessons = recrawl(conn, args.changed)
+
+        t0 = time.perf_counter()
+        rows = conn.execute("SELECT * FROM changes_log WHERE id > ? ORDER BY id", (start,)).fetchall()
+        net, _ = net_images(conn, rows)
+        diffs = diff_changes(conn, net)
+        elapsed = time.perf_counter() - t0
+        conn.close()
+
+    kinds = {}
+    for changes in diffs.values():
+        for change in changes:
+            kinds[change["type"]] = kinds.get(change["type"], 0) + 1
+    print(f"{lessons} занятий, {len(rows)} записей changes_log, {len(diffs)} недель групп с изменениями")
+    print(f"разница за один проход  {elapsed:>6.2f} s  {kinds}")
+
+
+if __name__ == "__main__":
+    main()
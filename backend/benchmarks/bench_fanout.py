@@ -0,0 +1,137 @@
+"""
+Рассылка дайджестов N подписчикам через локальную подделку Telegram Bot API:
+прежняя схема (блокирующий requests.post на каждое сообщение, новое соединение
+на каждый вызов) против доставки через outbox (deliver_batch: пул потоков,
+Session с keep-alive, отметка результатов в БД).
+
+    python -m backend.benchmarks.bench_fanout --subscribers 10000 --latency 0.005 --rate 0
+
+latency — задержка ответа подделки в секундах, rate — общий лимит отправителя
+в сообщениях в секунду (0 — без ограничения; у настоящего Telegram около 30).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from backend.benchmarks.synthetic import generate
+from backend.notifier.check_changes import connect
+from backend.notifier.fanout import build_digests
+from backend.notifier.outbox import deliver_batch, enqueue, init_outbox_table
+from backend.notifier.subscriptions import init_subscriptions_table
+from backend.notifier.telegram_bot import TelegramSender
+
+
+def serve_bot_api(port, latency: float, calls):
+    """Подделка Bot API на 127.0.0.1: отвечает ok на sendMessage, считает вызовы в calls."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive для клиентов с пулом соединений
+        disable_nagle_algorithm = True  # иначе заголовки и тело ответа ждут delayed ACK
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if latency:
+                time.sleep(latency)
+            with calls.get_lock():
+                calls.value += 1
+            body = json.dumps({"ok": True, "result": {}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    port.value = server.server_port
+    server.serve_forever()
+
+
+def start_bot_api(latency: float):
+    """Запускает подделку в отдельном процессе, чтобы она не делила GIL с клиентом."""
+    port, calls = multiprocessing.Value("i", 0), multiprocessing.Value("i", 0)
+    process = multiprocessing.Process(target=serve_bot_api, args=(port, latency, calls), daemon=True)
+    process.start()
+    while not port.value:
+        time.sleep(0.01)
+    return process, port.value, calls
+
+
+def prepare(db_path: str, subscribers: int, groups: int):
+    generate(db_path, groups=groups, weeks=1)
+    conn = sqlite3.connect(db_path)
+    init_subscriptions_table(conn)
+    names = [name for (name,) in conn.execute("SELECT name FROM groups ORDER BY id")]
+    conn.executemany(
+        "INSERT INTO subscriptions (chat_id, kind, name, created_at) VALUES (?, 'group', ?, '')",
+        [(str(10 ** 6 + i), names[i % len(names)]) for i in range(subscribers)]
+    )
+    # смена аудитории у каждого занятия первой недели (триггеры пишут changes_log)
+    conn.execute("DELETE FROM changes_log")
+    conn.execute("UPDATE schedule SET rooms = json_array('ГУК А-' || id)")
+    conn.commit()
+    conn.close()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Бенчмарк рассылки дайджестов подписчикам")
+    p.add_argument("--subscribers", type=int, default=10000)
+    p.add_argument("--groups", type=int, default=100)
+    p.add_argument("--latency", type=float, default=0.005)
+    p.add_argument("--rate", type=float, default=0)
+    p.add_argument("--workers", type=int, default=16)
+    args = p.parse_args()
+
+    process, port, calls = start_bot_api(args.latency)
+    api_url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "fanout.db")
+        prepare(db_path, args.subscribers, args.groups)
+        conn = connect(db_path)
+        init_outbox_table(conn)
+        rows = conn.execute("SELECT * FROM changes_log ORDER BY id").fetchall()
+
+        t0 = time.perf_counter()
+        digests = build_digests(conn, rows)
+        planning = time.perf_counter() - t0
+        print(f"{len(rows)} изменений, {args.subscribers} подписчиков, "
+              f"задержка API {args.latency * 1000:.0f} мс")
+        print(f"дайджесты    {planning:>8.2f} s  {len(digests):>6} сообщений "
+              f"(без склейки было бы {sum(d.count(chr(10)) for d in digests.values())})")
+
+        url = f"{api_url}/botTOKEN/sendMessage"
+        t0 = time.perf_counter()
+        for chat_id, text in digests.items():
+            requests.post(url, json={"chat_id": chat_id, "text": text, "parse_mode": "HTML"},
+                          timeout=5)
+        print(f"поштучно     {time.perf_counter() - t0:>8.2f} s  {calls.value:>6} HTTP-вызовов")
+
+        calls.value = 0
+        sender = TelegramSender(token="TOKEN", api_url=api_url, rate=args.rate, per_chat_interval=0)
+        t0 = time.perf_counter()
+        enqueue(conn, digests, rows[-1]["id"])
+        conn.commit()
+        stats = {"sent": 0, "retry": 0, "dead": 0}
+        while True:
+            batch = deliver_batch(conn, sender, workers=args.workers)
+            if not any(batch.values()):
+                break
+            for key, value in batch.items():
+                stats[key] += value
+        conn.close()
+        print(f"outbox       {time.perf_counter() - t0:>8.2f} s  {calls.value:>6} HTTP-вызовов  {stats}")
+    process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Пересчёт occupied_rooms/room_slots на синтетических БД разного размера.
+
+    python -m backend.benchmarks.bench_filter_db --groups 100,400,1600
+
+Для каждого размера печатает время полного пересчёта и пик памяти Python
+(tracemalloc, отдельным повторным прогоном — трассировка сильно замедляет код);
+для сравнения — пик при fetchall() всего schedule ⋈ groups, как делала
+прежняя реализация.
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+from backend.benchmarks.synthetic import generate
+from backend.database.filter_db import setup_db, refresh_occupancy
+
+
+def timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def peak_mib(fn) -> float:
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def main():
+    p = argparse.ArgumentParser(description="Бенчмарк filter_db на синтетической БД")
+    p.add_argument("--groups", default="100,400,1600",
+                   help="Размеры БД (число групп) через запятую")
+    p.add_argument("--weeks", type=int, default=16)
+    args = p.parse_args()
+
+    print(f"{'groups':>7} {'lessons':>9} {'refresh, s':>11} {'peak, MiB':>10} {'fetchall peak':>14}")
+    for groups in (int(g) for g in args.groups.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            lessons = generate(path, groups=groups, weeks=args.weeks)
+            conn = sqlite3.connect(path)
+            setup_db(conn)
+
+            refresh_s = timed(lambda: refresh_occupancy(conn))
+            refresh_peak = peak_mib(lambda: refresh_occupancy(conn))
+            fetchall_peak = peak_mib(lambda: conn.execute(
+                "SELECT s.week, s.date, s.time, s.subject, s.teachers, s.rooms, g.name "
+                "FROM schedule s JOIN groups g ON s.group_id = g.id"
+            ).fetchall())
+            conn.close()
+        print(f"{groups:>7} {lessons:>9} {refresh_s:>11.2f} {refresh_peak:>10.1f} {fetchall_peak:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Синхронизация N событий с локальной подделкой Calendar API:
+поштучные вызовы с commit на каждое событие (как раньше) против пакетных.
+
+    python -m backend.benchmarks.bench_google_sync --events 1000 --latency 0.02 --qps 0
+
+latency — задержка одного HTTP-вызова подделки в секундах,
+qps — квота исполнителя в операциях в секунду (0 — без ограничения).
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from unittest import mock
+
+from backend.api import google_sync
+from backend.api.api_executor import ApiExecutor
+from backend.benchmarks.synthetic import generate_occupied
+from backend.tests.fakes import FakeCalendarService
+
+
+def serial_sync(service, group_name: str):
+    """Прежняя схема: insert().execute() и commit на каждое событие."""
+    conn = sqlite3.connect(google_sync.DB_PATH)
+    rows = conn.execute(
+        f"SELECT {google_sync.OCCUPIED_COLUMNS} FROM occupied_rooms WHERE group_name = ?",
+        (group_name,)
+    ).fetchall()
+    for key, data in google_sync._group_events(rows).items():
+        body = google_sync._event_body(key, data)
+        body.pop("id")  # прежняя схема: id выдаёт Google
+        created = service.events().insert(calendarId=google_sync.CALENDAR_ID, body=body).execute()
+        for rid in data["rowids"]:
+            conn.execute("UPDATE occupied_rooms SET google_event_id = ? WHERE rowid = ?",
+                         (created["id"], rid))
+        conn.commit()
+    conn.close()
+
+
+def run(label: str, fn, events: int, latency: float, qps: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sync.db")
+        generate_occupied(path, events)
+        service = FakeCalendarService(latency=latency)
+        executor = ApiExecutor(rate=qps or 1e9, burst=int(qps) or 10 ** 9)
+        with mock.patch.object(google_sync, "DB_PATH", path), \
+                mock.patch.object(google_sync, "get_executor", lambda: executor), \
+                mock.patch("builtins.print"):
+            t0 = time.perf_counter()
+            fn(service)
+            elapsed = time.perf_counter() - t0
+    print(f"{label:<10} {elapsed:>8.2f} s  {service.calls:>6} HTTP-вызовов")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Бенчмарк пакетной синхронизации с Google Calendar")
+    p.add_argument("--events", type=int, default=1000)
+    p.add_argument("--latency", type=float, default=0.02)
+    p.add_argument("--qps", type=float, default=0)
+    args = p.parse_args()
+
+    print(f"{args.events} событий, задержка HTTP {args.latency * 1000:.0f} мс, "
+          f"квота {args.qps or 'без ограничения'}")
+    run("поштучно", lambda s: serial_sync(s, "G1"), args.events, args.latency, args.qps)
+    run("пакетами", lambda s: google_sync.sync_group_to_calendar("G1", service=s),
+        args.events, args.latency, args.qps)
+
+
+if __name__ == "__main__":
+    main()
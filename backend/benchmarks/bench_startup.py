@@ -0,0 +1,96 @@
+"""
+Холодный старт воркеров API: N процессов одновременно импортируют
+backend.api.app, собирают приложение create_app и отвечают на первый
+запрос /groups (через test_client, без сети).
+
+Два режима на копии одной и той же синтетической БД:
+  migrate — каждый воркер сам выполняет миграцию (MIGRATE_ON_START, как
+            раньше DDL при импорте routes), воркеры ждут друг друга на блокировке;
+  check   — миграция один раз до запуска, воркеры только сверяют версию схемы.
+
+    python -m backend.benchmarks.bench_startup --workers 8 --groups 300
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from backend.api.migrations import migrate
+from backend.benchmarks.synthetic import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORKER = """
+import json, sys, time
+t0 = time.perf_counter()
+from backend.api.app import create_app
+t1 = time.perf_counter()
+app = create_app({"DATABASE": sys.argv[1], "MIGRATE_ON_START": sys.argv[2] == "1",
+                  "JOB_WORKERS": 0, "EVENT_LISTENER": False})
+t2 = time.perf_counter()
+status = app.test_client().get("/groups").status_code
+t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "create_app": t2 - t1, "first_request": t3 - t2, "status": status}))
+"""
+
+
+def run_workers(db_path, workers: int, migrate_on_start: bool) -> dict:
+    """Запускает воркеры одновременно; время в мс, wall — до ответа последнего."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    started = time.perf_counter()
+    processes = [
+        subprocess.Popen([sys.executable, "-c", WORKER, str(db_path), "1" if migrate_on_start else "0"],
+                         env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    results = []
+    for process in processes:
+        out, err = process.communicate()
+        if process.returncode:
+            raise SystemExit(f"❌ Воркер упал:\n{err}")
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    wall = time.perf_counter() - started
+
+    def worst(key):
+        return round(max(r[key] for r in results) * 1000, 1)
+
+    return {
+        "wall_ms": round(wall * 1000, 1),
+        "import_ms": worst("import"),
+        "create_app_ms": worst("create_app"),
+        "first_request_ms": worst("first_request"),
+        "errors": sum(1 for r in results if r["status"] != 200),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Бенчмарк холодного старта воркеров API")
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--groups", type=int, default=300)
+    p.add_argument("--repeat", type=int, default=3)
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, "base.db")
+        generate(base, groups=args.groups)
+        print(f"{'режим':<10}{'wall мс':>10}{'импорт':>10}{'create_app':>12}{'1-й запрос':>12}{'ошибок':>8}")
+        for mode in ("migrate", "check"):
+            rows = []
+            for i in range(args.repeat):
+                db = os.path.join(tmp, f"{mode}-{i}.db")
+                shutil.copy(base, db)
+                if mode == "check":
+                    migrate(db)
+                rows.append(run_workers(db, args.workers, migrate_on_start=mode == "migrate"))
+            # медиана по повторам: первый прогон греет кеш ФС и байткод
+            best = sorted(rows, key=lambda r: r["wall_ms"])[len(rows) // 2]
+            print(f"{mode:<10}{best['wall_ms']:>10}{best['import_ms']:>10}{best['create_app_ms']:>12}"
+                  f"{best['first_request_ms']:>12}{best['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
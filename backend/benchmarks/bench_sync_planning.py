@@ -0,0 +1,71 @@
+"""
+Планирование синхронизации за одну неделю на истории из нескольких семестров:
+прежний отбор (весь occupied_rooms + разбор каждой даты регуляркой) против
+индексного BETWEEN по ISO-дате. Время второго не должно зависеть от истории.
+
+    python -m backend.benchmarks.bench_sync_planning --semesters 1 4 8
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import tempfile
+import time
+
+from backend.api import google_sync
+from backend.api.migrations import migrate
+from backend.benchmarks.synthetic import SEMESTER_START, generate_occupied_history
+from backend.database.dates import parse_date_str
+
+
+def legacy_plan(conn, start_date, end_date):
+    """Как раньше: читаем всю таблицу и разбираем дату каждой строки регуляркой."""
+    rows = []
+    columns = google_sync.OCCUPIED_COLUMNS.replace("date", "NULL")
+    for row in conn.execute(f"SELECT {columns} FROM occupied_rooms"):
+        date_obj = parse_date_str(row[2])
+        if date_obj and start_date <= date_obj <= end_date:
+            rows.append(row[:-1] + (date_obj.isoformat(),))
+    return google_sync._group_events(rows)
+
+
+def indexed_plan(conn, start_date, end_date):
+    return google_sync._group_events(google_sync.range_rows(conn, start_date, end_date))
+
+
+def timed(fn, *args, repeat: int = 3):
+    best, result = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, result
+
+
+def main():
+    p = argparse.ArgumentParser(description="Бенчмарк отбора занятий для синхронизации по диапазону")
+    p.add_argument("--semesters", type=int, nargs="+", default=[1, 4, 8])
+    p.add_argument("--lessons-per-day", type=int, default=40)
+    args = p.parse_args()
+
+    # неделя 10 последнего семестра
+    start_date = SEMESTER_START + datetime.timedelta(weeks=9)
+    end_date = start_date + datetime.timedelta(days=6)
+    print(f"диапазон {start_date} — {end_date}")
+    for semesters in args.semesters:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "history.db")
+            total = generate_occupied_history(path, semesters, args.lessons_per_day)
+            migrate(path)
+            conn = sqlite3.connect(path)
+            legacy_ms, legacy = timed(legacy_plan, conn, start_date, end_date)
+            indexed_ms, indexed = timed(indexed_plan, conn, start_date, end_date)
+            conn.close()
+        assert len(legacy) == len(indexed)
+        print(f"{semesters} сем. ({total:>7} строк): событий {len(indexed):>5}, "
+              f"полный проход {legacy_ms:>8.1f} мс, индекс {indexed_ms:>6.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Нагрузочный тест API: запросы к /schedule, /groups и эндпоинтам аудиторий
+с заданной частотой (открытая модель — запросы отправляются по расписанию,
+не дожидаясь ответов), отчёт о задержках p50/p95/p99 и пропускной способности.
+
+Задержка считается от запланированного момента отправки, так что очередь на
+стороне клиента при перегрузке тоже видна в процентилях. Параметры запросов
+(группы, недели, даты) берутся из той же БД, на которой работает API.
+
+    python -m backend.benchmarks.synthetic --db /tmp/university.db --groups 3000 --occupancy
+    python -m backend.benchmarks.load_test --db /tmp/university.db --serve --rps 200 --duration 30
+    python -m backend.benchmarks.load_test --url http://127.0.0.1:5000 --rps 50 --mix schedule=1
+"""
+import argparse
+import json
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import requests
+
+from backend.api.api_executor import PerThread
+from backend.database.database import DB_PATH
+
+DEFAULT_MIX = {"schedule": 60, "groups": 10, "free_rooms": 10, "rooms_find": 15, "utilization": 5}
+
+
+def percentile(sorted_values: list, q: float):
+    """Процентиль q (0–100) по отсортированному списку, метод ближайшего ранга."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * q // 100))  # ceil без float
+    return sorted_values[int(min(rank, len(sorted_values))) - 1]
+
+
+def request_factories(db_path) -> dict:
+    """{эндпоинт: функция(rnd) -> путь с параметрами} по данным БД."""
+    conn = sqlite3.connect(db_path)
+    try:
+        groups = [r[0] for r in conn.execute("SELECT name FROM groups")]
+        weeks = [r[0] for r in conn.execute("SELECT DISTINCT week FROM schedule ORDER BY week")]
+        dates = [date.fromisoformat(r[0]) for r in conn.execute(
+            "SELECT DISTINCT date_iso FROM schedule WHERE date_iso IS NOT NULL")]
+    finally:
+        conn.close()
+    if not groups or not weeks or not dates:
+        raise SystemExit(f"❌ В {db_path} нет расписания: сначала python -m backend.benchmarks.synthetic")
+
+    return {
+        "schedule": lambda rnd: f"/schedule?group={rnd.choice(groups)}&week={rnd.choice(weeks)}",
+        "groups": lambda rnd: "/groups",
+        "free_rooms": lambda rnd: f"/free_rooms?week={rnd.choice(weeks)}",
+        "rooms_find": lambda rnd: (
+            f"/rooms/find?start_date={rnd.choice(dates).strftime('%d.%m.%Y')}"
+            f"&duration=90&count={rnd.choice((1, 1, 1, 2))}&limit=20"
+        ),
+        "utilization": lambda rnd: f"/rooms/utilization?week={rnd.choice(weeks)}",
+    }
+
+
+def run_load(base_url: str, factories: dict, mix: dict, rps: float, duration: float,
+             warmup: float = 2.0, concurrency: int = 64, seed: int = 0, timeout: float = 30.0) -> dict:
+    """
+    Отправляет запросы с частотой rps в течение warmup + duration секунд;
+    результаты разогрева в отчёт не входят. Возвращает отчёт (см. summarize).
+    """
+    rnd = random.Random(seed)
+    names = [name for name in mix if mix[name] > 0]
+    weights = [mix[name] for name in names]
+    sessions = PerThread(requests.Session)
+    results = []
+    lock = threading.Lock()
+
+    def fire(name, path, due, measured):
+        try:
+            status = sessions.get().get(base_url + path, timeout=timeout).status_code
+        except requests.RequestException:
+            status = 0
+        latency = time.perf_counter() - due
+        if measured:
+            with lock:
+                results.append((name, status, latency))
+
+    total = int((warmup + duration) * rps)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load") as pool:
+        for i in range(total):
+            due = started + i / rps
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            name = rnd.choices(names, weights=weights, k=1)[0]
+            pool.submit(fire, name, factories[name](rnd), due, due - started >= warmup)
+        sent_until = time.perf_counter()
+    elapsed = time.perf_counter() - started - warmup
+    report = summarize(results, elapsed)
+    report["target_rps"] = rps
+    # клиент не успевал отправлять по расписанию — цифры занижают возможности сервера
+    report["client_lag_s"] = round(max(0.0, sent_until - started - total / rps), 3)
+    return report
+
+
+def summarize(results: list, elapsed: float) -> dict:
+    """[(эндпоинт, HTTP-статус или 0, задержка с)] -> отчёт по эндпоинтам и в целом."""
+    def stats(rows):
+        latencies = sorted(r[2] for r in rows)
+        ms = lambda q: round(percentile(latencies, q) * 1000, 1) if latencies else None
+        return {
+            "requests": len(rows),
+            "errors": sum(1 for r in rows if not 200 <= r[1] < 400),
+            "rps": round(len(rows) / elapsed, 1) if elapsed > 0 else None,
+            "p50_ms": ms(50), "p95_ms": ms(95), "p99_ms": ms(99),
+        }
+
+    by_endpoint = {}
+    for row in results:
+        by_endpoint.setdefault(row[0], []).append(row)
+    return {
+        "total": stats(results),
+        "endpoints": {name: stats(rows) for name, rows in sorted(by_endpoint.items())},
+    }
+
+
+def print_report(report: dict):
+    print(f"{'эндпоинт':<14}{'запросов':>10}{'ошибок':>8}{'rps':>8}{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}")
+    rows = list(report["endpoints"].items()) + [("ИТОГО", report["total"])]
+    for name, s in rows:
+        print(f"{name:<14}{s['requests']:>10}{s['errors']:>8}{s['rps'] or 0:>8}"
+              f"{s['p50_ms'] or 0:>10}{s['p95_ms'] or 0:>10}{s['p99_ms'] or 0:>10}")
+    print(f"Цель {report['target_rps']} rps; отставание клиента {report['client_lag_s']} с")
+
+
+def start_api(db_path, port: int = 0) -> tuple[subprocess.Popen, str]:
+    """Поднимает API на db_path отдельным процессом и ждёт первого ответа."""
+    if not port:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+    process = subprocess.Popen([sys.executable, "-m", "backend.api.app", "--db", str(db_path),
+                                "--port", str(port)],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        if process.poll() is not None:
+            raise SystemExit("❌ API не запустился")
+        try:
+            requests.get(url + "/groups", timeout=1)
+            return process, url
+        except requests.RequestException:
+            time.sleep(0.1)
+    process.terminate()
+    raise SystemExit("❌ API не ответил за 30 с")
+
+
+def parse_mix(text: str) -> dict:
+    """'schedule=60,groups=10' -> {"schedule": 60.0, "groups": 10.0}."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"неизвестный эндпоинт {name!r}, есть: {', '.join(DEFAULT_MIX)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    p = argparse.ArgumentParser(description="Нагрузочный тест API расписания")
+    p.add_argument("--db", default=str(DB_PATH), help="БД, из которой берутся параметры запросов")
+    p.add_argument("--url", default="http://127.0.0.1:5000")
+    p.add_argument("--serve", action="store_true", help="поднять API на --db отдельным процессом")
+    p.add_argument("--rps", type=float, default=100)
+    p.add_argument("--duration", type=float, default=30)
+    p.add_argument("--warmup", type=float, default=2)
+    p.add_argument("--concurrency", type=int, default=64, help="одновременных запросов не больше")
+    p.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                   help="доли эндпоинтов, напр. schedule=60,groups=10,rooms_find=30")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--json", help="сохранить отчёт в файл")
+    args = p.parse_args()
+
+    factories = request_factories(args.db)
+    process, url = start_api(args.db) if args.serve else (None, args.url)
+    try:
+        print(f"▶️ {args.rps} rps × {args.duration} с на {url} (разогрев {args.warmup} с)…")
+        report = run_load(url, factories, args.mix, args.rps, args.duration,
+                          warmup=args.warmup, concurrency=args.concurrency, seed=args.seed)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+"""
+Синтетические данные для бенчмарков и нагрузочного теста.
+
+generate — равномерный случайный набор для микробенчмарков; generate_university —
+расписание вуза целиком: институты и потоки групп с общими лекциями,
+преподаватели кафедр с неравномерной нагрузкой, лекционные, обычные аудитории
+и лаборатории по корпусам, шаблоны недель «числитель/знаменатель» без
+накладок по группе, преподавателю и аудитории.
+
+    python -m backend.benchmarks.synthetic --db /tmp/university.db --groups 3000 --weeks 19 --occupancy
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta, datetime, timezone
+
+from backend.database.database import init_db, create_app_tables, create_change_triggers
+from backend.database.dates import MONTHS, SEMESTER_START, WEEKDAYS, parse_hhmm
+from backend.database.filter_db import ALLOWED_IT_ROOMS, get_changed_pairs, refresh_occupancy, setup_db
+from backend.database.occupancy import SLOTS
+
+MONTH_NAMES = {num: name for name, num in MONTHS.items()}
+BUILDINGS = ["ГУК А", "ГУК Б", "ГУК В", "Орш. А", "Орш. Б", "Орш. В", "3", "5", "9", "24"]
+KINDS = ["ЛК", "ПЗ", "ЛР"]
+INSERT_SCHEDULE = (
+    "INSERT INTO schedule (group_id, week, date, time, subject, teachers, rooms, "
+    "date_iso, start_min, end_min) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def date_label(week: int, weekday: int) -> str:
+    """Дата в формате сайта МАИ: неделя 16, weekday=4 -> 'Пт, 30 мая'."""
+    day = SEMESTER_START + timedelta(weeks=week - 1, days=weekday)
+    return f"{WEEKDAYS[weekday]}, {day.day} {MONTH_NAMES[day.month]}"
+
+
+def room_pool(per_building: int = 60) -> list[str]:
+    rooms = set(ALLOWED_IT_ROOMS)
+    for building in BUILDINGS:
+        for i in range(per_building):
+            floor, num = 1 + i % 7, 1 + i // 7
+            rooms.add(f"{building}-{floor}{num:02d}")
+    return sorted(rooms)
+
+
+def generate(db_path, groups: int = 100, weeks: int = 16, lessons_per_day: tuple = (2, 4),
+             seed: int = 0, batch: int = 10000) -> int:
+    """
+    Заполняет БД db_path синтетическими группами и расписанием.
+    Возвращает число вставленных уроков.
+    """
+    rnd = random.Random(seed)
+    rooms = room_pool()
+    teachers = [f"Преподаватель {i}" for i in range(max(10, groups // 2))]
+    subjects = [f"Дисциплина {i}" for i in range(max(20, groups // 4))]
+
+    conn = sqlite3.connect(db_path)
+    init_db(conn)
+    create_app_tables(conn)
+    now = datetime.now(timezone.utc).isoformat()
+    conn.executemany(
+        "INSERT OR IGNORE INTO groups (id, name, link) VALUES (?, ?, '')",
+        [(g, f"М8О-{100 + g}Б-{20 + g % 5}") for g in range(1, groups + 1)]
+    )
+
+    rows = []
+    total = 0
+    for gid in range(1, groups + 1):
+        for week in range(1, weeks + 1):
+            lessons = []
+            for weekday in range(6):
+                count = rnd.randint(*lessons_per_day)
+                for slot in sorted(rnd.sample(range(len(SLOTS)), count)):
+                    start, end = SLOTS[slot]
+                    lesson = {
+                        "date": date_label(week, weekday),
+                        "time": f"{start} – {end}",
+                        "subject": f"{rnd.choice(subjects)} {rnd.choice(KINDS)}",
+                        "teachers": [rnd.choice(teachers)],
+                        "rooms": [rnd.choice(rooms)],
+                    }
+                    lessons.append(lesson)
+                    day = SEMESTER_START + timedelta(weeks=week - 1, days=weekday)
+                    rows.append((
+                        gid, week, lesson["date"], lesson["time"], lesson["subject"],
+                        json.dumps(lesson["teachers"], ensure_ascii=False),
+                        json.dumps(lesson["rooms"], ensure_ascii=False),
+                        day.isoformat(), parse_hhmm(start), parse_hhmm(end),
+                    ))
+            conn.execute(
+                "INSERT OR REPLACE INTO parser_pairs (group_id, week, json_data, parsed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (gid, week, json.dumps(lessons, ensure_ascii=False), now)
+            )
+            if len(rows) >= batch:
+                conn.executemany(
+                    INSERT_SCHEDULE, rows
+                )
+                total += len(rows)
+                rows = []
+    if rows:
+        conn.executemany(
+            INSERT_SCHEDULE, rows
+        )
+        total += len(rows)
+    conn.commit()
+    conn.close()
+    return total
+
+
+def generate_occupied(db_path, lessons: int, group: str = "G1") -> int:
+    """occupied_rooms с lessons разными занятиями группы group в мае 2025 (для синхронизации)."""
+    conn = sqlite3.connect(db_path)
+    init_db(conn)
+    create_app_tables(conn)
+    rows = [
+        (16, f"{1 + i % 28} мая 2025", "09:00", "10:30", f"ГУК Б-{100 + i}", f"S{i}", "T",
+         group, group, date(2025, 5, 1 + i % 28).isoformat())
+        for i in range(lessons)
+    ]
+    conn.executemany(
+        "INSERT INTO occupied_rooms "
+        "(week, day, start_time, end_time, room, subject, teacher, group_name, groups, date) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+    )
+    conn.commit()
+    conn.close()
+    return lessons
+
+
+def generate_occupied_history(db_path, semesters: int, lessons_per_day: int = 40) -> int:
+    """
+    occupied_rooms за semesters семестров по 16 недель, последний из них начинается
+    в SEMESTER_START, предыдущие — каждые 26 недель назад. Даты в day записаны с годом,
+    так что разбор строк даёт те же даты, что и колонка date.
+    Возвращает число строк.
+    """
+    conn = sqlite3.connect(db_path)
+    init_db(conn)
+    create_app_tables(conn)
+    total = 0
+    for sem in range(semesters):
+        start = SEMESTER_START - timedelta(weeks=26 * sem)
+        rows = []
+        for week in range(1, 17):
+            for weekday in range(6):
+                day = start + timedelta(weeks=week - 1, days=weekday)
+                label = f"{WEEKDAYS[weekday]}, {day.day} {MONTH_NAMES[day.month]} {day.year}"
+                for i in range(lessons_per_day):
+                    slot_start, slot_end = SLOTS[i % len(SLOTS)]
+                    rows.append((week, label, slot_start, slot_end, f"ГУК Б-{100 + i}",
+                                 f"S{i}", "T", "G1", "G1", day.isoformat()))
+        conn.executemany(
+            "INSERT INTO occupied_rooms "
+            "(week, day, start_time, end_time, room, subject, teacher, group_name, groups, date) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        total += len(rows)
+    conn.commit()
+    conn.close()
+    return total
+
+
+# ——— Расписание вуза ——— #
+INSTITUTES = 12
+# (уровень, число курсов, доля групп): бакалавриат, специалитет, магистратура
+LEVELS = [("Б", 4, 0.7), ("С", 5, 0.15), ("М", 2, 0.15)]
+STREAM_SIZE = (3, 6)             # групп в потоке (общие лекции)
+SUBJECTS_PER_STREAM = (8, 10)
+MAX_TEACHER_LOAD = 20            # пар в неделю у одного преподавателя
+# Вес пары по номеру: первые пары заняты чаще вечерних; суббота — вполсилы
+SLOT_WEIGHTS = [10, 10, 9, 7, 4, 2, 1]
+WEEKDAY_WEIGHTS = [10, 10, 10, 10, 9, 4]
+PLACEMENT_TRIES = 60
+SURNAMES = [
+    "Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов",
+    "Новиков", "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев", "Семёнов", "Егоров",
+    "Павлов", "Козлов", "Степанов", "Николаев", "Орлов", "Андреев", "Макаров", "Никитин",
+    "Захаров", "Зайцев", "Соловьёв", "Борисов", "Яковлев", "Григорьев", "Романов", "Воробьёв",
+]
+INITIALS = "АБВГДЕИКЛМНОПРСТЮЯ"
+SUBJECT_NAMES = [
+    "Математический анализ", "Линейная алгебра", "Дифференциальные уравнения", "Физика",
+    "Теоретическая механика", "Сопротивление материалов", "Информатика", "Программирование",
+    "Базы данных", "Операционные системы", "Компьютерные сети", "Теория вероятностей",
+    "Дискретная математика", "Численные методы", "Электротехника", "Материаловедение",
+    "Инженерная графика", "Аэродинамика", "Теория управления", "Экономика", "Философия",
+    "История России", "Иностранный язык", "Физическая культура", "Химия", "Термодинамика",
+    "Конструирование ЛА", "Системы автоматизированного проектирования", "Радиотехника",
+    "Цифровая обработка сигналов", "Машинное обучение", "Криптография",
+]
+
+
+def _weighted(rnd: random.Random, items: list, weights: list):
+    return rnd.choices(items, weights=weights, k=1)[0]
+
+
+def _teacher_name(rnd: random.Random, used: set) -> str:
+    while True:
+        name = f"{rnd.choice(SURNAMES)} {rnd.choice(INITIALS)}.{rnd.choice(INITIALS)}."
+        if name not in used:
+            used.add(name)
+            return name
+
+
+def university_groups(rnd: random.Random, groups: int) -> list[dict]:
+    """Группы вида М8О-101Б-24 по институтам, уровням и курсам; год — год набора."""
+    inst_weights = [rnd.uniform(0.5, 2.0) for _ in range(INSTITUTES)]
+    keys, weights = [], []
+    for inst in range(1, INSTITUTES + 1):
+        for level, courses, share in LEVELS:
+            for course in range(1, courses + 1):
+                keys.append((inst, level, course))
+                weights.append(inst_weights[inst - 1] * share / courses)
+    counts = {}
+    for key in rnd.choices(keys, weights=weights, k=groups):
+        counts[key] = counts.get(key, 0) + 1
+    result = []
+    for (inst, level, course), count in sorted(counts.items()):
+        year = (SEMESTER_START.year - course) % 100
+        for n in range(1, count + 1):
+            result.append({
+                "name": f"М{inst}О-{course}{n:02d}{level}-{year:02d}",
+                "inst": inst, "level": level, "course": course,
+            })
+    return result
+
+
+def university_rooms(groups: int, buildings: list = BUILDINGS) -> dict:
+    """
+    {"lecture"|"class"|"lab": {корпус: [аудитории]}}: аудиторий столько, чтобы
+    недельная сетка групп занимала их примерно на две трети.
+    """
+    per_building = max(1, groups) / len(buildings)
+    sizes = {
+        "lecture": 3 + math.ceil(per_building * 0.06),
+        "class": 20 + math.ceil(per_building * 0.45),
+        "lab": 5 + math.ceil(per_building * 0.15),
+    }
+    pools = {kind: {} for kind in sizes}
+    for building in buildings:
+        number = 0
+        for kind, size in sizes.items():
+            rooms = []
+            for _ in range(size):
+                floor, num = 1 + number % 9, 1 + number // 9
+                rooms.append(f"{building}-{floor}{num:02d}")
+                number += 1
+            pools[kind][building] = rooms
+    pools["lab"]["ГУК Б"] = sorted(set(pools["lab"]["ГУК Б"]) | ALLOWED_IT_ROOMS)
+    return pools
+
+
+_EMPTY = frozenset()
+
+
+class _Timetable:
+    """Занятость слотов (чётность недели, день, пара) группами, преподавателями и аудиториями."""
+
+    def __init__(self, rnd: random.Random, rooms: dict):
+        self.rnd = rnd
+        self.rooms = rooms
+        self.busy = {}  # (parity, weekday, slot) -> set
+        self.load = {}  # (parity, преподаватель) -> пар в неделю
+        self.slots = [(d, s) for d in range(len(WEEKDAY_WEIGHTS)) for s in range(len(SLOTS))]
+        self.slot_weights = [WEEKDAY_WEIGHTS[d] * SLOT_WEIGHTS[s] for d, s in self.slots]
+
+    def _free(self, parities, day_slot, keys) -> bool:
+        return all(self.busy.get((p, *day_slot), _EMPTY).isdisjoint(keys) for p in parities)
+
+    def pick_teacher(self, teachers: list, weights: list) -> str:
+        """Преподаватель кафедры по весам нагрузки, но не сверх MAX_TEACHER_LOAD."""
+        for _ in range(PLACEMENT_TRIES):
+            teacher = _weighted(self.rnd, teachers, weights)
+            if max(self.load.get((p, teacher), 0) for p in (0, 1)) < MAX_TEACHER_LOAD:
+                return teacher
+        return self.rnd.choice(teachers)
+
+    def place(self, parities: tuple, groups: list, teacher: str, kind: str, building: str):
+        """Ставит занятие в свободный слот; (день, пара, аудитория) или None."""
+        keys = {("group", g) for g in groups} | {("teacher", teacher)}
+        home = self.rooms[kind][building]
+        for day_slot in self.rnd.choices(self.slots, weights=self.slot_weights, k=PLACEMENT_TRIES):
+            if not self._free(parities, day_slot, keys):
+                continue
+            # 85% занятий — в корпусе своего института
+            pool = home if self.rnd.random() < 0.85 else self.rooms[kind][self.rnd.choice(BUILDINGS)]
+            for room in self.rnd.sample(pool, min(len(pool), 8)):
+                if self._free(parities, day_slot, {("room", room)}):
+                    for p in parities:
+                        self.busy.setdefault((p, *day_slot), set()).update(keys | {("room", room)})
+                        self.load[(p, teacher)] = self.load.get((p, teacher), 0) + 1
+                    return day_slot[0], day_slot[1], room
+        return None
+
+
+def generate_university(db_path, groups: int = 3000, weeks: int = 19, seed: int = 0,
+                        pairs: bool = False, batch: int = 20000) -> dict:
+    """
+    Заполняет пустую БД db_path расписанием вуза из groups групп на weeks недель.
+    pairs=True — ещё и кеш парсера parser_pairs (заметно больше файл).
+    Возвращает счётчики {"groups", "teachers", "rooms", "lessons"}.
+    """
+    rnd = random.Random(seed)
+    group_list = university_groups(rnd, groups)
+    rooms = university_rooms(len(group_list))
+    timetable = _Timetable(rnd, rooms)
+
+    # кафедры: преподавателей около 0.6 на группу института, нагрузка по закону Ципфа
+    used_names = set()
+    staff = {}
+    for inst in range(1, INSTITUTES + 1):
+        size = max(8, sum(g["inst"] == inst for g in group_list) * 3 // 5)
+        staff[inst] = [_teacher_name(rnd, used_names) for _ in range(size)]
+    staff_weights = {inst: [1 / (rank + 1) ** 0.8 for rank in range(len(t))] for inst, t in staff.items()}
+
+    # потоки: группы одного института, уровня и курса
+    by_key = {}
+    for gid, group in enumerate(group_list, start=1):
+        by_key.setdefault((group["inst"], group["level"], group["course"]), []).append(gid)
+    template = {gid: ([], []) for gid in range(1, len(group_list) + 1)}  # занятия по чётности
+    for (inst, level, course), members in sorted(by_key.items()):
+        building = BUILDINGS[inst % len(BUILDINGS)]
+        teachers, weights = staff[inst], staff_weights[inst]
+        start = 0
+        while start < len(members):
+            stream = members[start:start + rnd.randint(*STREAM_SIZE)]
+            start += len(stream)
+            subjects = rnd.sample(SUBJECT_NAMES, rnd.randint(*SUBJECTS_PER_STREAM))
+            for subject in subjects:
+                lessons = [("ЛК", stream, timetable.pick_teacher(teachers, weights), "lecture")]
+                for gid in stream:
+                    lessons.append(("ПЗ", [gid], timetable.pick_teacher(teachers, weights), "class"))
+                    if rnd.random() < 0.4:
+                        lessons.append(("ЛР", [gid], timetable.pick_teacher(teachers, weights), "lab"))
+                for kind, lesson_groups, teacher, room_kind in lessons:
+                    # каждую неделю или через неделю (числитель/знаменатель)
+                    parities = (0, 1) if rnd.random() < 0.5 else (rnd.randint(0, 1),)
+                    placed = timetable.place(parities, lesson_groups, teacher, room_kind, building)
+                    if placed is None:
+                        continue
+                    weekday, slot, room = placed
+                    for gid in lesson_groups:
+                        for p in parities:
+                            template[gid][p].append((weekday, slot, f"{subject} {kind}", teacher, room))
+
+    conn = sqlite3.connect(db_path)
+    init_db(conn)
+    create_app_tables(conn)
+    # массовая загрузка — не изменения расписания: без триггеров changes_log
+    for trigger in ("schedule_log_insert", "schedule_log_update", "schedule_log_delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.executemany(
+        "INSERT INTO groups (id, name, link) VALUES (?, ?, '')",
+        [(gid, group["name"]) for gid, group in enumerate(group_list, start=1)]
+    )
+    now = datetime.now(timezone.utc).isoformat()
+    rows, total = [], 0
+    for gid, by_parity in template.items():
+        for week in range(1, weeks + 1):
+            lessons = sorted(by_parity[week % 2])
+            week_json = []
+            for weekday, slot, subject, teacher, room in lessons:
+                start, end = SLOTS[slot]
+                day = SEMESTER_START + timedelta(weeks=week - 1, days=weekday)
+                lesson = {
+                    "date": date_label(week, weekday), "time": f"{start} – {end}",
+                    "subject": subject, "teachers": [teacher], "rooms": [room],
+                }
+                rows.append((
+                    gid, week, lesson["date"], lesson["time"], subject,
+                    json.dumps(lesson["teachers"], ensure_ascii=False),
+                    json.dumps(lesson["rooms"], ensure_ascii=False),
+                    day.isoformat(), parse_hhmm(start), parse_hhmm(end),
+                ))
+                week_json.append(lesson)
+            if pairs:
+                conn.execute(
+                    "INSERT OR REPLACE INTO parser_pairs (group_id, week, json_data, parsed_at) "
+                    "VALUES (?, ?, ?, ?)", (gid, week, json.dumps(week_json, ensure_ascii=False), now)
+                )
+            if len(rows) >= batch:
+                conn.executemany(INSERT_SCHEDULE, rows)
+                total += len(rows)
+                rows = []
+    if rows:
+        conn.executemany(INSERT_SCHEDULE, rows)
+        total += len(rows)
+    create_change_triggers(conn)
+    conn.commit()
+    conn.close()
+    return {
+        "groups": len(group_list),
+        "teachers": len(used_names),
+        "rooms": sum(len(r) for pool in rooms.values() for r in pool.values()),
+        "lessons": total,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Синтетическое расписание вуза для нагрузочного теста")
+    p.add_argument("--db", required=True, help="файл новой БД")
+    p.add_argument("--groups", type=int, default=3000)
+    p.add_argument("--weeks", type=int, default=19)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--pairs", action="store_true", help="заполнить и кеш парсера parser_pairs")
+    p.add_argument("--occupancy", action="store_true",
+                   help="сразу посчитать occupied_rooms и room_slots (как filter_db)")
+    p.add_argument("--force", action="store_true", help="перезаписать существующий файл")
+    args = p.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.force:
+            print(f"❌ {args.db} уже существует (--force — перезаписать)")
+            return
+        os.remove(args.db)
+    started = time.perf_counter()
+    stats = generate_university(args.db, groups=args.groups, weeks=args.weeks,
+                                seed=args.seed, pairs=args.pairs)
+    print(f"✅ Групп {stats['groups']}, преподавателей {stats['teachers']}, "
+          f"аудиторий {stats['rooms']}, занятий {stats['lessons']} "
+          f"за {time.perf_counter() - started:.1f} с")
+    if args.occupancy:
+        started = time.perf_counter()
+        conn = sqlite3.connect(args.db)
+        setup_db(conn)
+        refresh_occupancy(conn, None, get_changed_pairs(conn)[1])
+        conn.close()
+        print(f"✅ Занятость аудиторий посчитана за {time.perf_counter() - started:.1f} с")
+    print(f"Запуск API на этой БД: python -m backend.api.app --db {args.db}")
+
+
+if __name__ == "__main__":
+    main()
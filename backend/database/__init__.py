@@ -1,20 +1,34 @@
-from .database import (
-    DB_PATH,
-    get_connection,
-    init_db,
-    get_groups_with_id,
-    save_groups,
-    get_cached_pairs,
-    save_pairs,
-    save_schedule,
-)
-
-__all__ = [
-    "DB_PATH",
-    "get_connection",
-    "init_db",
-    "get_groups_with_id",
-    "save_groups",
-    "get_cached_pairs",
-    "save_pairs",
-]
+from .database import (
+    DB_PATH,
+    get_connection,
+    init_db,
+    create_tables,
+    create_change_triggers,
+    get_data_version,
+    get_meta,
+    set_meta,
+    upgrade_occupied_rooms,
+    upgrade_schedule,
+    get_groups_with_id,
+    save_groups,
+    get_cached_pairs,
+    save_pairs,
+    save_schedule,
+)
+
+__all__ = [
+    "DB_PATH",
+    "get_connection",
+    "init_db",
+    "create_tables",
+    "create_change_triggers",
+    "get_data_version",
+    "get_meta",
+    "set_meta",
+    "upgrade_occupied_rooms",
+    "upgrade_schedule",
+    "get_groups_with_id",
+    "save_groups",
+    "get_cached_pairs",
+    "save_pairs",
+]
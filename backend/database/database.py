@@ -4,10 +4,13 @@ import json
 from pathlib import Path
 from datetime import datetime, timezone
 
+from backend.database.dates import resolve_lesson, resolve_lesson_date
+
 # Путь к БД — backend/mai_schedule.db
 BASE_DIR = Path(__file__).resolve().parent
-# главный файл БД лежит рядом с каталогом backend
-DB_PATH = BASE_DIR.parent / "mai_schedule.db"
+# главный файл БД лежит рядом с каталогом backend; DATABASE_PATH — другая БД
+# (например, синтетическая из benchmarks/synthetic.py для нагрузочного теста)
+DB_PATH = Path(os.getenv("DATABASE_PATH") or BASE_DIR.parent / "mai_schedule.db")
 
 
 def get_connection() -> sqlite3.Connection:
@@ -52,13 +55,120 @@ def init_db(conn: sqlite3.Connection):
         teachers   TEXT    NOT NULL,  -- JSON array
         rooms      TEXT    NOT NULL,  -- JSON array
         is_custom  INTEGER DEFAULT 0,
+        date_iso   TEXT,     -- дата занятия YYYY-MM-DD, вычислена из week и date при записи
+        start_min  INTEGER,  -- начало и конец в минутах от полуночи
+        end_min    INTEGER,
         FOREIGN KEY(group_id) REFERENCES groups(id) ON DELETE CASCADE
     );
     """)
+    upgrade_schedule(conn)
+
+    # лог изменений schedule: пишется триггерами, читается notifier по id
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS changes_log (
+        id           INTEGER PRIMARY KEY AUTOINCREMENT,
+        schedule_id  INTEGER,
+        change_type  TEXT    CHECK (change_type IN ('create', 'update', 'delete')),
+        changed_at   TEXT    NOT NULL,
+        old_data     TEXT,  -- JSON-образ строки до изменения (NULL для create)
+        new_data     TEXT   -- JSON-образ строки после изменения (NULL для delete)
+    );
+    """)
+    create_change_triggers(conn)
+
+    # шина событий (database/events.py): «неделя группы изменилась» и т.п.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS events (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        topic       TEXT    NOT NULL,
+        payload     TEXT    NOT NULL,  -- JSON
+        created_at  TEXT    NOT NULL
+    );
+    """)
+
+    # служебные отметки: водяные знаки инкрементальных задач и т.п.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS meta (
+        key    TEXT PRIMARY KEY,
+        value  TEXT
+    );
+    """)
 
     conn.commit()
 
 
+def upgrade_schedule(conn: sqlite3.Connection):
+    """
+    Доводит парсерную schedule из старых БД до текущей схемы: колонки
+    date_iso/start_min/end_min с индексом, индекс по (group_id, week)
+    и заполнение колонок у строк без date_iso
+    (по одному разбору на уникальную тройку (week, date, time)).
+    Строки, записанные позже в обход save_schedule, читатели разбирают сами
+    (dates.lesson_columns); триггер сбрасывает колонки, если UPDATE меняет
+    неделю, дату или время, не пересчитав их, — иначе остались бы старые.
+    Таблицу schedule из create_app_tables (другая схема) не трогает.
+    """
+    cols = {c[1] for c in conn.execute("PRAGMA table_info(schedule)")}
+    if not {"week", "date", "time"} <= cols:
+        return
+    for col, kind in (("date_iso", "TEXT"), ("start_min", "INTEGER"), ("end_min", "INTEGER")):
+        if col not in cols:
+            conn.execute(f"ALTER TABLE schedule ADD COLUMN {col} {kind}")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_schedule_date ON schedule(date_iso, start_min);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_schedule_group_week ON schedule(group_id, week);")
+    conn.execute("""
+    CREATE TRIGGER IF NOT EXISTS schedule_reset_resolved AFTER UPDATE OF week, date, time ON schedule
+    WHEN NEW.date_iso IS OLD.date_iso AND NEW.start_min IS OLD.start_min AND NEW.end_min IS OLD.end_min
+    BEGIN
+        UPDATE schedule SET date_iso = NULL, start_min = NULL, end_min = NULL WHERE id = NEW.id;
+    END;
+    """)
+
+    resolved = {}
+    updates = []
+    for row_id, week, date, time in conn.execute(
+            "SELECT id, week, date, time FROM schedule WHERE date_iso IS NULL").fetchall():
+        key = (week, date, time)
+        if key not in resolved:
+            resolved[key] = resolve_lesson(week, date, time)
+        updates.append(resolved[key] + (row_id,))
+    conn.executemany(
+        "UPDATE schedule SET date_iso = ?, start_min = ?, end_min = ? WHERE id = ?", updates
+    )
+
+
+def get_meta(conn: sqlite3.Connection, key: str, default: str | None = None) -> str | None:
+    row = conn.execute("SELECT value FROM meta WHERE key=?;", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def set_meta(conn: sqlite3.Connection, key: str, value):
+    """Записывает отметку в текущей транзакции, commit — за вызывающим."""
+    conn.execute("""
+    INSERT INTO meta(key, value) VALUES (?, ?)
+    ON CONFLICT(key) DO UPDATE SET value=excluded.value;
+    """, (key, str(value)))
+
+
+def create_tables():
+    """Создаёт все таблицы: парсерные (init_db) и прикладные (create_app_tables)."""
+    conn = get_connection()
+    init_db(conn)
+    create_app_tables(conn)
+    conn.close()
+
+
+def get_data_version(conn: sqlite3.Connection) -> tuple:
+    """
+    Дешёвый «отпечаток» содержимого schedule: последний id changes_log.
+    Триггеры пишут туда каждую вставку, удаление и изменение пары (в том числе
+    UPDATE аудитории или времени на месте), а max(id) по первичному ключу —
+    один шаг по B-дереву. По нему процессные кеши понимают, что их пора перестроить.
+    """
+    row = conn.execute("SELECT coalesce(max(id), 0) FROM changes_log").fetchone()
+    return tuple(row)
+
+
 def save_groups(groups: list[dict], force: bool = False):
     """
     Сохраняет список групп в таблицу groups.
@@ -97,7 +207,10 @@ def get_cached_pairs(conn: sqlite3.Connection, group_id: int, week: int):
 
 
 def create_app_tables(conn: sqlite3.Connection):
-    """Создаёт таблицы users, schedule, occupied_rooms, free_rooms и changes_log."""
+    """
+    Создаёт таблицы users, schedule, occupied_rooms, calendar_sync и room_slots.
+    changes_log создаёт init_db вместе с триггерами на schedule.
+    """
     cur = conn.cursor()
     # Таблица пользователей
     cur.execute("""
@@ -128,42 +241,132 @@ def create_app_tables(conn: sqlite3.Connection):
     # Занятые аудитории
     cur.execute("""
     CREATE TABLE IF NOT EXISTS occupied_rooms (
-        week       INTEGER,
-        day        TEXT,
-        start_time TEXT,
-        end_time   TEXT,
-        room       TEXT,
-        subject    TEXT,
-        teacher    TEXT,
-        group_name TEXT,
+        week            INTEGER,
+        day             TEXT,
+        start_time      TEXT,
+        end_time        TEXT,
+        room            TEXT,
+        subject         TEXT,
+        teacher         TEXT,
+        group_name      TEXT,
+        weekday         TEXT,
+        google_event_id TEXT,
+        groups          TEXT,
+        date            TEXT,  -- ISO-дата занятия
         PRIMARY KEY (week, day, start_time, end_time, room)
     );
     """)
-    # Свободные аудитории
+    # Состояние синхронизации с Google Calendar: что и в каком виде уже отправлено
     cur.execute("""
-    CREATE TABLE IF NOT EXISTS free_rooms (
+    CREATE TABLE IF NOT EXISTS calendar_sync (
+        event_id   TEXT PRIMARY KEY,  -- детерминированный id события (lesson_event_id)
         week       INTEGER,
-        day        TEXT,
-        start_time TEXT,
-        end_time   TEXT,
-        room       TEXT,
-        PRIMARY KEY (week, day, start_time, end_time, room)
+        date       TEXT,              -- ISO-дата занятия
+        groups     TEXT,              -- группы через ', '
+        body_hash  TEXT NOT NULL,     -- sha1 последнего отправленного тела события
+        synced_at  TEXT NOT NULL
     );
     """)
-    # Лог изменений
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_calendar_sync_date ON calendar_sync(date);")
+    # Битовые маски занятости аудиторий по дням (свободные слоты выводятся из них)
     cur.execute("""
-    CREATE TABLE IF NOT EXISTS changes_log (
-        id          INTEGER PRIMARY KEY AUTOINCREMENT,
-        schedule_id INTEGER,
-        changed_at  TEXT    NOT NULL,
-        old_data    TEXT,
-        new_data    TEXT,
-        FOREIGN KEY(schedule_id) REFERENCES schedule(id) ON DELETE CASCADE
+    CREATE TABLE IF NOT EXISTS room_slots (
+        week  INTEGER,
+        day   TEXT,
+        room  TEXT,
+        mask  INTEGER NOT NULL,
+        PRIMARY KEY (week, day, room)
     );
     """)
     conn.commit()
 
 
+def upgrade_occupied_rooms(conn: sqlite3.Connection):
+    """
+    Доводит occupied_rooms из старых БД до текущей схемы: добавляет недостающие
+    колонки, индекс по ISO-дате и проставляет дату строкам, у которых её нет, —
+    по номеру недели и началу семестра, как save_schedule (по одному разбору на
+    пару (week, day)). Выполняется миграцией; читатели дату не угадывают.
+    Commit — за вызывающим.
+    """
+    cols = {c[1] for c in conn.execute("PRAGMA table_info(occupied_rooms)")}
+    for col in ("weekday", "google_event_id", "groups", "date"):
+        if col not in cols:
+            conn.execute(f"ALTER TABLE occupied_rooms ADD COLUMN {col} TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_occupied_rooms_date ON occupied_rooms(date);")
+
+    updates = []
+    for week, day in conn.execute(
+            "SELECT DISTINCT week, day FROM occupied_rooms WHERE date IS NULL").fetchall():
+        resolved = resolve_lesson_date(week, day or "")
+        if resolved:
+            updates.append((resolved.isoformat(), week, day))
+    conn.executemany(
+        "UPDATE occupied_rooms SET date = ? WHERE week IS ? AND day = ? AND date IS NULL", updates
+    )
+
+
+# Поля строки schedule, попадающие в образы changes_log; teachers и rooms
+# вкладываются как JSON-массивы, если это валидный JSON
+_IMAGE_FIELDS = ("id", "group_id", "week", "date", "time", "subject", "teachers", "rooms",
+                 "date_iso", "start_min", "end_min")
+# Изменение только этих полей считается изменением занятия (не, например, backfill date_iso)
+_TRACKED_FIELDS = ("group_id", "week", "date", "time", "subject", "teachers", "rooms")
+
+
+def _row_image(alias: str) -> str:
+    parts = []
+    for field in _IMAGE_FIELDS:
+        value = f"{alias}.{field}"
+        if field in ("teachers", "rooms"):
+            value = f"CASE WHEN json_valid({value}) THEN json({value}) ELSE {value} END"
+        parts.append(f"'{field}', {value}")
+    return f"json_object({', '.join(parts)})"
+
+
+def create_change_triggers(conn: sqlite3.Connection):
+    """
+    Триггеры на парсерной schedule, пишущие changes_log в той же транзакции,
+    что и само изменение: любой писатель (парсер, API, ручной SQL) попадает
+    в уведомления без дополнительного кода. Схему schedule из create_app_tables
+    не трогает. Commit — за вызывающим.
+    """
+    cols = {c[1] for c in conn.execute("PRAGMA table_info(schedule)")}
+    if not set(_IMAGE_FIELDS) <= cols:
+        return
+    cols = {c[1] for c in conn.execute("PRAGMA table_info(changes_log)")}
+    # changes_log из старых версий create_app_tables и notifier — без change_type
+    for col in ("change_type", "changed_at", "old_data", "new_data"):
+        if col not in cols:
+            conn.execute(f"ALTER TABLE changes_log ADD COLUMN {col} TEXT")
+
+    now = "strftime('%Y-%m-%d %H:%M:%S', 'now')"
+    changed = " OR ".join(f"OLD.{f} IS NOT NEW.{f}" for f in _TRACKED_FIELDS)
+    # по одному execute на триггер: executescript сначала фиксирует открытую транзакцию
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS schedule_log_insert AFTER INSERT ON schedule
+    BEGIN
+        INSERT INTO changes_log (schedule_id, change_type, changed_at, old_data, new_data)
+        VALUES (NEW.id, 'create', {now}, NULL, {_row_image("NEW")});
+    END;
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS schedule_log_update AFTER UPDATE ON schedule
+    WHEN {changed}
+    BEGIN
+        INSERT INTO changes_log (schedule_id, change_type, changed_at, old_data, new_data)
+        VALUES (NEW.id, 'update', {now}, {_row_image("OLD")}, {_row_image("NEW")});
+    END;
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS schedule_log_delete AFTER DELETE ON schedule
+    BEGIN
+        INSERT INTO changes_log (schedule_id, change_type, changed_at, old_data, new_data)
+        VALUES (OLD.id, 'delete', {now}, {_row_image("OLD")}, NULL);
+    END;
+    """)
+
+
 def save_pairs(conn: sqlite3.Connection, group_id: int, week: int, data: list[dict]):
     js = json.dumps(data, ensure_ascii=False)
     ts = datetime.now(timezone.utc).isoformat()
@@ -180,16 +383,19 @@ def save_pairs(conn: sqlite3.Connection, group_id: int, week: int, data: list[di
 def save_schedule(conn: sqlite3.Connection, group_id: int, week: int, data: list[dict]):
     """
     Пройдём по всем урокам из JSON и вставим их в schedule.
-    teachers и rooms храним как JSON-строку.
+    teachers и rooms храним как JSON-строку, дату и время сразу
+    разбираем в date_iso и start_min/end_min (dates.resolve_lesson).
     """
     cur = conn.cursor()
     for lesson in data:
         teachers_json = json.dumps(lesson["teachers"], ensure_ascii=False)
         rooms_json = json.dumps(lesson["rooms"], ensure_ascii=False)
+        date_iso, start_min, end_min = resolve_lesson(week, lesson["date"], lesson["time"])
         cur.execute("""
         INSERT INTO schedule (
-            group_id, week, date, time, subject, teachers, rooms
-        ) VALUES (?, ?, ?, ?, ?, ?, ?);
+            group_id, week, date, time, subject, teachers, rooms,
+            date_iso, start_min, end_min
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
         """, (
             group_id,
             week,
@@ -197,6 +403,9 @@ def save_schedule(conn: sqlite3.Connection, group_id: int, week: int, data: list
             lesson["time"],
             lesson["subject"],
             teachers_json,
-            rooms_json
+            rooms_json,
+            date_iso,
+            start_min,
+            end_min
         ))
     conn.commit()
@@ -0,0 +1,144 @@
+import os
+import re
+import datetime
+
+# Русские названия месяцев в родительном падеже, как на сайте МАИ
+MONTHS = {
+    "января":   1, "февраля":  2, "марта":    3, "апреля":   4,
+    "мая":      5, "июня":     6, "июля":     7, "августа":  8,
+    "сентября": 9, "октября": 10, "ноября":  11, "декабря": 12
+}
+
+WEEKDAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
+# Понедельник первой учебной недели семестра: от него считаются даты по номеру недели.
+# Переопределяется переменной окружения SEMESTER_START (YYYY-MM-DD).
+SEMESTER_START = datetime.date.fromisoformat(os.getenv("SEMESTER_START", "2025-02-10"))
+
+_NUMERIC_DATE_RE = re.compile(r'(\d{1,2})\.(\d{1,2})(?:\.(\d{4}))?')
+_DATE_RE = re.compile(r'(\d{1,2})\s+([а-яА-Я]+)(?:\s+(\d{4}))?')
+_TIME_RE = re.compile(r'(\d{1,2}):(\d{2})\s*[-–—]\s*(\d{1,2}):(\d{2})')
+
+
+def parse_date_str(day_str: str) -> datetime.date | None:
+    """
+    Парсит строку вида '12 мая' или '12 мая 2025' в datetime.date.
+    Если год не указан — берёт текущий, и если дата давно в прошлом (>60 дней),
+    переключается на следующий год. На стыке семестров это угадывание ошибается,
+    поэтому БД и читатели используют resolve_lesson_date; здесь — только для
+    сравнения в benchmarks/bench_sync_planning.
+    """
+    match = _DATE_RE.search(day_str)
+    if not match:
+        return None
+
+    day_num   = int(match.group(1))
+    month_word= match.group(2).lower()
+    year      = int(match.group(3)) if match.group(3) else datetime.date.today().year
+
+    if month_word not in MONTHS:
+        return None
+
+    candidate = datetime.date(year, MONTHS[month_word], day_num)
+    today     = datetime.date.today()
+    # если год не указан и дата слишком давно в прошлом, переключаемся на следующий год
+    if not match.group(3) and candidate < today and (today - candidate).days > 60:
+        candidate = datetime.date(year + 1, MONTHS[month_word], day_num)
+    return candidate
+
+
+def resolve_lesson_date(week: int, date_str: str,
+                        semester_start: datetime.date | None = None) -> datetime.date | None:
+    """
+    Абсолютная дата занятия по номеру недели и строке сайта ('Пт, 30 мая',
+    '30 мая 2025', 'Вт, 10.06.2025'). Ожидаемая дата — понедельник недели week
+    от semester_start плюс день недели; из строки берутся число и месяц, а год —
+    ближайший к ожидаемой дате (если он не указан явно). Без угадывания
+    «больше 60 дней в прошлом», поэтому на стыке семестров и лет даты не прыгают.
+    """
+    start = semester_start or SEMESTER_START
+    prefix = (date_str or "").split(",", 1)[0].strip()
+    weekday = WEEKDAYS.index(prefix) if prefix in WEEKDAYS else None
+    expected = None
+    if week:
+        expected = start + datetime.timedelta(weeks=int(week) - 1, days=weekday or 0)
+
+    day = month = year = None
+    match = _NUMERIC_DATE_RE.search(date_str or "")
+    if match:
+        day, month = int(match.group(1)), int(match.group(2))
+        year = int(match.group(3)) if match.group(3) else None
+    else:
+        match = _DATE_RE.search(date_str or "")
+        if match and match.group(2).lower() in MONTHS:
+            day, month = int(match.group(1)), MONTHS[match.group(2).lower()]
+            year = int(match.group(3)) if match.group(3) else None
+
+    if day is None:
+        return expected if weekday is not None else None
+    years = [year] if year else (
+        [expected.year - 1, expected.year, expected.year + 1] if expected
+        else [datetime.date.today().year]
+    )
+    candidates = []
+    for y in years:
+        try:
+            candidates.append(datetime.date(y, month, day))
+        except ValueError:
+            continue
+    if not candidates:
+        return None
+    if expected is None:
+        return candidates[0]
+    return min(candidates, key=lambda c: abs(c - expected))
+
+
+def resolve_lesson(week: int, date_str: str, time_str: str,
+                   semester_start: datetime.date | None = None) -> tuple:
+    """(ISO-дата, начало, конец в минутах) для колонок schedule; нераспознанное — None."""
+    day = resolve_lesson_date(week, date_str, semester_start)
+    span = parse_time_range(time_str) or (None, None)
+    return (day.isoformat() if day else None,) + tuple(span)
+
+
+def lesson_columns(week: int, date_str: str, time_str: str,
+                   date_iso: str | None, start_min: int | None, end_min: int | None,
+                   cache: dict) -> tuple:
+    """
+    (ISO-дата, начало, конец) строки schedule для читателей. Обычно это её колонки,
+    но строки, вставленные в обход save_schedule (скрипты, ручной SQL), или
+    изменённые UPDATE даты/времени приходят с NULL — тогда дата и время
+    разбираются здесь же, по разу на (week, date, time) через cache.
+    """
+    if date_iso is not None and start_min is not None and end_min is not None:
+        return date_iso, start_min, end_min
+    key = (week, date_str, time_str)
+    if key not in cache:
+        cache[key] = resolve_lesson(week, date_str, time_str)
+    return cache[key]
+
+
+def parse_time_range(time_str: str) -> tuple[int, int] | None:
+    """
+    Разбирает '13:00 – 14:30' (дефис, en/em dash) в минуты от начала суток:
+    (780, 870). Возвращает None, если строка не похожа на интервал.
+    """
+    match = _TIME_RE.search(time_str or "")
+    if not match:
+        return None
+    h1, m1, h2, m2 = (int(x) for x in match.groups())
+    start, end = h1 * 60 + m1, h2 * 60 + m2
+    if end <= start:
+        return None
+    return start, end
+
+
+def parse_hhmm(value: str) -> int:
+    """'09:30' -> 570. Бросает ValueError на неверном формате."""
+    t = datetime.datetime.strptime(value.strip(), "%H:%M").time()
+    return t.hour * 60 + t.minute
+
+
+def format_minutes(minutes: int) -> str:
+    """570 -> '09:30'."""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
@@ -0,0 +1,168 @@
+"""
+Локальная шина событий поверх SQLite.
+
+Издатель (парсер, API) пишет событие в таблицу events и будит подписчиков
+датаграммой в их Unix-сокеты из каталога <файл БД>.events/. Подписчик
+(notifier, кеши API, пересчёт занятости) спит на своём сокете и читает
+таблицу только после пробуждения — по id больше своего смещения, так что
+события не теряются, даже если датаграмма не дошла или подписчик был
+остановлен. Там, где Unix-сокетов нет, подписчик просыпается по таймауту.
+
+    from backend.database.events import SCHEDULE_CHANGED, publish, Subscriber
+    publish(conn, SCHEDULE_CHANGED, {"group_id": 1, "week": 14})
+"""
+import json
+import os
+import select
+import socket
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+from backend.database.database import DB_PATH, get_meta, set_meta
+
+SCHEDULE_CHANGED = "schedule.changed"  # payload: {"group_id", "week"}
+KEEP_EVENTS = 100000  # столько последних событий хранится в таблице
+PRUNE_EVERY = 1000
+
+
+def _db_file(conn: sqlite3.Connection) -> str:
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+def events_dir(db_path) -> str:
+    return f"{db_path}.events"
+
+
+def wake(db_path):
+    """Будит всех подписчиков БД db_path; сокеты остановленных процессов удаляются."""
+    if not hasattr(socket, "AF_UNIX"):
+        return
+    directory = events_dir(db_path)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.setblocking(False)
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                sock.sendto(b"!", path)
+            except BlockingIOError:
+                pass  # очередь сокета полна — подписчик и так проснётся
+            except (ConnectionRefusedError, FileNotFoundError):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+
+def publish_many(conn: sqlite3.Connection, topic: str, payloads: list[dict]) -> int:
+    """
+    Записывает события (таблицу events создаёт миграция), фиксирует транзакцию
+    и будит подписчиков. Возвращает id последнего события.
+    """
+    now = datetime.now(timezone.utc).isoformat()
+    last_id = 0
+    for payload in payloads:
+        last_id = conn.execute(
+            "INSERT INTO events (topic, payload, created_at) VALUES (?, ?, ?)",
+            (topic, json.dumps(payload, ensure_ascii=False), now)
+        ).lastrowid
+    if last_id and last_id // PRUNE_EVERY != (last_id - len(payloads)) // PRUNE_EVERY:
+        conn.execute("DELETE FROM events WHERE id <= ?", (last_id - KEEP_EVENTS,))
+    conn.commit()
+    if last_id:
+        wake(_db_file(conn))
+    return last_id
+
+
+def publish(conn: sqlite3.Connection, topic: str, payload: dict) -> int:
+    return publish_many(conn, topic, [payload])
+
+
+class Subscriber:
+    """
+    Подписчик на темы topics. durable=True хранит смещение в meta под именем
+    name (notifier, пересчёт занятости продолжают с того же места после
+    перезапуска); durable=False начинает с конца (кеши процесса).
+    Схему не трогает: таблицы events и meta создаёт backend.api.migrations
+    до запуска процессов, иначе каждый воркер API гонял бы DDL на первом запросе.
+    """
+
+    def __init__(self, name: str, topics, db_path=DB_PATH, durable: bool = True):
+        self.name = name
+        self.topics = tuple(topics)
+        self.db_path = str(db_path)
+        self.durable = durable
+        self.conn = sqlite3.connect(self.db_path, timeout=5, check_same_thread=False)
+        try:
+            offset = get_meta(self.conn, f"events.{name}") if durable else None
+            if offset is None:
+                offset = self.conn.execute("SELECT coalesce(max(id), 0) FROM events").fetchone()[0]
+        except sqlite3.Error:
+            self.conn.close()  # БД не размечена миграцией
+            raise
+        self.offset = int(offset)
+        self.sock = None
+        if hasattr(socket, "AF_UNIX"):
+            os.makedirs(events_dir(self.db_path), exist_ok=True)
+            self.path = os.path.join(events_dir(self.db_path), f"{name}-{os.getpid()}-{id(self)}.sock")
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.sock.bind(self.path)
+            self.sock.setblocking(False)
+
+    def poll(self, limit: int = 1000) -> list[dict]:
+        """Новые события после смещения: [{"id", "topic", "payload"}]."""
+        rows = self.conn.execute(
+            f"SELECT id, topic, payload FROM events WHERE id > ? "
+            f"AND topic IN ({','.join('?' * len(self.topics))}) ORDER BY id LIMIT ?",
+            (self.offset, *self.topics, limit)
+        ).fetchall()
+        return [{"id": i, "topic": t, "payload": json.loads(p)} for i, t, p in rows]
+
+    def ack(self, event_id: int):
+        """Сдвигает смещение: события до event_id включительно обработаны."""
+        self.offset = max(self.offset, event_id)
+        if self.durable:
+            set_meta(self.conn, f"events.{self.name}", self.offset)
+            self.conn.commit()
+
+    def wait(self, timeout: float) -> bool:
+        """Ждёт пробуждения не дольше timeout секунд. True — пришла датаграмма."""
+        if self.sock is None:
+            time.sleep(timeout)
+            return False
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while self.sock.recv(64):  # несколько публикаций — одно пробуждение
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def listen(self, handler, timeout: float = 60.0, stop=None):
+        """
+        Вызывает handler(events) для каждой пачки новых событий и подтверждает
+        их после успешной обработки. stop — threading.Event для остановки.
+        """
+        while stop is None or not stop.is_set():
+            events = self.poll()
+            if events:
+                handler(events)
+                self.ack(events[-1]["id"])
+                continue
+            self.wait(timeout)
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self.sock = None
+        self.conn.close()
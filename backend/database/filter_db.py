@@ -1,7 +1,11 @@
+import argparse
 import sqlite3
 import json
-import re
-from backend.database.database import DB_PATH
+from backend.database.database import DB_PATH, init_db, get_meta, set_meta, upgrade_occupied_rooms
+from backend.database.dates import format_minutes, lesson_columns
+from backend.database.events import SCHEDULE_CHANGED, Subscriber
+from backend.database.occupancy import slot_mask
+from backend.database.room_index import parse_room
 
 # <-- Ваш список «IT»-аудиторий, которые нужно учитывать
 ALLOWED_IT_ROOMS = {
@@ -10,65 +14,123 @@ ALLOWED_IT_ROOMS = {
     "ГУК Б-324", "ГУК Б-325", "ГУК Б-326", "ГУК Б-418", "ГУК Б-420"
 }
 
+# Порции чтения schedule и пакеты executemany при пересчёте
+CHUNK_SIZE = 5000
+BATCH_SIZE = 1000
+
 
 def setup_db(conn: sqlite3.Connection):
-    """Создаёт (пересоздаёт) occupied_rooms и free_rooms."""
+    """
+    Создаёт occupied_rooms и room_slots, если их нет, и добавляет недостающие
+    колонки. Таблицы больше не пересоздаются: google_event_id из google_sync
+    переживает пересчёт, а API не видит пустых таблиц. Строкам без ISO-даты
+    (созданным до появления колонки date) она проставляется здесь же.
+    """
     cur = conn.cursor()
-    # сброс старых
-    cur.execute("DROP TABLE IF EXISTS occupied_rooms;")
+    # free_rooms больше не материализуется
     cur.execute("DROP TABLE IF EXISTS free_rooms;")
-    # новая схема
     cur.execute("""
-        CREATE TABLE occupied_rooms (
-            week        INTEGER,
-            day         TEXT,
-            start_time  TEXT,
-            end_time    TEXT,
-            room        TEXT,
-            subject     TEXT,
-            teacher     TEXT,
-            group_name  TEXT,
-            weekday     TEXT,
+        CREATE TABLE IF NOT EXISTS occupied_rooms (
+            week            INTEGER,
+            day             TEXT,
+            start_time      TEXT,
+            end_time        TEXT,
+            room            TEXT,
+            subject         TEXT,
+            teacher         TEXT,
+            group_name      TEXT,
+            weekday         TEXT,
+            google_event_id TEXT,
+            groups          TEXT,  -- все группы с парой в этой аудитории, через ', '
+            date            TEXT,  -- ISO-дата, разобранная из day при пересчёте
             PRIMARY KEY (week, day, start_time, end_time, room)
         );
     """)
+    upgrade_occupied_rooms(conn)
     cur.execute("""
-        CREATE TABLE free_rooms (
-            week       INTEGER,
-            day        TEXT,
-            start_time TEXT,
-            end_time   TEXT,
-            room       TEXT,
-            PRIMARY KEY (week, day, start_time, end_time, room)
+        CREATE TABLE IF NOT EXISTS room_slots (
+            week  INTEGER,
+            day   TEXT,
+            room  TEXT,
+            mask  INTEGER NOT NULL,  -- бит i = занята пара occupancy.SLOTS[i]
+            PRIMARY KEY (week, day, room)
         );
     """)
+    init_db(conn)  # таблица meta для водяных знаков
     conn.commit()
 
 
-def get_occupied_rooms(conn: sqlite3.Connection):
+def _weeks_clause(weeks, column: str = "week") -> tuple[str, tuple]:
+    """WHERE-фрагмент для фильтра по неделям; weeks=None — без фильтра."""
+    if weeks is None:
+        return "", ()
+    weeks = tuple(weeks)
+    return f" WHERE {column} IN ({','.join('?' * len(weeks))})", weeks
+
+
+def iter_schedule(conn: sqlite3.Connection, weeks=None, chunk_size: int = CHUNK_SIZE):
     """
-    Из парсерной таблицы schedule с JOIN по groups берёт все уроки,
-    парсит JSON-поля, фильтрует по ALLOWED_IT_ROOMS и возвращает
-    список кортежей
-    (week, date, start_time, end_time, room, subject, teacher, group_name, weekday).
+    Построчно отдаёт уроки schedule ⋈ groups (или только недель weeks),
+    читая курсор порциями по chunk_size строк, без fetchall():
+    (week, date, date_iso, start_min, end_min, subject, teachers, rooms, group_name).
+    Строки с незаполненными date_iso/start_min (вставленные в обход save_schedule)
+    разбираются на лету, см. dates.lesson_columns.
     """
+    where, args = _weeks_clause(weeks, "s.week")
     cur = conn.cursor()
     cur.execute("""
         SELECT s.week,
                s.date,
                s.time,
+               s.date_iso,
+               s.start_min,
+               s.end_min,
                s.subject,
                s.teachers,
                s.rooms,
                g.name AS group_name
         FROM schedule s
         JOIN groups  g ON s.group_id = g.id
-    """)
-    rows = cur.fetchall()
-    print(f"[FILTER_DB] Прочитано строк из schedule: {len(rows)}")
+    """ + where, args)
+    total = 0
+    resolved = {}
+    while True:
+        chunk = cur.fetchmany(chunk_size)
+        if not chunk:
+            break
+        total += len(chunk)
+        for week, date_str, time_str, date_iso, start_min, end_min, *rest in chunk:
+            yield (week, date_str) + lesson_columns(
+                week, date_str, time_str, date_iso, start_min, end_min, resolved) + tuple(rest)
+    print(f"[FILTER_DB] Прочитано строк из schedule: {total}")
+
+
+def get_occupied_rooms(conn: sqlite3.Connection, weeks=None, chunk_size: int = CHUNK_SIZE):
+    """
+    Генератор: из уроков schedule (или только недель weeks) парсит JSON-поля,
+    фильтрует по ALLOWED_IT_ROOMS и отдаёт кортежи
+    (week, date, start_time, end_time, room, subject, teacher, group_name, weekday, date_iso),
+    по кортежу на урок и аудиторию. Повторы одной группы отбрасывает первичный
+    ключ временной таблицы, несколько групп в одной аудитории склеиваются при записи,
+    так что генератор ничего не копит. Дата и время берутся из разобранных при
+    записи колонок date_iso/start_min/end_min.
+    """
+    total = 0
+    for week, date_str, date_iso, start_min, end_min, subject, teachers_json, rooms_json, \
+            group_name in iter_schedule(conn, weeks, chunk_size):
+        # аудитории
+        try:
+            rooms = json.loads(rooms_json)
+        except:
+            rooms = []
+        rooms = [r for r in rooms if r in ALLOWED_IT_ROOMS]
+        if not rooms:
+            continue
+
+        if start_min is None or end_min is None:
+            continue
+        start_time, end_time = format_minutes(start_min), format_minutes(end_min)
 
-    occupied = []
-    for week, date_str, time_str, subject, teachers_json, rooms_json, group_name in rows:
         # преподаватели
         try:
             teachers = json.loads(teachers_json)
@@ -76,103 +138,268 @@ def get_occupied_rooms(conn: sqlite3.Connection):
             teachers = []
         teacher = ", ".join(teachers)
 
-        # нормализуем дефисы и разбиваем время
-        clean_time = re.sub(r"[–—]", "-", time_str)
-        parts = [p.strip() for p in clean_time.split("-")]
-        if len(parts) != 2:
-            continue
-        start_time, end_time = parts
+        # день недели (до запятой)
+        weekday = date_str.split(",", 1)[0].strip()
 
-        # аудитории
+        for room in rooms:
+            total += 1
+            yield week, date_str, start_time, end_time, room, subject, teacher, group_name, weekday, date_iso
+
+    print(f"[FILTER_DB] Сгенерировано occupied-записей: {total}")
+
+
+def get_room_slots(conn: sqlite3.Connection, weeks=None, chunk_size: int = CHUNK_SIZE):
+    """
+    Генератор битовых масок занятости по всем аудиториям кампуса:
+    (week, date, room, mask) для каждого урока и аудитории. Маски одного дня
+    объединяются (OR) при записи в room_slots. Дни берутся только из своей
+    недели, поэтому «чужих» дат не появляется.
+    """
+    for week, date_str, _, start_min, end_min, _, _, rooms_json, _ \
+            in iter_schedule(conn, weeks, chunk_size):
+        if start_min is None or end_min is None:
+            continue
+        bits = slot_mask(start_min, end_min)
+        if not bits:
+            continue
         try:
             rooms = json.loads(rooms_json)
         except:
             rooms = []
+        for room in rooms:
+            if parse_room(room) is not None:
+                yield week, date_str, room, bits
 
-        # день недели (до запятой)
-        weekday = date_str.split(",", 1)[0].strip()
 
-        # оставляем только нужные аудитории
-        for room in rooms:
-            if room in ALLOWED_IT_ROOMS:
-                occupied.append((
-                    week,
-                    date_str,
-                    start_time,
-                    end_time,
-                    room,
-                    subject,
-                    teacher,
-                    group_name,
-                    weekday
-                ))
-
-    print(f"[FILTER_DB] Сгенерировано occupied-записей: {len(occupied)}")
-    return occupied
-
-
-def get_free_rooms(occupied):
-    """
-    На основе списка occupied генерирует все свободные слоты
-    по тем же неделям/дням/временным слотам и по тем же кабинетам.
-    """
-    weeks = sorted({rec[0] for rec in occupied})
-    days = sorted({rec[1] for rec in occupied})
-    slots = sorted({(rec[2], rec[3]) for rec in occupied})
-    rooms_all = sorted({rec[4] for rec in occupied})
-    occupied_set = {(w, d, s, e, r) for w, d, s, e, r, *_ in occupied}
-
-    free = []
-    for w in weeks:
-        for d in days:
-            for s, e in slots:
-                for r in rooms_all:
-                    key = (w, d, s, e, r)
-                    if key not in occupied_set:
-                        free.append(key)
-    print(f"[FILTER_DB] Сгенерировано free-записей: {len(free)}")
-    return free
-
-
-def save_filtered_data():
-    """
-    Сбрасывает и пересоздаёт таблицы, заполняет их occupied и free.
+def _batched(rows, size: int):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def get_changed_pairs(conn: sqlite3.Connection) -> tuple[set, dict]:
     """
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        setup_db(conn)
-        cur = conn.cursor()
-
-        # получаем occupied + дедупликация
-        occupied = get_occupied_rooms(conn)
-        unique = {}
-        for rec in occupied:
-            key = rec[:5]
-            if key not in unique:
-                unique[key] = rec
-        occ_list = list(unique.values())
-
-        # вставляем занятые
-        cur.executemany(
-            "INSERT INTO occupied_rooms "
-            "(week, day, start_time, end_time, room, subject, teacher, group_name, weekday) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);",
-            occ_list
+    Находит (group_id, week), изменившиеся с прошлого запуска: перепарсенные
+    (parser_pairs.parsed_at), с новыми строками в schedule (например, добавленные
+    через API) и затронутые любой записью из changes_log — в том числе удалением
+    или UPDATE строк без перепарсинга (старая и новая неделя пары обе).
+    Возвращает множество пар и новые значения водяных знаков.
+    """
+    last_parsed = get_meta(conn, "filter_db.parsed_at", "")
+    last_id = int(get_meta(conn, "filter_db.schedule_id", "0"))
+    last_change = int(get_meta(conn, "filter_db.change_id", "0"))
+
+    changed = set(conn.execute(
+        "SELECT group_id, week FROM parser_pairs WHERE parsed_at > ?", (last_parsed,)
+    ).fetchall())
+    changed |= set(conn.execute(
+        "SELECT DISTINCT group_id, week FROM schedule WHERE id > ?", (last_id,)
+    ).fetchall())
+    changed |= set(conn.execute("""
+        SELECT json_extract(old_data, '$.group_id'), json_extract(old_data, '$.week')
+        FROM changes_log WHERE id > ?1 AND old_data IS NOT NULL
+        UNION
+        SELECT json_extract(new_data, '$.group_id'), json_extract(new_data, '$.week')
+        FROM changes_log WHERE id > ?1 AND new_data IS NOT NULL
+    """, (last_change,)).fetchall())
+
+    parsed_at, max_id, max_change = conn.execute("""
+        SELECT (SELECT coalesce(max(parsed_at), '') FROM parser_pairs),
+               (SELECT coalesce(max(id), 0) FROM schedule),
+               (SELECT coalesce(max(id), 0) FROM changes_log)
+    """).fetchone()
+    return changed, {"filter_db.parsed_at": parsed_at, "filter_db.schedule_id": max_id,
+                     "filter_db.change_id": max_change}
+
+
+def _sync_table(cur, table: str, staged: str, key_cols: tuple, val_cols: tuple, weeks):
+    """
+    Приводит строки table в неделях weeks к временной таблице staged:
+    вставляет новые, обновляет изменившиеся (остальные колонки, вроде
+    google_event_id, не трогает) и удаляет пропавшие ключи — всё на стороне SQLite.
+    Возвращает (записано, удалено).
+    """
+    cols = ", ".join(key_cols + val_cols)
+    cur.execute(
+        f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {staged} WHERE true "
+        f"ON CONFLICT({', '.join(key_cols)}) DO UPDATE SET "
+        + ", ".join(f"{c}=excluded.{c}" for c in val_cols)
+        + " WHERE " + " OR ".join(f"{table}.{c} IS NOT excluded.{c}" for c in val_cols)
+    )
+    written = cur.rowcount
+
+    where, args = _weeks_clause(weeks)
+    match = " AND ".join(f"n.{c} = {table}.{c}" for c in key_cols)
+    cur.execute(
+        f"DELETE FROM {table}" + (where + " AND" if where else " WHERE")
+        + f" NOT EXISTS (SELECT 1 FROM {staged} n WHERE {match})",
+        args
+    )
+    return written, cur.rowcount
+
+
+def _clear_staging(cur):
+    for table in ("occupied_new", "occupied_merged", "room_slots_new"):
+        cur.execute(f"DELETE FROM {table}")
+
+
+def refresh_occupancy(conn: sqlite3.Connection, changed=None, marks: dict | None = None,
+                      chunk_size: int = CHUNK_SIZE, batch_size: int = BATCH_SIZE):
+    """
+    Пересчитывает occupied_rooms и room_slots для недель из changed
+    (множество пар (group_id, week); None — все недели) одной транзакцией.
+    Уроки читаются порциями и пишутся во временные таблицы пакетами по
+    batch_size, так что память не растёт вместе с schedule. Затем в основные
+    таблицы записываются только изменившиеся строки; marks — водяные знаки,
+    которые фиксируются вместе с данными.
+    """
+    weeks = None if changed is None else sorted({w for _, w in changed})
+    cur = conn.cursor()
+    # occupied_new — по строке на группу (ключ отбрасывает повторы),
+    # occupied_merged — по строке на аудиторию и пару, как в occupied_rooms
+    cur.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS occupied_new (
+            week INTEGER, day TEXT, start_time TEXT, end_time TEXT, room TEXT,
+            subject TEXT, teacher TEXT, group_name TEXT, weekday TEXT, date TEXT,
+            PRIMARY KEY (week, day, start_time, end_time, room, group_name)
+        )
+    """)
+    cur.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS occupied_merged (
+            week INTEGER, day TEXT, start_time TEXT, end_time TEXT, room TEXT,
+            subject TEXT, teacher TEXT, group_name TEXT, weekday TEXT, groups TEXT, date TEXT,
+            PRIMARY KEY (week, day, start_time, end_time, room)
+        )
+    """)
+    cur.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS room_slots_new (
+            week INTEGER, day TEXT, room TEXT, mask INTEGER NOT NULL,
+            PRIMARY KEY (week, day, room)
         )
+    """)
+    try:
+        # остатки прерванного запуска (если процесс упал между записью и очисткой)
+        _clear_staging(cur)
+        for batch in _batched(get_occupied_rooms(conn, weeks, chunk_size), batch_size):
+            cur.executemany(
+                "INSERT INTO occupied_new (week, day, start_time, end_time, room, "
+                "subject, teacher, group_name, weekday, date) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT DO NOTHING;",
+                batch
+            )
+        # группы одной аудитории и пары склеиваются в groups по алфавиту, а
+        # group_name, subject и teacher берутся от группы с меньшим именем (min()
+        # задаёт строку для остальных колонок). Иначе результат зависел бы от порядка
+        # обхода schedule, и те же данные давали бы лишние UPDATE, новую
+        # occupancy.version и новый body_hash для Google Calendar.
+        # ORDER BY внутри group_concat есть только с SQLite 3.44, поэтому порядок
+        # задаёт подзапрос.
+        cur.execute("""
+            INSERT INTO occupied_merged
+            SELECT week, day, start_time, end_time, room, subject, teacher,
+                   min(group_name), weekday, group_concat(group_name, ', '), date
+            FROM (SELECT * FROM occupied_new
+                  ORDER BY week, day, start_time, end_time, room, group_name)
+            GROUP BY week, day, start_time, end_time, room
+        """)
+        # маски занятости по всем аудиториям (свободные слоты выводятся из них)
+        for batch in _batched(get_room_slots(conn, weeks, chunk_size), batch_size):
+            cur.executemany(
+                "INSERT INTO room_slots_new (week, day, room, mask) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(week, day, room) DO UPDATE SET mask = mask | excluded.mask;",
+                batch
+            )
 
-        # генерируем и вставляем свободные
-        free = get_free_rooms(occ_list)
-        cur.executemany(
-            "INSERT INTO free_rooms "
-            "(week, day, start_time, end_time, room) VALUES (?, ?, ?, ?, ?);",
-            free
+        occ = _sync_table(
+            cur, "occupied_rooms", "occupied_merged",
+            ("week", "day", "start_time", "end_time", "room"),
+            ("subject", "teacher", "group_name", "weekday", "groups", "date"),
+            weeks
+        )
+        slots = _sync_table(
+            cur, "room_slots", "room_slots_new", ("week", "day", "room"), ("mask",), weeks
         )
 
+        if any(occ) or any(slots):
+            # версия данных занятости: по ней кешируются отчёты и ответы API
+            set_meta(conn, "occupancy.version", int(get_meta(conn, "occupancy.version", "0")) + 1)
+        for key, value in (marks or {}).items():
+            set_meta(conn, key, value)
+        _clear_staging(cur)
         conn.commit()
-        print("✅ occupied_rooms и free_rooms обновлены.")
+    except Exception:
+        # откатывает и записи во временные таблицы; исходная ошибка не маскируется
+        conn.rollback()
+        raise
+    scope = "все недели" if weeks is None else f"недели {weeks}"
+    print(f"[FILTER_DB] {scope}: occupied_rooms +{occ[0]}/-{occ[1]}, "
+          f"room_slots +{slots[0]}/-{slots[1]}")
+
+
+def save_filtered_data(incremental: bool = False):
+    """
+    Заполняет occupied_rooms и room_slots.
+    incremental=True — пересчитывает только недели, изменившиеся с прошлого запуска.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        setup_db(conn)
+        changed, marks = get_changed_pairs(conn)
+        if incremental:
+            if not changed:
+                print("✅ Изменений с прошлого запуска нет.")
+                return
+            refresh_occupancy(conn, changed, marks)
+        else:
+            refresh_occupancy(conn, None, marks)
+        print("✅ occupied_rooms и room_slots обновлены.")
     finally:
         conn.close()
 
 
+def follow_changes(db_path=DB_PATH, timeout: float = 300.0):
+    """
+    Пересчитывает занятость по событиям шины: как только парсер или API
+    публикуют изменение недели группы, пересчитываются её недели (плюс то,
+    что найдёт get_changed_pairs). Таблицы между событиями не опрашиваются.
+    """
+    conn = sqlite3.connect(db_path)
+    setup_db(conn)  # до подписчика: он таблицу events не создаёт
+    subscriber = Subscriber("filter_db", [SCHEDULE_CHANGED], db_path)
+
+    def handle(events):
+        changed, marks = get_changed_pairs(conn)
+        changed |= {(e["payload"]["group_id"], e["payload"]["week"]) for e in events}
+        refresh_occupancy(conn, changed, marks)
+        print(f"✅ Пересчитаны недели {sorted({w for _, w in changed})} ({len(events)} событий)")
+
+    print("[FILTER_DB] Ожидание изменений расписания…")
+    try:
+        subscriber.listen(handle, timeout=timeout)
+    except KeyboardInterrupt:
+        print("[FILTER_DB] Остановлен")
+    finally:
+        subscriber.close()
+        conn.close()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Пересчёт занятости аудиторий")
+    p.add_argument("--incremental", action="store_true",
+                   help="Пересчитать только недели, изменившиеся с прошлого запуска")
+    p.add_argument("--follow", action="store_true",
+                   help="Работать постоянно и пересчитывать недели по событиям шины")
+    args = p.parse_args()
+    if args.follow:
+        follow_changes()
+        return
+    save_filtered_data(incremental=args.incremental)
+
+
 if __name__ == "__main__":
-    save_filtered_data()
+    main()
@@ -0,0 +1,86 @@
+import sqlite3
+from typing import NamedTuple
+
+import numpy as np
+
+from backend.database.dates import parse_hhmm
+
+# Стандартная сетка пар МАИ. Бит i маски соответствует SLOTS[i].
+SLOTS = [
+    ("09:00", "10:30"),
+    ("10:45", "12:15"),
+    ("13:00", "14:30"),
+    ("14:45", "16:15"),
+    ("16:30", "18:00"),
+    ("18:15", "19:45"),
+    ("20:00", "21:30"),
+]
+SLOT_MINUTES = [(parse_hhmm(s), parse_hhmm(e)) for s, e in SLOTS]
+FULL_MASK = (1 << len(SLOTS)) - 1
+
+
+class OccupancyGrid(NamedTuple):
+    """
+    Матрица занятости: masks[i, j] — битовая маска занятых пар
+    аудитории rooms[i] в день days[j] = (week, day).
+    """
+    rooms: list[str]
+    days: list[tuple[int, str]]
+    masks: np.ndarray
+
+
+def slot_mask(start: int, end: int) -> int:
+    """Маска пар, пересекающихся с интервалом [start, end) в минутах."""
+    mask = 0
+    for i, (s, e) in enumerate(SLOT_MINUTES):
+        if start < e and s < end:
+            mask |= 1 << i
+    return mask
+
+
+def load_grid(conn: sqlite3.Connection,
+              rooms: list[str] | None = None,
+              week: int | None = None) -> OccupancyGrid:
+    """
+    Читает room_slots в матрицу rooms × days.
+    rooms=None — все аудитории, у которых есть хоть одна пара;
+    дни — все (week, day), встречающиеся в room_slots (с учётом фильтра по неделе).
+    """
+    sql = "SELECT week, day, room, mask FROM room_slots"
+    args = ()
+    if week is not None:
+        sql += " WHERE week = ?"
+        args = (week,)
+    rows = conn.execute(sql, args).fetchall()
+
+    days = sorted({(r[0], r[1]) for r in rows})
+    if rooms is None:
+        rooms = sorted({r[2] for r in rows})
+    room_pos = {room: i for i, room in enumerate(rooms)}
+    day_pos = {day: j for j, day in enumerate(days)}
+
+    masks = np.zeros((len(rooms), len(days)), dtype=np.uint8)
+    hits = [(room_pos[r[2]], day_pos[(r[0], r[1])], r[3]) for r in rows if r[2] in room_pos]
+    if hits:
+        ri, di, mv = zip(*hits)
+        masks[list(ri), list(di)] = mv
+    return OccupancyGrid(rooms, days, masks)
+
+
+def occupied_cube(grid: OccupancyGrid) -> np.ndarray:
+    """Булев массив rooms × days × slots: True — аудитория занята на этой паре."""
+    bits = np.unpackbits(grid.masks[..., None], axis=-1, bitorder="little")
+    return bits[..., :len(SLOTS)].astype(bool)
+
+
+def free_slots(grid: OccupancyGrid) -> list[tuple[int, str, str, str, str]]:
+    """
+    Все свободные (week, day, start_time, end_time, room) в порядке
+    неделя → день → пара → аудитория, как раньше в таблице free_rooms.
+    """
+    free = ~occupied_cube(grid)
+    d_idx, s_idx, r_idx = np.nonzero(free.transpose(1, 2, 0))
+    return [
+        (grid.days[d][0], grid.days[d][1], SLOTS[s][0], SLOTS[s][1], grid.rooms[r])
+        for d, s, r in zip(d_idx.tolist(), s_idx.tolist(), r_idx.tolist())
+    ]
@@ -0,0 +1,212 @@
+import re
+import json
+import sqlite3
+import threading
+from datetime import date
+
+from backend import metrics
+from backend.database.database import get_data_version
+from backend.database.dates import WEEKDAYS, format_minutes, lesson_columns
+
+# Границы учебного дня по умолчанию (первая пара 09:00, последняя кончается 21:30)
+DAY_START = 9 * 60
+DAY_END = 21 * 60 + 30
+
+# 'ГУК Б-416' -> ('ГУК Б', 416), '3-129а' -> ('3', 129), 'ГАК-307' -> ('ГАК', 307).
+# Служебные значения вроде '--каф. 919' под шаблон не подходят.
+_ROOM_RE = re.compile(r'^(.*\S)-(\d+)\s*\S*$')
+
+_cache_lock = threading.Lock()
+_cache = {"version": None, "index": None}
+
+
+def parse_room(name: str) -> tuple[str, int] | None:
+    """Разбирает название аудитории на (корпус, номер) или None для не-аудиторий."""
+    match = _ROOM_RE.match(name.strip())
+    if not match:
+        return None
+    return match.group(1), int(match.group(2))
+
+
+def _merge(intervals: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def build_room_index(conn: sqlite3.Connection) -> dict:
+    """
+    Строит интервальный индекс занятости по таблице schedule
+    (по колонкам date_iso/start_min/end_min; текст даты и времени разбирается,
+    только если колонки не заполнены, см. dates.lesson_columns):
+      rooms — {аудитория: {дата: [(start_min, end_min), ...]}} (отсортировано, слито);
+      dates — {дата: неделя} для всех дат, по которым есть расписание.
+    """
+    rooms = {}
+    dates = {}
+    parsed_dates = {}
+    resolved = {}
+    cur = conn.execute("""
+        SELECT week, date, time, date_iso, start_min, end_min, rooms FROM schedule
+    """)
+    for week, date_str, time_str, date_iso, start_min, end_min, rooms_json in cur:
+        date_iso, start_min, end_min = lesson_columns(
+            week, date_str, time_str, date_iso, start_min, end_min, resolved)
+        if date_iso is None or start_min is None:
+            continue
+        if date_iso not in parsed_dates:
+            parsed_dates[date_iso] = date.fromisoformat(date_iso)
+        day = parsed_dates[date_iso]
+        span = (start_min, end_min)
+        dates.setdefault(day, week)
+        try:
+            lesson_rooms = json.loads(rooms_json)
+        except (TypeError, ValueError):
+            continue
+        for room in lesson_rooms:
+            if parse_room(room) is None:
+                continue
+            rooms.setdefault(room, {}).setdefault(day, []).append(span)
+
+    for by_date in rooms.values():
+        for day, spans in by_date.items():
+            by_date[day] = _merge(spans)
+    return {"rooms": rooms, "dates": dates}
+
+
+def get_room_index(conn: sqlite3.Connection) -> dict:
+    """Индекс из кеша процесса; перестраивается, только если поменялись данные."""
+    version = get_data_version(conn)
+    with _cache_lock:
+        if _cache["version"] != version:
+            metrics.CACHE_REQUESTS.labels("room_index", "miss").inc()
+            _cache["index"] = build_room_index(conn)
+            _cache["version"] = version
+        else:
+            metrics.CACHE_REQUESTS.labels("room_index", "hit").inc()
+        return _cache["index"]
+
+
+def invalidate():
+    """Сбрасывает кеш индекса (по событию шины, не дожидаясь следующего запроса)."""
+    with _cache_lock:
+        _cache["version"] = None
+        _cache["index"] = None
+
+
+def free_gaps(busy: list[tuple[int, int]], earliest: int, latest: int) -> list[tuple[int, int]]:
+    """Свободные промежутки внутри [earliest, latest] при занятых интервалах busy."""
+    gaps = []
+    cursor = earliest
+    for start, end in busy:
+        if end <= cursor:
+            continue
+        if start >= latest:
+            break
+        if start > cursor:
+            gaps.append((cursor, start))
+        cursor = max(cursor, end)
+    if cursor < latest:
+        gaps.append((cursor, latest))
+    return gaps
+
+
+def _pick_rooms(available: list[tuple[str, int]], count: int, adjacent: bool):
+    """
+    Из доступных (аудитория, свободна_до) выбирает count штук.
+    adjacent=True — только из одного корпуса и этажа, с минимальным разбросом номеров.
+    Возвращает (rooms, spread, free_until) или None.
+    """
+    if len(available) < count:
+        return None
+    if not adjacent:
+        chosen = sorted(available, key=lambda a: (a[1], a[0]))[:count]
+        return [r for r, _ in chosen], 0, min(u for _, u in chosen)
+
+    floors = {}
+    for room, until in available:
+        building, number = parse_room(room)
+        floors.setdefault((building, number // 100), []).append((number, room, until))
+
+    best = None
+    for members in floors.values():
+        members.sort()
+        for i in range(len(members) - count + 1):
+            window = members[i:i + count]
+            spread = window[-1][0] - window[0][0]
+            if best is None or spread < best[1]:
+                best = ([room for _, room, _ in window], spread,
+                        min(until for _, _, until in window))
+    return best
+
+
+def find_free_slots(index: dict,
+                    start_date: date,
+                    end_date: date,
+                    duration: int,
+                    earliest: int = DAY_START,
+                    latest: int = DAY_END,
+                    rooms: set[str] | None = None,
+                    count: int = 1,
+                    adjacent: bool = True,
+                    limit: int = 20) -> list[dict]:
+    """
+    Ищет окна не короче duration минут между earliest и latest в датах
+    [start_date..end_date], где одновременно свободны count аудиторий.
+    Кандидаты ранжируются по дате, времени начала, разбросу номеров
+    (для нескольких аудиторий) и запасу свободного времени (best fit).
+    """
+    if rooms is None:
+        universe = sorted(index["rooms"])
+    else:
+        universe = sorted(r for r in rooms if parse_room(r) is not None)
+
+    candidates = []
+    for day in sorted(d for d in index["dates"] if start_date <= d <= end_date):
+        gaps = {}
+        for room in universe:
+            busy = index["rooms"].get(room, {}).get(day, [])
+            fit = [g for g in free_gaps(busy, earliest, latest) if g[1] - g[0] >= duration]
+            if fit:
+                gaps[room] = fit
+
+        if count == 1:
+            for room, room_gaps in gaps.items():
+                for gs, ge in room_gaps:
+                    candidates.append((day, gs, 0, ge - gs - duration, [room], ge))
+            continue
+
+        seen = set()
+        for t in sorted({gs for room_gaps in gaps.values() for gs, _ in room_gaps}):
+            available = [
+                (room, ge) for room, room_gaps in gaps.items()
+                for gs, ge in room_gaps if gs <= t and t + duration <= ge
+            ]
+            picked = _pick_rooms(available, count, adjacent)
+            if picked is None:
+                continue
+            chosen, spread, until = picked
+            key = tuple(chosen)
+            if key in seen:
+                continue
+            seen.add(key)
+            candidates.append((day, t, spread, until - t - duration, chosen, until))
+
+    candidates.sort(key=lambda c: (c[0], c[1], c[2], c[3], c[4]))
+    return [
+        {
+            "date": day.isoformat(),
+            "weekday": WEEKDAYS[day.weekday()],
+            "week": index["dates"][day],
+            "start_time": format_minutes(start),
+            "end_time": format_minutes(start + duration),
+            "free_until": format_minutes(until),
+            "rooms": chosen,
+        }
+        for day, start, _, _, chosen, until in candidates[:limit]
+    ]
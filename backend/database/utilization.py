@@ -0,0 +1,203 @@
+import argparse
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from backend import metrics
+from backend.database.database import DB_PATH, get_meta
+from backend.database.dates import WEEKDAYS
+from backend.database.filter_db import ALLOWED_IT_ROOMS
+from backend.database.occupancy import SLOTS, OccupancyGrid, load_grid, occupied_cube
+from backend.database.room_index import parse_room
+
+# Сколько самых загруженных пар (день недели × время) показывать как пиковые
+PEAK_COUNT = 5
+# Отчётов в кеше процесса: week и building приходят из запроса, без предела
+# любой клиент раздул бы кеш перебором значений
+CACHE_SIZE = 64
+
+_cache_lock = threading.Lock()
+_cache = OrderedDict()  # (week, building) -> (version, report)
+
+
+def _share(booked, capacity):
+    """Доля занятых слотов; 0 там, где слотов нет вообще."""
+    booked = np.asarray(booked, dtype=float)
+    capacity = np.asarray(capacity, dtype=float)
+    return np.round(np.divide(booked, capacity, out=np.zeros_like(booked), where=capacity > 0), 4)
+
+
+def _grouped(labels: list, weights: np.ndarray, per_label_capacity: float):
+    """Сумма weights и доля занятости по каждому уникальному значению labels."""
+    uniq, inv = np.unique(np.asarray(labels), return_inverse=True)
+    booked = np.bincount(inv, weights=weights, minlength=len(uniq))
+    counts = np.bincount(inv, minlength=len(uniq))
+    return uniq.tolist(), counts.tolist(), _share(booked, counts * per_label_capacity).tolist()
+
+
+def compute_utilization(grid: OccupancyGrid) -> dict:
+    """
+    Загрузка аудиторий по сетке rooms × days × slots: доля занятых пар
+    по аудиториям, корпусам, неделям, дням недели и парам, пиковые часы
+    и ни разу не использованные аудитории.
+    """
+    cube = occupied_cube(grid)
+    n_rooms, n_days, n_slots = cube.shape
+    result = {
+        "rooms_total": n_rooms,
+        "days_total": n_days,
+        "overall": 0.0,
+        "rooms": [],
+        "buildings": [],
+        "by_week": [],
+        "by_weekday": [],
+        "by_slot": [],
+        "peak": [],
+        "never_used": list(grid.rooms) if n_days else [],
+    }
+    if n_rooms == 0 or n_days == 0:
+        return result
+
+    per_room = cube.sum(axis=(1, 2))          # занято пар у аудитории
+    per_day = cube.sum(axis=(0, 2))           # занято room-слотов в день
+    per_day_slot = cube.sum(axis=0)           # D × S
+    room_capacity = n_days * n_slots
+
+    result["overall"] = float(_share(per_room.sum(), n_rooms * room_capacity))
+
+    room_share = _share(per_room, room_capacity)
+    order = np.lexsort((np.array(grid.rooms), -room_share))
+    result["rooms"] = [
+        {"room": grid.rooms[i], "booked": int(per_room[i]), "share": float(room_share[i])}
+        for i in order.tolist()
+    ]
+    result["never_used"] = [grid.rooms[i] for i in np.flatnonzero(per_room == 0).tolist()]
+
+    buildings = [(parse_room(r) or (r, 0))[0] for r in grid.rooms]
+    names, counts, shares = _grouped(buildings, per_room, room_capacity)
+    result["buildings"] = [
+        {"building": b, "rooms": c, "share": s} for b, c, s in zip(names, counts, shares)
+    ]
+
+    weeks = [w for w, _ in grid.days]
+    names, counts, shares = _grouped(weeks, per_day, n_rooms * n_slots)
+    result["by_week"] = [
+        {"week": int(w), "days": c, "share": s} for w, c, s in zip(names, counts, shares)
+    ]
+
+    # дни без распознанного дня недели в разбивку по дням недели не попадают
+    prefixes = [d.split(",", 1)[0].strip() for _, d in grid.days]
+    known = np.array([p in WEEKDAYS for p in prefixes])
+    if not known.all():
+        unknown = sorted({d for (_, d), ok in zip(grid.days, known.tolist()) if not ok})
+        print(f"[UTILIZATION] Пропущено дней без распознанного дня недели: {len(unknown)} {unknown[:5]}")
+    weekday = np.array([WEEKDAYS.index(p) for p in prefixes if p in WEEKDAYS], dtype=int)
+    per_day_known = per_day[known]
+    per_day_slot_known = per_day_slot[known]
+    names, counts, shares = _grouped(weekday.tolist(), per_day_known, n_rooms * n_slots)
+    result["by_weekday"] = [
+        {"weekday": WEEKDAYS[w], "days": c, "share": s} for w, c, s in zip(names, counts, shares)
+    ]
+
+    slot_share = _share(per_day_slot.sum(axis=0), n_rooms * n_days)
+    result["by_slot"] = [
+        {"start_time": s, "end_time": e, "share": float(x)}
+        for (s, e), x in zip(SLOTS, slot_share.tolist())
+    ]
+
+    # тепловая карта день недели × пара и её пики
+    heat = np.zeros((len(WEEKDAYS), n_slots))
+    np.add.at(heat, weekday, per_day_slot_known)
+    days_per_weekday = np.bincount(weekday, minlength=len(WEEKDAYS))
+    heat_share = _share(heat, days_per_weekday[:, None] * n_rooms)
+    top = np.argsort(-heat_share, axis=None, kind="stable")[:PEAK_COUNT]
+    result["peak"] = [
+        {"weekday": WEEKDAYS[w], "start_time": SLOTS[s][0], "end_time": SLOTS[s][1],
+         "share": float(heat_share[w, s])}
+        for w, s in zip(*np.unravel_index(top, heat_share.shape))
+        if heat_share[w, s] > 0
+    ]
+    return result
+
+
+def room_universe(conn: sqlite3.Connection, building: str | None = None) -> list[str]:
+    """Все известные аудитории: встречавшиеся в room_slots плюс IT-аудитории."""
+    rooms = {r[0] for r in conn.execute("SELECT DISTINCT room FROM room_slots")}
+    rooms |= ALLOWED_IT_ROOMS
+    if building:
+        rooms = {r for r in rooms if (parse_room(r) or (r, 0))[0] == building}
+    return sorted(rooms)
+
+
+def get_utilization(conn: sqlite3.Connection, week: int | None = None,
+                    building: str | None = None) -> tuple[dict, str]:
+    """
+    Отчёт о загрузке из кеша процесса (LRU на CACHE_SIZE отчётов); пересчитывается,
+    только когда меняется occupancy.version (её повышает filter_db при пересчёте).
+    Возвращает (отчёт, версия данных).
+    """
+    version = get_meta(conn, "occupancy.version", "0")
+    key = (week, building)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == version:
+            _cache.move_to_end(key)
+            metrics.CACHE_REQUESTS.labels("utilization", "hit").inc()
+            return cached[1], version
+    metrics.CACHE_REQUESTS.labels("utilization", "miss").inc()
+    grid = load_grid(conn, rooms=room_universe(conn, building), week=week)
+    report = compute_utilization(grid)
+    with _cache_lock:
+        # устаревшие версии больше никому не нужны
+        for k in [k for k, v in _cache.items() if v[0] != version]:
+            del _cache[k]
+        _cache[key] = (version, report)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return report, version
+
+
+def print_report(report: dict):
+    print(f"Аудиторий: {report['rooms_total']}, дней: {report['days_total']}, "
+          f"общая загрузка: {report['overall']:.1%}")
+    print("\nПо корпусам:")
+    for b in report["buildings"]:
+        print(f"  {b['building']:<10} {b['rooms']:>4} ауд.  {b['share']:.1%}")
+    print("\nПо неделям:")
+    for w in report["by_week"]:
+        print(f"  неделя {w['week']:<4} {w['share']:.1%}")
+    print("\nПо дням недели:")
+    for d in report["by_weekday"]:
+        print(f"  {d['weekday']:<4} {d['share']:.1%}")
+    print("\nПо парам:")
+    for s in report["by_slot"]:
+        print(f"  {s['start_time']}–{s['end_time']}  {s['share']:.1%}")
+    print("\nПиковые часы:")
+    for p in report["peak"]:
+        print(f"  {p['weekday']} {p['start_time']}–{p['end_time']}  {p['share']:.1%}")
+    print("\nСамые загруженные аудитории:")
+    for r in report["rooms"][:10]:
+        print(f"  {r['room']:<14} {r['booked']:>4} пар  {r['share']:.1%}")
+    print(f"\nНи разу не использовались ({len(report['never_used'])}):")
+    for room in report["never_used"]:
+        print(f"  {room}")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Отчёт о загрузке аудиторий")
+    p.add_argument("--week", type=int, help="Только одна неделя")
+    p.add_argument("--building", help="Только один корпус, напр. 'ГУК Б'")
+    args = p.parse_args()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        report, _ = get_utilization(conn, week=args.week, building=args.building)
+    finally:
+        conn.close()
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""
+Метрики процесса в текстовом формате Prometheus.
+
+Реестр свой, без prometheus_client: счётчики и гистограммы с метками,
+изменение значения — поиск в словаре и сложение под блокировкой метрики,
+так что инструментирование можно не выключать в проде. API отдаёт метрики
+на /metrics, отдельные процессы (парсер, notifier) — через serve(port).
+
+Под gunicorn -w N у каждого воркера свой реестр, и /metrics без настройки
+отдал бы счётчики того воркера, который ответил. Поэтому воркерам задают
+общий каталог METRICS_MULTIPROC_DIR: каждый процесс раз в FLUSH_INTERVAL
+секунд (и при выходе) пишет снимок своих значений в <pid>.json, а render()
+складывает свои живые значения со снимками остальных процессов. Снимки
+завершившихся воркеров остаются — счётчики не убывают при перезапуске
+воркера, поэтому каталог очищают перед стартом сервиса, а у каждого
+сервиса (API, парсер, notifier) он свой.
+
+    from backend import metrics
+    metrics.EXTERNAL_CALLS.labels("telegram", "ok").inc()
+    with metrics.timer(metrics.PARSER_SCRAPE_SECONDS.labels()):
+        ...
+"""
+import atexit
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Границы гистограмм, с: от долей миллисекунды (SQLite) до десятков секунд (парсер)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Общий каталог снимков воркеров одного сервиса; пусто — метрики только своего процесса
+MULTIPROC_DIR = os.environ.get("METRICS_MULTIPROC_DIR", "")
+FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "5"))
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format(name: str, snapshot: dict) -> list[str]:
+    """Строки экспозиции метрики по её снимку (см. _Metric.snapshot)."""
+    lines = [f"# HELP {name} {snapshot['help']}", f"# TYPE {name} {snapshot['kind']}"]
+    labelnames = snapshot["labelnames"]
+    for values, state in sorted(snapshot["samples"], key=lambda sample: sample[0]):
+        labels = _format_labels(labelnames, values)
+        if snapshot["kind"] == "counter":
+            lines.append(f"{name}{labels} {_format_value(state)}")
+            continue
+        counts, total, count = state
+        cumulative = 0
+        for bound, bucket_count in zip(snapshot["buckets"] + [float("inf")], counts):
+            cumulative += bucket_count
+            le = _format_labels(labelnames, values, [("le", _format_value(float(bound)))])
+            lines.append(f"{name}_bucket{le} {cumulative}")
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {count}")
+    return lines
+
+
+class _Metric:
+    kind = ""
+    buckets = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def labels(self, *values):
+        """Дочерняя метрика для значений меток (в порядке labelnames)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: ожидались метки {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def snapshot(self) -> dict:
+        """Значения метрики в виде, пригодном для JSON и сложения между процессами."""
+        with self._lock:
+            children = list(self._children.items())
+        return {
+            "kind": self.kind,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "buckets": list(self.buckets) if self.buckets is not None else None,
+            "samples": [[[str(v) for v in values], child.state()] for values, child in children],
+        }
+
+    def collect(self) -> list[str]:
+        return _format(self.name, self.snapshot())
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self, lock):
+        self.value = 0
+        self._lock = lock
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def state(self):
+        return self.value
+
+    def reset(self):
+        self.value = 0
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets, lock):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = lock
+
+    def observe(self, value: float):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def state(self):
+        with self._lock:
+            return [list(self.counts), self.sum, self.count]
+
+    def reset(self):
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild(self._lock)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets, self._lock)
+
+
+@contextmanager
+def timer(histogram_child):
+    """Наблюдает длительность блока with в секундах."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram_child.observe(time.perf_counter() - start)
+
+
+def _snapshot() -> dict:
+    with _registry_lock:
+        metrics = list(_registry)
+    return {metric.name: metric.snapshot() for metric in metrics}
+
+
+def _merge(into: dict, other: dict):
+    """Прибавляет снимок другого процесса к into (счётчики и корзины складываются)."""
+    for name, snapshot in other.items():
+        mine = into.get(name)
+        if mine is None:
+            into[name] = snapshot
+            continue
+        if (mine["kind"], mine["labelnames"], mine["buckets"]) != \
+                (snapshot["kind"], snapshot["labelnames"], snapshot["buckets"]):
+            # снимок воркера со старой версией кода — не складываем несовместимое
+            continue
+        samples = {tuple(values): state for values, state in mine["samples"]}
+        for values, state in snapshot["samples"]:
+            key = tuple(values)
+            if key not in samples:
+                samples[key] = state
+            elif mine["kind"] == "counter":
+                samples[key] = samples[key] + state
+            else:
+                counts, total, count = samples[key]
+                samples[key] = [[a + b for a, b in zip(counts, state[0])], total + state[1], count + state[2]]
+        mine["samples"] = [[list(key), state] for key, state in samples.items()]
+
+
+def _snapshot_path(pid=None) -> str:
+    return os.path.join(MULTIPROC_DIR, f"{pid or os.getpid()}.json")
+
+
+def flush():
+    """Пишет снимок метрик процесса в MULTIPROC_DIR (атомарно, через os.replace)."""
+    if not MULTIPROC_DIR:
+        return
+    path = _snapshot_path()
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(_snapshot(), f)
+    os.replace(tmp, path)
+
+
+def _other_snapshots():
+    own = os.path.basename(_snapshot_path())
+    for filename in sorted(os.listdir(MULTIPROC_DIR)):
+        if not filename.endswith(".json") or filename == own:
+            continue
+        try:
+            with open(os.path.join(MULTIPROC_DIR, filename), encoding="utf-8") as f:
+                yield json.load(f)
+        except (OSError, ValueError):
+            continue
+
+
+def render() -> str:
+    """Метрики в текстовом формате Prometheus: процесса или, с MULTIPROC_DIR, всех воркеров."""
+    merged = _snapshot()
+    if MULTIPROC_DIR:
+        for other in _other_snapshots():
+            _merge(merged, other)
+    lines = []
+    for name, snapshot in merged.items():
+        lines += _format(name, snapshot)
+    return "\n".join(lines) + "\n"
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except OSError as e:
+            print(f"[METRICS] ❌ Не удалось записать снимок: {e}")
+
+
+def _start_flusher():
+    threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+
+
+def _after_fork():
+    # Воркер gunicorn --preload наследует значения мастера, а они уже в снимке
+    # мастера: обнуляем, иначе при сложении они посчитаются N + 1 раз. После
+    # fork в процессе один поток, блокировки метрик не берём.
+    for metric in _registry:
+        for child in metric._children.values():
+            child.reset()
+    _start_flusher()
+
+
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+    atexit.register(flush)
+    os.register_at_fork(after_in_child=_after_fork)
+    _start_flusher()
+
+
+# ——— Метрики приложения ——— #
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Время обработки запроса API",
+    ("method", "route", "status"))
+SQL_QUERY_SECONDS = Histogram(
+    "sqlite_query_duration_seconds", "Время выполнения запроса SQLite по виду запроса",
+    ("statement",))
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Обращения к кешам процесса (доля попаданий — hit / все)",
+    ("cache", "result"))
+PARSER_PAGES = Counter(
+    "parser_pages_total", "Обработанные парсером страницы (группа × неделя) по итогу",
+    ("status",))
+PARSER_SCRAPE_SECONDS = Histogram(
+    "parser_scrape_duration_seconds", "Время разбора одной страницы расписания через Selenium")
+EXTERNAL_CALLS = Counter(
+    "external_api_calls_total", "Вызовы внешних API (Google Calendar, Telegram Bot API)",
+    ("service", "outcome"))
+EXTERNAL_SECONDS = Histogram(
+    "external_api_call_duration_seconds", "Длительность одного HTTP-вызова внешнего API",
+    ("service",))
+
+
+# ——— Время запросов SQLite ——— #
+_VERB_RE = re.compile(r"^\s*(\w+)(?:\s+OR\s+\w+)?\s+([\w\"]+)?", re.IGNORECASE)
+_TABLE_RE = re.compile(r"\b(?:FROM|INTO|TABLE|INDEX|TRIGGER)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?([\w\"]+)",
+                       re.IGNORECASE)
+_statement_labels = {}
+STATEMENT_LABELS_MAX = 1000
+
+
+def statement_label(sql: str) -> str:
+    """Низкокардинальная метка запроса: 'SELECT schedule', 'INSERT users', 'PRAGMA'."""
+    label = _statement_labels.get(sql)
+    if label is None:
+        verb = _VERB_RE.match(sql)
+        if not verb:
+            label = "other"
+        else:
+            label = verb.group(1).upper()
+            # UPDATE <таблица>; у прочих — первая таблица после FROM/INTO/TABLE
+            table = verb.group(2) if label == "UPDATE" else None
+            if table is None and label not in ("BEGIN", "COMMIT", "ROLLBACK", "PRAGMA"):
+                match = _TABLE_RE.search(sql)
+                table = match.group(1) if match else None
+            if table:
+                label += " " + table.strip('"')
+        if len(_statement_labels) < STATEMENT_LABELS_MAX:
+            _statement_labels[sql] = label
+    return label
+
+
+class TimedConnection(sqlite3.Connection):
+    """
+    Соединение, замеряющее execute/executemany в sqlite_query_duration_seconds:
+    sqlite3.connect(path, factory=TimedConnection). Для SELECT замеряется шаг
+    до первой строки — в нём и проходят сортировки, группировки и полные
+    проходы по таблице; выборку остатка строк меряет вызывающий (query_db).
+    """
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            SQL_QUERY_SECONDS.labels(statement_label(sql)).observe(time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            SQL_QUERY_SECONDS.labels(statement_label(sql)).observe(time.perf_counter() - start)
+
+
+# ——— Отдача метрик из процессов без Flask ——— #
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Поднимает /metrics на port в фоновом потоке (парсер, notifier)."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"[METRICS] /metrics на порту {server.server_address[1]}")
+    return server
@@ -1,52 +1,84 @@
-import sqlite3
-from datetime import datetime, timedelta
-from backend.notifier.telegram_bot import send_telegram_message
-from backend.notifier.notifications_config import DATABASE_PATH
+"""
+Чтение новых записей changes_log для уведомлений.
+
+Вместо окна «изменения за последние 30 минут» (сравнение строк timestamp,
+из-за которого изменения терялись и дублировались при сдвиге интервала)
+notifier помнит id последней обработанной записи в meta и каждый тик
+читает только id > last_seen_id — диапазон по первичному ключу.
+Дайджесты подписчикам (fanout) записываются в outbox в одной транзакции
+со сдвигом водяного знака; отправляет их воркер доставки outbox, так что
+сбой Telegram не теряет изменения.
+"""
 import os
+import sqlite3
+
+from backend.database.database import create_app_tables, get_meta, init_db, set_meta
+from backend.notifier.fanout import build_digests
+from backend.notifier.notifications_config import BATCH_SIZE, DATABASE_PATH, TELEGRAM_CHAT_ID
+from backend.notifier.outbox import enqueue, init_outbox_table
+from backend.notifier.subscriptions import init_subscriptions_table
+
+WATERMARK_KEY = "notifier.last_seen_id"
+
+
+def connect(db_path: str = DATABASE_PATH) -> sqlite3.Connection:
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Файл БД не найден по пути: {db_path}")
+    conn = sqlite3.connect(db_path, timeout=5)
+    conn.row_factory = sqlite3.Row
+    init_db(conn)
+    create_app_tables(conn)
+    init_subscriptions_table(conn)
+    init_outbox_table(conn)
+    return conn
+
+
+def last_seen_id(conn: sqlite3.Connection) -> int:
+    """
+    Водяной знак notifier. При первом запуске — текущий конец лога:
+    историю, накопленную до запуска, не рассылаем.
+    """
+    value = get_meta(conn, WATERMARK_KEY)
+    if value is None:
+        value = conn.execute("SELECT coalesce(max(id), 0) FROM changes_log").fetchone()[0]
+        set_meta(conn, WATERMARK_KEY, value)
+        conn.commit()
+    return int(value)
+
+
+def fetch_changes(conn: sqlite3.Connection, after_id: int, limit: int = BATCH_SIZE) -> list:
+    """Записи changes_log с id > after_id по возрастанию id, не больше limit."""
+    return conn.execute(
+        "SELECT * FROM changes_log WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)
+    ).fetchall()
+
 
-print("\n" + "="*50)
-print(f"🕒 Запуск проверки в {datetime.now()}")
-
-# Проверка существования файла БД
-if not os.path.exists(DATABASE_PATH):
-    print(f"❌ Файл БД не найден по пути: {DATABASE_PATH}")
-    exit(1)
-
-try:
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    print(f"🔌 Подключено к БД: {DATABASE_PATH}")
-
-    thirty_minutes_ago = datetime.now() - timedelta(minutes=30)
-    print(f"⏳ Ищем изменения после: {thirty_minutes_ago}")
-
-    cursor.execute("""
-        SELECT schedule_id, change_type, timestamp 
-        FROM changes_log 
-        WHERE timestamp > ?
-        ORDER BY timestamp DESC
-    """, (thirty_minutes_ago.strftime("%Y-%m-%d %H:%M:%S"),))
-    
-    changes = cursor.fetchall()
-    conn.close()
-
-    print(f"📊 Найдено изменений: {len(changes)}")
-    
-    if not changes:
-        print("✅ Нет новых изменений")
-        exit(0)
-
-    message = "<b>🗓 Обнаружены изменения в расписании:</b>\n" + \
-              "\n".join(f"• [{row[1].upper()}] Пара ID: {row[0]} в {row[2]}" for row in changes)
-    
-    print(f"✉️ Текст сообщения:\n{message}")
-    
-    result = send_telegram_message(message)
-    if result.get('ok'):
-        print("✅ Сообщение успешно отправлено!")
-    else:
-        print(f"❌ Ошибка отправки: {result}")
-
-except Exception as e:
-    print(f"🔥 Критическая ошибка: {str(e)}")
-    raise
\ No newline at end of file
+def check_new_changes(conn: sqlite3.Connection | None = None, batch_size: int = BATCH_SIZE,
+                      all_changes_chat=TELEGRAM_CHAT_ID) -> int:
+    """
+    Превращает все изменения после водяного знака в дайджесты подписчикам
+    (пачками по batch_size, одна пачка — один дайджест на чат) и ставит их
+    в outbox. Очередь и новый водяной знак фиксируются одним commit.
+    Возвращает число обработанных изменений.
+    """
+    own = conn is None
+    if own:
+        conn = connect()
+    try:
+        after = last_seen_id(conn)
+        done = queued = 0
+        while True:
+            rows = fetch_changes(conn, after, batch_size)
+            if not rows:
+                break
+            after = rows[-1]["id"]
+            queued += enqueue(conn, build_digests(conn, rows, all_changes_chat), after)
+            set_meta(conn, WATERMARK_KEY, after)
+            conn.commit()
+            done += len(rows)
+        if done:
+            print(f"[NOTIFIER] Изменений: {done}, сообщений в outbox: {queued}, last_seen_id={after}")
+        return done
+    finally:
+        if own:
+            conn.close()
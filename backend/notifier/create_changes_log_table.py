@@ -1,24 +1,15 @@
 import sqlite3
-from datetime import datetime
 
-DB_PATH = "/backend/database/database1.db"  # указать реальный путь к дб
+from backend.database.database import init_db
+from backend.notifier.notifications_config import DATABASE_PATH
+
 
 def create_table():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS changes_log (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            schedule_id INTEGER,
-            change_type TEXT CHECK( change_type IN ('create','update','delete') ),
-            timestamp TEXT
-        )
-    """)
-    
-    conn.commit()
+    """changes_log и триггеры на schedule создаёт init_db — единая схема для всех модулей."""
+    conn = sqlite3.connect(DATABASE_PATH)
+    init_db(conn)
     conn.close()
-    print("✅ Таблица changes_log создана (или уже была).")
+    print("✅ Таблица changes_log и триггеры schedule созданы (или уже были).")
 
 if __name__ == "__main__":
     create_table()
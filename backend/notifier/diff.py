@@ -0,0 +1,121 @@
+"""
+Разница между прежним и новым набором занятий группы за неделю.
+
+Занятия сопоставляются по ключам через словари (плюс сортировка, чтобы
+переносы сопоставлялись по порядку), без попарного сравнения:
+  1. полностью совпавшие занятия (дата, время, предмет, преподаватели,
+     аудитории) не изменились; одинаковые занятия-дубли считаются одним;
+  2. оставшиеся с тем же слотом (дата, время, предмет) — смена аудитории
+     и/или преподавателя;
+  3. оставшиеся с тем же предметом — перенос (дата или время), пары
+     сопоставляются по порядку в расписании;
+  4. всё прочее — добавленные и удалённые занятия.
+"""
+import json
+
+ADDED = "added"
+REMOVED = "removed"
+MOVED = "moved"
+ROOM = "room"
+TEACHER = "teacher"
+
+ICONS = {ADDED: "➕", REMOVED: "➖", MOVED: "🔁", ROOM: "🚪", TEACHER: "👤"}
+
+
+def _as_tuple(value) -> tuple:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return (value,) if value else ()
+    return tuple(sorted(value)) if isinstance(value, list) else ()
+
+
+def normalize(image: dict) -> dict:
+    """Занятие из образа changes_log или строки schedule в сравнимом виде."""
+    return {
+        "date": image.get("date") or "",
+        "time": image.get("time") or "",
+        "date_iso": image.get("date_iso") or "",
+        "start_min": image.get("start_min") if image.get("start_min") is not None else -1,
+        "subject": image.get("subject") or "",
+        "teachers": _as_tuple(image.get("teachers")),
+        "rooms": _as_tuple(image.get("rooms")),
+    }
+
+
+def _slot(lesson: dict) -> tuple:
+    return (lesson["date_iso"] or lesson["date"], lesson["start_min"], lesson["time"])
+
+
+def _identity(lesson: dict) -> tuple:
+    return _slot(lesson) + (lesson["subject"], lesson["teachers"], lesson["rooms"])
+
+
+def _order(lesson: dict) -> tuple:
+    return _slot(lesson) + (lesson["subject"],)
+
+
+def _pair(removed: dict, added: dict, key) -> list:
+    """Сопоставляет оставшиеся занятия с одинаковым key; сопоставленные убирает из словарей."""
+    by_key = {}
+    for identity, lesson in sorted(added.items(), key=lambda item: _order(item[1])):
+        by_key.setdefault(key(lesson), []).append(identity)
+    pairs = []
+    for identity, lesson in sorted(removed.items(), key=lambda item: _order(item[1])):
+        candidates = by_key.get(key(lesson))
+        if candidates:
+            pairs.append((removed.pop(identity), added.pop(candidates.pop(0))))
+    return pairs
+
+
+def diff_lessons(old: list[dict], new: list[dict]) -> list[dict]:
+    """
+    Изменения между наборами занятий old и new (нормализованными, см. normalize):
+    [{"type": ADDED|REMOVED|MOVED|ROOM|TEACHER, "old": занятие|None, "new": занятие|None}],
+    по порядку в расписании. ROOM — сменилась аудитория (и, возможно, преподаватель).
+    """
+    old_by_id = {_identity(l): l for l in old}
+    new_by_id = {_identity(l): l for l in new}
+    removed = {k: l for k, l in old_by_id.items() if k not in new_by_id}
+    added = {k: l for k, l in new_by_id.items() if k not in old_by_id}
+
+    changes = []
+    for before, after in _pair(removed, added, lambda l: _slot(l) + (l["subject"],)):
+        kind = ROOM if before["rooms"] != after["rooms"] else TEACHER
+        changes.append({"type": kind, "old": before, "new": after})
+    for before, after in _pair(removed, added, lambda l: l["subject"]):
+        changes.append({"type": MOVED, "old": before, "new": after})
+    changes += [{"type": REMOVED, "old": l, "new": None} for l in removed.values()]
+    changes += [{"type": ADDED, "old": None, "new": l} for l in added.values()]
+    changes.sort(key=lambda c: _order(c["new"] or c["old"]))
+    return changes
+
+
+def _when(lesson: dict) -> str:
+    return f"{lesson['date']} {lesson['time']}".strip()
+
+
+def _rooms(lesson: dict) -> str:
+    return ", ".join(lesson["rooms"]) or "—"
+
+
+def render_change(change: dict) -> str:
+    """Одна строка дайджеста."""
+    kind, old, new = change["type"], change["old"], change["new"]
+    icon = ICONS[kind]
+    if kind in (ADDED, REMOVED):
+        lesson = new or old
+        return f"{icon} {_when(lesson)} {lesson['subject']} ({_rooms(lesson)})"
+    if kind == MOVED:
+        line = f"{icon} {new['subject']}: {_when(old)} → {_when(new)}"
+        return line + (f" ({_rooms(new)})" if old["rooms"] == new["rooms"] else
+                       f" ({_rooms(old)} → {_rooms(new)})")
+    line = f"{icon} {_when(new)} {new['subject']}:"
+    if old["rooms"] != new["rooms"]:
+        line += f" {_rooms(old)} → {_rooms(new)}"
+    if old["teachers"] != new["teachers"]:
+        if old["rooms"] != new["rooms"]:
+            line += ";"
+        line += f" {', '.join(old['teachers']) or '—'} → {', '.join(new['teachers']) or '—'}"
+    return line
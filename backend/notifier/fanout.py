@@ -0,0 +1,155 @@
+"""
+Рассылка изменений подписчикам: изменения пачки changes_log сводятся к
+разнице занятий по неделям групп (diff), всё, что касается чата, склеивается
+в один дайджест. Дайджесты ставятся в outbox, доставкой занимается его воркер.
+"""
+import json
+import sqlite3
+from html import escape
+
+from backend.notifier.diff import diff_lessons, normalize, render_change
+from backend.notifier.subscriptions import CHUNK, subscribers_for
+from backend.notifier.telegram_bot import MAX_MESSAGE_LENGTH
+
+HEADER = "<b>🗓 Обнаружены изменения в расписании:</b>"
+SCHEDULE_COLUMNS = ("id", "group_id", "week", "date", "time", "subject", "teachers", "rooms",
+                    "date_iso", "start_min", "end_min")
+
+
+def _image(raw):
+    if not raw:
+        return None
+    try:
+        image = json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+    return image if isinstance(image, dict) else None
+
+
+def _row_image(row) -> dict:
+    return dict(zip(SCHEDULE_COLUMNS, row))
+
+
+def net_images(conn: sqlite3.Connection, rows: list) -> tuple[dict, list]:
+    """
+    Итог пачки changes_log по каждой строке schedule: ({schedule_id: (образ
+    до пачки | None, образ после | None)}, строки без образов и без строки
+    в schedule). Для записей без образов (вставленных вручную) образ
+    «после» берётся из текущей строки schedule.
+    """
+    net, bare = {}, {}
+    for row in rows:
+        old, new = _image(row["old_data"]), _image(row["new_data"])
+        sid = row["schedule_id"]
+        if old is None and new is None:
+            bare.setdefault(sid, []).append(row)
+            continue
+        first = net.get(sid, (old, None))[0]
+        net[sid] = (first, new)
+    ids = [sid for sid in bare if sid is not None and sid not in net]
+    for i in range(0, len(ids), CHUNK):
+        chunk = ids[i:i + CHUNK]
+        for lesson in conn.execute(
+                f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM schedule "
+                f"WHERE id IN ({','.join('?' * len(chunk))})", chunk).fetchall():
+            net[lesson[0]] = (None, _row_image(lesson))
+            bare.pop(lesson[0])
+    return net, [row for sid, sid_rows in bare.items() if sid not in net for row in sid_rows]
+
+
+def diff_changes(conn: sqlite3.Connection, net: dict) -> dict:
+    """
+    {(group_id, week): [изменение diff_lessons]} для затронутых недель групп.
+    Прежний набор — нетронутые пачкой занятия недели плюс образы «до»,
+    новый — нетронутые плюс образы «после»; так дубли уже существующих
+    занятий (повторный парсинг) не выглядят добавлениями.
+    """
+    touched = {}
+    for sid, (old, new) in net.items():
+        for side, image in (("old", old), ("new", new)):
+            if image:
+                week_key = (image.get("group_id"), image.get("week"))
+                touched.setdefault(week_key, {"old": [], "new": []})[side].append(image)
+
+    result = {}
+    for (group_id, week), images in touched.items():
+        untouched = [
+            normalize(_row_image(lesson)) for lesson in conn.execute(
+                f"SELECT {', '.join(SCHEDULE_COLUMNS)} FROM schedule WHERE group_id = ? AND week = ?",
+                (group_id, week)
+            ).fetchall() if lesson[0] not in net
+        ]
+        changes = diff_lessons(untouched + [normalize(i) for i in images["old"]],
+                               untouched + [normalize(i) for i in images["new"]])
+        if changes:
+            result[(group_id, week)] = changes
+    return result
+
+
+def _targets(change: dict, group: str | None) -> set:
+    targets = {("group", group)} if group else set()
+    for lesson in (change["old"], change["new"]):
+        if lesson:
+            targets |= {("teacher", t) for t in lesson["teachers"]}
+            targets |= {("room", r) for r in lesson["rooms"]}
+    return targets
+
+
+def _bare_line(row) -> str:
+    kind = row["change_type"] or "update"
+    return f"• [{kind.upper()}] Пара ID: {row['schedule_id']} в {row['changed_at']}"
+
+
+def render_digest(lines: list[str]) -> str:
+    """Дайджест в пределах лимита длины сообщения Telegram."""
+    text = HEADER
+    for i, line in enumerate(lines):
+        rest = len(lines) - i
+        tail = f"\n… и ещё {rest}"
+        if len(text) + 1 + len(line) + len(tail) > MAX_MESSAGE_LENGTH and rest > 1:
+            return text + tail
+        text += "\n" + line
+    return text
+
+
+def build_digests(conn: sqlite3.Connection, rows: list, all_changes_chat=None) -> dict:
+    """
+    {chat_id: текст дайджеста} по пачке строк changes_log. Изменения сводятся
+    к разнице занятий по неделям групп (diff_lessons), и каждый чат получает
+    одно сообщение с изменениями своих групп, преподавателей и аудиторий,
+    сгруппированными по группе и неделе. all_changes_chat (если задан)
+    получает все изменения пачки.
+    """
+    net, bare = net_images(conn, rows)
+    diffs = diff_changes(conn, net)
+    group_ids = sorted({group_id for group_id, _ in diffs} - {None})
+    group_names = dict(conn.execute(
+        f"SELECT id, name FROM groups WHERE id IN ({','.join('?' * len(group_ids))})", group_ids
+    ).fetchall()) if group_ids else {}
+
+    change_targets = {
+        (week_key, i): _targets(change, group_names.get(week_key[0]))
+        for week_key, changes in diffs.items() for i, change in enumerate(changes)
+    }
+    subscribers = subscribers_for(conn, set().union(*change_targets.values()))
+
+    per_chat = {}  # chat_id -> {(group_id, week): [строки]}
+    for (week_key, i), targets in change_targets.items():
+        chats = {chat for target in targets for chat in subscribers.get(target, ())}
+        if all_changes_chat:
+            chats.add(str(all_changes_chat))
+        line = render_change(diffs[week_key][i])
+        for chat in chats:
+            per_chat.setdefault(chat, {}).setdefault(week_key, []).append(line)
+
+    digests = {}
+    for chat, weeks in per_chat.items():
+        lines = []
+        for (group_id, week) in sorted(weeks, key=lambda k: (group_names.get(k[0], ""), k[1] or 0)):
+            lines.append(f"<b>{escape(group_names.get(group_id, str(group_id)))}</b> · неделя {week}")
+            lines += [escape(line) for line in weeks[(group_id, week)]]
+        digests[chat] = lines
+    if all_changes_chat and bare:
+        digests.setdefault(str(all_changes_chat), []).extend(_bare_line(row) for row in bare)
+    return {chat: render_digest(lines) for chat, lines in digests.items()}
+
@@ -1,22 +1,24 @@
 import sqlite3
-from datetime import datetime, timezone  # добавили timezone сюда
-from backend.database.database import get_db_connection
+from datetime import datetime
+
+from backend.database.database import init_db
+from backend.notifier.notifications_config import DATABASE_PATH
 
-DB_PATH = "/backend/database/database1.db"  # укажи реальный путь к БД
 
 def insert_test_change():
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(DATABASE_PATH)
+    init_db(conn)
     cursor = conn.cursor()
 
-    now = datetime.now()  # или используй localtime, если все данные в local
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     cursor.execute("""
-        INSERT INTO changes_log (schedule_id, change_type, timestamp)
+        INSERT INTO changes_log (schedule_id, change_type, changed_at)
         VALUES (?, ?, ?)
     """, (999, 'update', now))
 
     conn.commit()
     conn.close()
-    print(f"✅ Вставлено тестовое изменение с timestamp: {now}")
+    print(f"✅ Вставлено тестовое изменение с changed_at: {now}")
 
 if __name__ == "__main__":
-    insert_test_change()
\ No newline at end of file
+    insert_test_change()
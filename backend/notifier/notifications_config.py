@@ -1,6 +1,16 @@
 import os
 
+from backend.database.database import DB_PATH
+
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "") # укащать реальный токен бота
-TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "") #указать реальный чат ID
-DATABASE_PATH = os.getenv("DATABASE_PATH", "/backend/database/database1.db") #указать реальный путь к дб
-CHECK_INTERVAL_SECONDS = 1800  # 30 минут
\ No newline at end of file
+TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "") # чат, получающий все изменения (необязательно)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+DATABASE_PATH = os.getenv("DATABASE_PATH", DB_PATH)
+# Изменения будят notifier событием schedule.changed; опрос changes_log раз в
+# CHECK_INTERVAL_SECONDS остаётся подстраховкой для правок в обход издателей
+CHECK_INTERVAL_SECONDS = float(os.getenv("CHECK_INTERVAL_SECONDS", "60"))
+BATCH_SIZE = int(os.getenv("NOTIFIER_BATCH_SIZE", "50"))  # изменений changes_log за одну пачку
+# Лимиты Bot API: ~30 сообщений в секунду на бота, 1 сообщение в секунду в один чат
+GLOBAL_RATE = float(os.getenv("TELEGRAM_RATE", "30"))
+PER_CHAT_INTERVAL = 1.0
+SEND_WORKERS = int(os.getenv("TELEGRAM_WORKERS", "8"))
@@ -0,0 +1,245 @@
+"""
+Надёжная доставка уведомлений через таблицу outbox.
+
+check_new_changes записывает дайджесты в outbox в той же транзакции, что
+сдвигает водяной знак changes_log, так что изменение либо уже стоит в
+очереди на отправку, либо будет прочитано снова. Воркер доставки забирает
+сообщения пачками, отправляет их параллельно и отмечает результат:
+временные ошибки (сеть, 5xx, 429) планируются на повтор с экспоненциальной
+задержкой, но не раньше retry_after от Telegram; постоянные (бот
+заблокирован) и исчерпавшие попытки помечаются dead.
+
+    python -m backend.notifier.outbox            # воркер доставки
+    python -m backend.notifier.outbox --stats    # глубина очереди и задержка доставки
+"""
+import argparse
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from backend.notifier.notifications_config import DATABASE_PATH, SEND_WORKERS
+from backend.notifier.telegram_bot import PERMANENT_STATUSES, TelegramSender
+
+CLAIM_BATCH = 100
+MAX_ATTEMPTS = 8
+BASE_DELAY = 2.0       # секунды до первого повтора
+MAX_DELAY = 600.0
+# Сообщение в статусе sending дольше этого — воркер упал, вернуть в очередь
+STALE_AFTER = timedelta(minutes=5)
+IDLE_INTERVAL = 1.0
+LATENCY_WINDOW = 1000  # последних доставленных сообщений для оценки задержки
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def init_outbox_table(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS outbox (
+        id               INTEGER PRIMARY KEY AUTOINCREMENT,
+        dedup_key        TEXT    NOT NULL UNIQUE,  -- повторная запись того же дайджеста игнорируется
+        chat_id          TEXT    NOT NULL,
+        text             TEXT    NOT NULL,
+        status           TEXT    NOT NULL DEFAULT 'queued'
+                         CHECK (status IN ('queued', 'sending', 'sent', 'dead')),
+        attempts         INTEGER NOT NULL DEFAULT 0,
+        next_attempt_at  TEXT    NOT NULL,
+        created_at       TEXT    NOT NULL,
+        claimed_at       TEXT,
+        sent_at          TEXT,
+        last_error       TEXT
+    );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at);")
+    conn.commit()
+
+
+def enqueue(conn: sqlite3.Connection, digests: dict, batch_key) -> int:
+    """
+    Ставит дайджесты {chat_id: text} в очередь в текущей транзакции (commit —
+    за вызывающим). batch_key — id последнего изменения пачки: вместе с chat_id
+    он даёт ключ, по которому повторная запись той же пачки не создаёт дублей.
+    """
+    now = _now().isoformat()
+    cur = conn.executemany(
+        "INSERT OR IGNORE INTO outbox (dedup_key, chat_id, text, next_attempt_at, created_at) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [(f"{batch_key}:{chat_id}", str(chat_id), text, now, now) for chat_id, text in digests.items()]
+    )
+    return cur.rowcount
+
+
+def claim(conn: sqlite3.Connection, limit: int = CLAIM_BATCH) -> list:
+    """
+    Забирает до limit сообщений, срок отправки которых наступил
+    (и возвращает в очередь зависшие в sending). Возвращает [(id, chat_id, text, attempts)].
+    """
+    now = _now()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "UPDATE outbox SET status = 'queued' WHERE status = 'sending' AND claimed_at < ?",
+            ((now - STALE_AFTER).isoformat(),)
+        )
+        rows = conn.execute("""
+            UPDATE outbox SET status = 'sending', claimed_at = ?
+            WHERE id IN (
+                SELECT id FROM outbox
+                WHERE status = 'queued' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at, id LIMIT ?
+            )
+            RETURNING id, chat_id, text, attempts
+        """, (now.isoformat(), now.isoformat(), limit)).fetchall()
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return sorted(tuple(r) for r in rows)
+
+
+def retry_delay(attempts: int, retry_after=None) -> float:
+    """Экспоненциальная задержка, но не меньше retry_after из ответа Telegram."""
+    return max(float(retry_after or 0), min(MAX_DELAY, BASE_DELAY * 2 ** attempts))
+
+
+def record_results(conn: sqlite3.Connection, results: list) -> dict:
+    """
+    Отмечает результаты [(id, attempts, ответ Bot API)] одной транзакцией.
+    Обновляются только строки в статусе sending, поэтому повторная отметка
+    ничего не меняет.
+    """
+    now = _now()
+    stats = {"sent": 0, "retry": 0, "dead": 0}
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for message_id, attempts, result in results:
+            attempts += 1
+            if result.get("ok"):
+                conn.execute(
+                    "UPDATE outbox SET status = 'sent', attempts = ?, sent_at = ?, last_error = NULL "
+                    "WHERE id = ? AND status = 'sending'",
+                    (attempts, now.isoformat(), message_id)
+                )
+                stats["sent"] += 1
+                continue
+            error = json.dumps(result, ensure_ascii=False)[:500]
+            if result.get("error_code") in PERMANENT_STATUSES or attempts >= MAX_ATTEMPTS:
+                conn.execute(
+                    "UPDATE outbox SET status = 'dead', attempts = ?, last_error = ? "
+                    "WHERE id = ? AND status = 'sending'",
+                    (attempts, error, message_id)
+                )
+                stats["dead"] += 1
+                continue
+            retry_after = (result.get("parameters") or {}).get("retry_after")
+            due = now + timedelta(seconds=retry_delay(attempts - 1, retry_after))
+            conn.execute(
+                "UPDATE outbox SET status = 'queued', attempts = ?, next_attempt_at = ?, last_error = ? "
+                "WHERE id = ? AND status = 'sending'",
+                (attempts, due.isoformat(), error, message_id)
+            )
+            stats["retry"] += 1
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return stats
+
+
+def deliver_batch(conn: sqlite3.Connection, sender, limit: int = CLAIM_BATCH,
+                  workers: int = SEND_WORKERS) -> dict:
+    """Одна итерация воркера: claim, параллельная отправка, отметка результатов."""
+    messages = claim(conn, limit)
+    if not messages:
+        return {"sent": 0, "retry": 0, "dead": 0}
+
+    def send(message):
+        message_id, chat_id, text, attempts = message
+        return message_id, attempts, sender.send(chat_id, text)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="outbox") as pool:
+        results = list(pool.map(send, messages))
+    return record_results(conn, results)
+
+
+def next_due_in(conn: sqlite3.Connection):
+    """Секунд до ближайшего запланированного повтора (0 — уже пора) или None, если очередь пуста."""
+    due = conn.execute("SELECT min(next_attempt_at) FROM outbox WHERE status = 'queued'").fetchone()[0]
+    if due is None:
+        return None
+    return max(0.0, (datetime.fromisoformat(due) - _now()).total_seconds())
+
+
+def outbox_stats(conn: sqlite3.Connection) -> dict:
+    """Глубина очереди по статусам, возраст старейшего ожидающего и задержка доставки (с)."""
+    counts = dict(conn.execute("SELECT status, count(*) FROM outbox GROUP BY status").fetchall())
+    now = _now()
+    oldest = conn.execute(
+        "SELECT min(created_at) FROM outbox WHERE status IN ('queued', 'sending')"
+    ).fetchone()[0]
+    latencies = sorted(
+        (datetime.fromisoformat(sent) - datetime.fromisoformat(created)).total_seconds()
+        for created, sent in conn.execute(
+            "SELECT created_at, sent_at FROM outbox WHERE status = 'sent' "
+            "ORDER BY id DESC LIMIT ?", (LATENCY_WINDOW,)
+        )
+    )
+    return {
+        "queued": counts.get("queued", 0),
+        "sending": counts.get("sending", 0),
+        "sent": counts.get("sent", 0),
+        "dead": counts.get("dead", 0),
+        "oldest_pending_s": (now - datetime.fromisoformat(oldest)).total_seconds() if oldest else 0.0,
+        "latency_p50_s": latencies[len(latencies) // 2] if latencies else None,
+        "latency_p95_s": latencies[int(len(latencies) * 0.95)] if latencies else None,
+    }
+
+
+def connect(db_path: str = DATABASE_PATH) -> sqlite3.Connection:
+    """Соединение воркера в autocommit: транзакции claim/record_results открываются явно."""
+    conn = sqlite3.connect(db_path, timeout=5, isolation_level=None)
+    init_outbox_table(conn)
+    return conn
+
+
+def run_worker(db_path: str = DATABASE_PATH, sender=None, limit: int = CLAIM_BATCH,
+               workers: int = SEND_WORKERS, idle_interval: float = IDLE_INTERVAL):
+    """Разбирает outbox, пока не прервут; при пустой очереди ждёт idle_interval."""
+    conn = connect(db_path)
+    # повторы планирует outbox, отправитель только соблюдает лимиты Telegram
+    sender = sender or TelegramSender(max_retries=0)
+    print(f"[OUTBOX] Воркер доставки запущен, БД {db_path}")
+    try:
+        while True:
+            stats = deliver_batch(conn, sender, limit, workers)
+            if any(stats.values()):
+                print(f"[OUTBOX] Отправлено {stats['sent']}, на повтор {stats['retry']}, "
+                      f"отброшено {stats['dead']}")
+            else:
+                time.sleep(idle_interval)
+    except KeyboardInterrupt:
+        print("[OUTBOX] Остановлен")
+    finally:
+        conn.close()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Доставка уведомлений из outbox")
+    p.add_argument("--db", default=DATABASE_PATH)
+    p.add_argument("--batch-size", type=int, default=CLAIM_BATCH)
+    p.add_argument("--workers", type=int, default=SEND_WORKERS)
+    p.add_argument("--stats", action="store_true", help="показать состояние очереди и выйти")
+    args = p.parse_args()
+    if args.stats:
+        conn = connect(args.db)
+        print(json.dumps(outbox_stats(conn), ensure_ascii=False, indent=2))
+        conn.close()
+        return
+    run_worker(args.db, limit=args.batch_size, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
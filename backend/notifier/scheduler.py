@@ -1,8 +1,73 @@
-import time
-from backend.notifier.check_changes import check_new_changes
-from backend.notifier.notifications_config import CHECK_INTERVAL_SECONDS
+"""
+Долгоживущий notifier: просыпается по событию schedule.changed (парсер, API)
+или не реже раза в interval секунд, проверяет changes_log одним запросом
+по id, ставит дайджесты в outbox и отправляет те, срок отправки которых
+наступил (отдельный воркер — python -m backend.notifier.outbox).
+
+    python -m backend.notifier.scheduler --interval 60
+"""
+import argparse
+import sys
+from datetime import datetime
+
+from backend import metrics
+from backend.database.events import SCHEDULE_CHANGED, Subscriber
+from backend.notifier import outbox
+from backend.notifier.check_changes import check_new_changes, connect
+from backend.notifier.telegram_bot import TelegramSender
+from backend.notifier.notifications_config import BATCH_SIZE, CHECK_INTERVAL_SECONDS, DATABASE_PATH
+
+
+def run(db_path: str = DATABASE_PATH, interval: float = CHECK_INTERVAL_SECONDS,
+        batch_size: int = BATCH_SIZE, once: bool = False):
+    conn = connect(db_path)
+    outbox_conn = outbox.connect(db_path)
+    sender = TelegramSender(max_retries=0)
+    events = Subscriber("notifier", [SCHEDULE_CHANGED], db_path)
+    print(f"[NOTIFIER] Запуск в {datetime.now()}, БД {db_path}, проверка по событиям "
+          f"и не реже раза в {interval} с")
+    try:
+        while True:
+            try:
+                # события только будят: сами изменения читаются из changes_log
+                pending = events.poll()
+                check_new_changes(conn, batch_size=batch_size)
+                if pending:
+                    events.ack(pending[-1]["id"])
+                while any(outbox.deliver_batch(outbox_conn, sender).values()):
+                    pass
+                due = outbox.next_due_in(outbox_conn)
+            except Exception as e:
+                # одиночный сбой (блокировка БД и т.п.) не должен останавливать цикл
+                print(f"[NOTIFIER] Ошибка проверки: {e}")
+                due = None
+            if once:
+                break
+            events.wait(interval if due is None else min(interval, due))
+    except KeyboardInterrupt:
+        print("[NOTIFIER] Остановлен")
+    finally:
+        events.close()
+        outbox_conn.close()
+        conn.close()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Рассылка изменений расписания в Telegram")
+    p.add_argument("--db", default=DATABASE_PATH)
+    p.add_argument("--interval", type=float, default=CHECK_INTERVAL_SECONDS)
+    p.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    p.add_argument("--once", action="store_true", help="одна проверка и выход")
+    p.add_argument("--metrics-port", type=int, help="отдавать метрики Prometheus на этом порту")
+    args = p.parse_args()
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    try:
+        run(args.db, args.interval, args.batch_size, args.once)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    while True:
-        check_new_changes()
-        time.sleep(CHECK_INTERVAL_SECONDS)
+    main()
@@ -0,0 +1,97 @@
+"""
+Подписки чатов Telegram на изменения расписания группы, преподавателя
+или аудитории.
+
+    python -m backend.notifier.subscriptions add 123456 group М8О-201Б-22
+    python -m backend.notifier.subscriptions remove 123456 group М8О-201Б-22
+    python -m backend.notifier.subscriptions list
+"""
+import argparse
+import sqlite3
+from datetime import datetime, timezone
+
+from backend.notifier.notifications_config import DATABASE_PATH
+
+KINDS = ("group", "teacher", "room")
+CHUNK = 500  # параметров в одном IN (...)
+
+
+def init_subscriptions_table(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS subscriptions (
+        chat_id     TEXT NOT NULL,
+        kind        TEXT NOT NULL CHECK (kind IN ('group', 'teacher', 'room')),
+        name        TEXT NOT NULL,
+        created_at  TEXT NOT NULL,
+        PRIMARY KEY (chat_id, kind, name)
+    );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_subscriptions_target ON subscriptions(kind, name);")
+    conn.commit()
+
+
+def subscribe(conn: sqlite3.Connection, chat_id, kind: str, name: str):
+    if kind not in KINDS:
+        raise ValueError(f"Неизвестный тип подписки: {kind}")
+    conn.execute(
+        "INSERT OR IGNORE INTO subscriptions (chat_id, kind, name, created_at) VALUES (?, ?, ?, ?)",
+        (str(chat_id), kind, name, datetime.now(timezone.utc).isoformat())
+    )
+    conn.commit()
+
+
+def unsubscribe(conn: sqlite3.Connection, chat_id, kind: str, name: str):
+    conn.execute(
+        "DELETE FROM subscriptions WHERE chat_id = ? AND kind = ? AND name = ?",
+        (str(chat_id), kind, name)
+    )
+    conn.commit()
+
+
+def subscribers_for(conn: sqlite3.Connection, targets) -> dict:
+    """{(kind, name): [chat_id, ...]} для набора целей; по одному запросу на CHUNK имён."""
+    names = {}
+    for kind, name in targets:
+        names.setdefault(kind, set()).add(name)
+    result = {}
+    for kind, values in names.items():
+        values = sorted(values)
+        for i in range(0, len(values), CHUNK):
+            chunk = values[i:i + CHUNK]
+            rows = conn.execute(
+                f"SELECT name, chat_id FROM subscriptions "
+                f"WHERE kind = ? AND name IN ({','.join('?' * len(chunk))})",
+                (kind, *chunk)
+            ).fetchall()
+            for name, chat_id in rows:
+                result.setdefault((kind, name), []).append(chat_id)
+    return result
+
+
+def main():
+    p = argparse.ArgumentParser(description="Подписки на изменения расписания")
+    p.add_argument("--db", default=DATABASE_PATH)
+    sub = p.add_subparsers(dest="command", required=True)
+    for command in ("add", "remove"):
+        cmd = sub.add_parser(command)
+        cmd.add_argument("chat_id")
+        cmd.add_argument("kind", choices=KINDS)
+        cmd.add_argument("name")
+    sub.add_parser("list")
+    args = p.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    init_subscriptions_table(conn)
+    if args.command == "add":
+        subscribe(conn, args.chat_id, args.kind, args.name)
+    elif args.command == "remove":
+        unsubscribe(conn, args.chat_id, args.kind, args.name)
+    else:
+        for chat_id, kind, name in conn.execute(
+                "SELECT chat_id, kind, name FROM subscriptions ORDER BY kind, name, chat_id"):
+            print(f"{chat_id}\t{kind}\t{name}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,114 @@
+"""
+Отправка сообщений через Telegram Bot API.
+
+TelegramSender держит пул соединений (requests.Session на поток) и соблюдает
+ограничения Telegram: около 30 сообщений в секунду на бота в целом и не
+больше одного сообщения в секунду в один чат. Ответ 429 с retry_after
+повторяется после указанной паузы.
+"""
+import threading
+import time
 
 import requests
-from backend.notifier.notifications_config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
-
-def send_telegram_message(text):
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    try:
-        response = requests.post(url, json={  # Используем json вместо data
-            "chat_id": TELEGRAM_CHAT_ID,
-            "text": text,
-            "parse_mode": "HTML"
-        }, timeout=5)
-        print(f"Telegram API response: {response.status_code} {response.text}")  # Логирование
-        return response.json()
-    except Exception as e:
-        print(f"Telegram send error: {str(e)}")
-        return {"ok": False, "error": str(e)}
\ No newline at end of file
+from requests.adapters import HTTPAdapter
+
+from backend import metrics
+from backend.api.api_executor import PerThread, TokenBucket
+from backend.notifier.notifications_config import (
+    GLOBAL_RATE, PER_CHAT_INTERVAL, SEND_WORKERS, TELEGRAM_API_URL,
+    TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID,
+)
+
+MAX_MESSAGE_LENGTH = 4096
+MAX_RETRIES = 3
+# Ошибки, которые повтор не исправит: бот заблокирован, чат не найден и т.п.
+PERMANENT_STATUSES = {400, 403}
+
+
+def _new_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class TelegramSender:
+    """
+    Потокобезопасный отправитель: send(chat_id, text) -> ответ Bot API (dict).
+    rate=0 отключает общий лимит, per_chat_interval=0 — лимит на чат,
+    max_retries=0 — повторы остаются вызывающему (outbox планирует их сам).
+    """
+
+    def __init__(self, token: str = TELEGRAM_BOT_TOKEN, api_url: str = TELEGRAM_API_URL,
+                 rate: float = GLOBAL_RATE, per_chat_interval: float = PER_CHAT_INTERVAL,
+                 timeout: float = 5, max_retries: int = MAX_RETRIES,
+                 sleep=time.sleep, clock=time.monotonic):
+        self.url = f"{api_url.rstrip('/')}/bot{token}/sendMessage"
+        self.bucket = TokenBucket(rate, max(1, int(rate)), clock=clock, sleep=sleep) if rate else None
+        self.per_chat_interval = per_chat_interval
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._sleep = sleep
+        self._clock = clock
+        self._sessions = PerThread(lambda: _new_session(SEND_WORKERS))
+        self._lock = threading.Lock()
+        self._next_slot = {}  # chat_id -> момент, раньше которого в чат не пишем
+
+    def _wait_chat(self, chat_id):
+        if not self.per_chat_interval:
+            return
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next_slot.get(chat_id, now))
+            self._next_slot[chat_id] = slot + self.per_chat_interval
+        if slot > now:
+            self._sleep(slot - now)
+
+    def send(self, chat_id, text: str) -> dict:
+        if len(text) > MAX_MESSAGE_LENGTH:
+            text = text[:MAX_MESSAGE_LENGTH - 1] + "…"
+        payload = {"chat_id": chat_id, "text": text, "parse_mode": "HTML"}
+        result = {"ok": False}
+        for attempt in range(self.max_retries + 1):
+            self._wait_chat(chat_id)
+            if self.bucket:
+                self.bucket.acquire()
+            start = time.perf_counter()
+            try:
+                response = self._sessions.get().post(self.url, json=payload, timeout=self.timeout)
+                result = response.json()
+            except Exception as e:  # сеть, таймаут, не-JSON ответ
+                result = {"ok": False, "error": str(e)}
+            metrics.EXTERNAL_SECONDS.labels("telegram").observe(time.perf_counter() - start)
+            metrics.EXTERNAL_CALLS.labels(
+                "telegram", "ok" if result.get("ok") else str(result.get("error_code", "error"))
+            ).inc()
+            if result.get("ok") or result.get("error_code") in PERMANENT_STATUSES:
+                return result
+            if attempt < self.max_retries:
+                retry_after = (result.get("parameters") or {}).get("retry_after")
+                if retry_after:
+                    print(f"[TELEGRAM] 429 для чата {chat_id}, пауза {retry_after} с")
+                self._sleep(retry_after or 2 ** attempt)
+        return result
+
+
+_sender = None
+_sender_lock = threading.Lock()
+
+
+def get_sender() -> TelegramSender:
+    """Общий на процесс отправитель: лимиты Telegram считаются на бота."""
+    global _sender
+    with _sender_lock:
+        if _sender is None:
+            _sender = TelegramSender()
+        return _sender
+
+
+def send_telegram_message(text, chat_id=None):
+    result = get_sender().send(chat_id or TELEGRAM_CHAT_ID, text)
+    if not result.get("ok"):
+        print(f"Telegram send error: {result}")
+    return result
@@ -16,10 +16,12 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 
+from backend import metrics
 from backend.database.database import (
     get_connection, init_db,
     get_groups_with_id, get_cached_pairs, save_pairs, save_schedule
 )
+from backend.database.events import SCHEDULE_CHANGED, publish
 
 # Пути для кеша и логов
 HERE      = os.path.dirname(__file__)
@@ -139,6 +141,7 @@ def worker(task):
     if not force_db and get_cached_pairs(conn, gid, week):
         conn.close()
         print(f"🐁 {name} {week} скип")
+        metrics.PARSER_PAGES.labels("skipped").inc()
         return (gid, name, week, "skipped", 0)
 
     # 2) JSON-кеш
@@ -149,10 +152,12 @@ def worker(task):
         # 3) парсим
         driver = driver_queue.get()
         try:
-            data = scrape_pairs(driver, name, week)
+            with metrics.timer(metrics.PARSER_SCRAPE_SECONDS.labels()):
+                data = scrape_pairs(driver, name, week)
         except Exception as e:
             msg = str(e)
             log_error(name, week, msg)
+            metrics.PARSER_PAGES.labels("error").inc()
             driver_queue.put(driver)
             conn.close()
             return (gid, name, week, "error", msg)
@@ -167,7 +172,10 @@ def worker(task):
     # 5) сохраняем в БД: кеш и расписание
     save_pairs(conn, gid, week, data)
     save_schedule(conn, gid, week, data)
+    # 6) сообщаем подписчикам (notifier, кеши API, пересчёт занятости)
+    publish(conn, SCHEDULE_CHANGED, {"group_id": gid, "week": week})
     conn.close()
+    metrics.PARSER_PAGES.labels("ok").inc()
     return (gid, name, week, "ok", len(data))
 
 
@@ -179,7 +187,11 @@ def main():
                    help="Перезаписать пары в БД и JSON-кеше")
     p.add_argument("--threads", type=int, default=5,
                    help="Число параллельных потоков (по умолчанию 5)")
+    p.add_argument("--metrics-port", type=int,
+                   help="Отдавать метрики Prometheus на этом порту (/metrics)")
     args = p.parse_args()
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
 
     weeks  = [int(w) for w in args.weeks.split(",")]
     groups = get_groups_with_id()
@@ -201,18 +213,23 @@ def main():
     random.shuffle(tasks)
 
     print(f"▶️ Запускаем парсер: {len(tasks)} задач × {args.threads} потоков…")
+    started = time.perf_counter()
+    scraped = 0
     with ThreadPoolExecutor(max_workers=args.threads) as exe:
         futures = {exe.submit(worker, t): t for t in tasks}
         for fut in as_completed(futures):
             gid, name, wk, status, info = fut.result()
             if status == "ok":
+                scraped += 1
                 print(f"[ OK ]   {name} wk={wk} → {info} пар")
             elif status == "skipped":
                 print(f"[SKIP]   {name} wk={wk} (есть в БД)")
             else:
                 print(f"[FAIL]   {name} wk={wk}: {info}")
 
-    print("✅ Все задачи завершены, закрываем браузеры…")
+    elapsed = time.perf_counter() - started
+    print(f"✅ Все задачи завершены: {scraped} страниц за {elapsed:.0f} с "
+          f"({scraped / elapsed if elapsed else 0:.2f} стр/с), закрываем браузеры…")
     # 3) чисто завершаем все драйверы
     while not driver_queue.empty():
         drv = driver_queue.get_nowait()
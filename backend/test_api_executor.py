@@ -0,0 +1,120 @@
+import os
+import sys
+
+# Корень репозитория в sys.path, чтобы импортировался пакет backend
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from backend.api import calendar_service
+from backend.api.api_executor import ApiExecutor, TokenBucket
+from backend.tests.fakes import FakeCalendarService, FakeHttpError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_waits_for_refill(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, capacity=5, clock=clock, sleep=clock.sleep)
+        for _ in range(5):
+            self.assertEqual(bucket.acquire(), 0.0)
+        self.assertAlmostEqual(bucket.acquire(), 0.1)
+        # пакет больше ёмкости ждёт полного ведра и уводит баланс в минус
+        self.assertAlmostEqual(bucket.acquire(50), 0.5)
+        self.assertAlmostEqual(bucket.acquire(), 4.6)
+        self.assertAlmostEqual(clock.now, 5.2)
+
+
+class ApiExecutorTest(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+        self.executor = ApiExecutor(rate=1e6, burst=10 ** 6, max_retries=3,
+                                    sleep=self.sleeps.append)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_retries_rate_limit_then_succeeds(self):
+        errors = [FakeHttpError(429), FakeHttpError(503)]
+
+        def call():
+            if errors:
+                raise errors.pop(0)
+            return "ok"
+
+        self.assertEqual(self.executor.call(call), "ok")
+        stats = self.executor.stats()
+        self.assertEqual((stats["requests"], stats["retries"], stats["failures"]), (3, 2, 0))
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertLessEqual(self.sleeps[1], 2 * self.executor.base_delay)
+
+    def test_other_errors_are_not_retried(self):
+        def call():
+            raise FakeHttpError(400)
+
+        with self.assertRaises(FakeHttpError):
+            self.executor.call(call)
+        self.assertEqual(self.executor.stats()["requests"], 1)
+        self.assertEqual(self.executor.stats()["failures"], 1)
+
+    def test_batch_retries_only_rejected_items(self):
+        service = FakeCalendarService()
+        service.inject_errors(429)
+        requests = [
+            (str(i), service.events().insert(calendarId="c", body={"id": f"e{i}"}))
+            for i in range(3)
+        ]
+        results = self.executor.run_batch(service, requests)
+        self.assertTrue(all(exc is None for _, exc in results.values()))
+        self.assertEqual(sorted(service.events_store["c"]), ["e0", "e1", "e2"])
+        self.assertEqual(service.batches, 2)
+        self.assertEqual(self.executor.stats()["operations"], 4)
+
+    def test_map_runs_in_parallel_threads(self):
+        names = set(self.executor.map(lambda _: threading.current_thread().name, range(50)))
+        self.assertTrue(all(n.startswith("google-api") for n in names))
+
+
+class CalendarServiceTest(unittest.TestCase):
+    def test_credentials_once_service_per_thread(self):
+        with tempfile.NamedTemporaryFile() as key, \
+                mock.patch.object(calendar_service, "SERVICE_ACCOUNT_FILE", key.name), \
+                mock.patch("google.oauth2.service_account.Credentials."
+                           "from_service_account_file") as load, \
+                mock.patch("googleapiclient.discovery.build",
+                           side_effect=lambda *a, **kw: object()) as build:
+            calendar_service.reset_calendar_service()
+            first = calendar_service.get_calendar_service()
+            self.assertIs(calendar_service.get_calendar_service(), first)
+
+            other = []
+            t = threading.Thread(target=lambda: other.append(calendar_service.get_calendar_service()))
+            t.start()
+            t.join()
+            self.assertIsNot(other[0], first)
+            self.assertEqual((load.call_count, build.call_count), (1, 2))
+            self.assertTrue(build.call_args.kwargs["static_discovery"])
+
+            calendar_service.reset_calendar_service()
+            self.assertIsNot(calendar_service.get_calendar_service(), first)
+            self.assertEqual(load.call_count, 2)
+        calendar_service.reset_calendar_service()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,101 @@
+import os
+import sys
+
+# Корень репозитория в sys.path, чтобы импортировался пакет backend
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from backend.database.database import init_db
+from backend.database.events import SCHEDULE_CHANGED, Subscriber, events_dir, publish
+
+
+class EventBusTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "events.db")
+        self.conn = sqlite3.connect(self.db_path)
+        init_db(self.conn)
+        self.subscribers = []
+
+    def tearDown(self):
+        for subscriber in self.subscribers:
+            subscriber.close()
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def subscribe(self, name, durable=True):
+        subscriber = Subscriber(name, [SCHEDULE_CHANGED], self.db_path, durable=durable)
+        self.subscribers.append(subscriber)
+        return subscriber
+
+    def test_publish_wakes_subscriber(self):
+        subscriber = self.subscribe("notifier")
+        self.assertFalse(subscriber.wait(0))
+        publish(self.conn, SCHEDULE_CHANGED, {"group_id": 1, "week": 14})
+        publish(self.conn, "other.topic", {})
+        self.assertTrue(subscriber.wait(5))
+        events = subscriber.poll()
+        self.assertEqual([e["payload"] for e in events], [{"group_id": 1, "week": 14}])
+        subscriber.ack(events[-1]["id"])
+        self.assertEqual(subscriber.poll(), [])
+
+    def test_durable_offset_survives_restart(self):
+        subscriber = self.subscribe("filter_db")
+        publish(self.conn, SCHEDULE_CHANGED, {"group_id": 1, "week": 14})
+        subscriber.ack(subscriber.poll()[-1]["id"])
+        subscriber.close()
+        self.subscribers.remove(subscriber)
+
+        # события, опубликованные, пока подписчик остановлен, не теряются
+        publish(self.conn, SCHEDULE_CHANGED, {"group_id": 2, "week": 15})
+        restarted = self.subscribe("filter_db")
+        self.assertEqual([e["payload"]["group_id"] for e in restarted.poll()], [2])
+        # недолговечный подписчик начинает с конца
+        self.assertEqual(self.subscribe("api-cache", durable=False).poll(), [])
+
+    def test_listen_handles_batches_until_stopped(self):
+        subscriber = self.subscribe("api-cache", durable=False)
+        seen, stop = [], threading.Event()
+
+        def handle(events):
+            seen.extend(e["payload"]["week"] for e in events)
+            if len(seen) >= 2:
+                stop.set()
+
+        thread = threading.Thread(target=subscriber.listen, args=(handle,),
+                                  kwargs={"timeout": 0.1, "stop": stop})
+        thread.start()
+        publish(self.conn, SCHEDULE_CHANGED, {"group_id": 1, "week": 14})
+        publish(self.conn, SCHEDULE_CHANGED, {"group_id": 1, "week": 15})
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(seen, [14, 15])
+
+    def test_subscriber_does_not_create_schema(self):
+        # DDL только в migrate(): подписчик (кеши воркера API) над неразмеченной БД
+        # падает, а не создаёт таблицы на первом запросе
+        path = os.path.join(self.tmp.name, "empty.db")
+        with self.assertRaises(sqlite3.OperationalError):
+            Subscriber("api-cache", [SCHEDULE_CHANGED], path, durable=False)
+        conn = sqlite3.connect(path)
+        self.assertEqual(conn.execute("SELECT count(*) FROM sqlite_master").fetchone()[0], 0)
+        conn.close()
+
+    def test_sockets_of_closed_subscribers_are_removed(self):
+        subscriber = self.subscribe("notifier")
+        path = subscriber.path
+        subscriber.sock.close()  # процесс упал, не удалив сокет
+        subscriber.sock = None
+        publish(self.conn, SCHEDULE_CHANGED, {"group_id": 1, "week": 14})
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(os.listdir(events_dir(self.db_path)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
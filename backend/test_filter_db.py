@@ -0,0 +1,249 @@
+import os
+import sys
+
+# Корень репозитория в sys.path, чтобы импортировался пакет backend
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import sqlite3
+import unittest
+from datetime import date
+from unittest import mock
+
+from backend.database.database import get_meta, init_db, save_schedule
+from backend.api.ics import load_lessons
+from backend.database import filter_db
+from backend.database.room_index import build_room_index
+from backend.database.filter_db import setup_db, get_changed_pairs, refresh_occupancy
+
+
+def add_lesson(conn, group_id, week, date, time, room):
+    save_schedule(conn, group_id, week, [
+        {"date": date, "time": time, "subject": "S", "teachers": [], "rooms": [room]}
+    ])
+
+
+class IncrementalOccupancyTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        init_db(self.conn)
+        self.conn.execute("INSERT INTO groups (id, name) VALUES (1, 'G1'), (2, 'G2')")
+        setup_db(self.conn)
+        add_lesson(self.conn, 1, 14, 'Вт, 13 мая', '09:00 – 10:30', 'ГУК Б-416')
+        add_lesson(self.conn, 2, 15, 'Вт, 20 мая', '10:45 – 12:15', 'ГУК Б-417')
+        refresh_occupancy(self.conn, None, get_changed_pairs(self.conn)[1])
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_only_changed_weeks_and_sync_ids_kept(self):
+        self.conn.execute("UPDATE occupied_rooms SET google_event_id = 'evt'")
+        self.conn.commit()
+        self.assertEqual(get_changed_pairs(self.conn)[0], set())
+
+        add_lesson(self.conn, 2, 15, 'Ср, 21 мая', '13:00 – 14:30', 'ГУК Б-416')
+        changed, marks = get_changed_pairs(self.conn)
+        self.assertEqual(changed, {(2, 15)})
+        refresh_occupancy(self.conn, changed, marks)
+
+        rows = self.conn.execute(
+            "SELECT week, room, google_event_id FROM occupied_rooms ORDER BY week, day"
+        ).fetchall()
+        self.assertEqual(rows, [
+            (14, 'ГУК Б-416', 'evt'),
+            (15, 'ГУК Б-417', 'evt'),
+            (15, 'ГУК Б-416', None),
+        ])
+        self.assertEqual(
+            self.conn.execute("SELECT mask FROM room_slots WHERE day = 'Ср, 21 мая'").fetchone(),
+            (0b100,)
+        )
+        self.assertEqual(get_changed_pairs(self.conn)[0], set())
+
+    def test_removed_lessons_are_dropped(self):
+        self.conn.execute("DELETE FROM schedule WHERE week = 15")
+        self.conn.commit()
+        refresh_occupancy(self.conn, {(2, 15)})
+        self.assertEqual(
+            self.conn.execute("SELECT week FROM occupied_rooms").fetchall(), [(14,)]
+        )
+        self.assertEqual(
+            self.conn.execute("SELECT week FROM room_slots").fetchall(), [(14,)]
+        )
+
+    def test_deleted_lessons_found_without_reparse(self):
+        self.conn.execute("UPDATE occupied_rooms SET google_event_id = 'evt'")
+        self.conn.execute("DELETE FROM schedule WHERE week = 15")
+        self.conn.commit()
+        changed, marks = get_changed_pairs(self.conn)
+        self.assertEqual(changed, {(2, 15)})
+        refresh_occupancy(self.conn, changed, marks)
+        self.assertEqual(self.conn.execute("SELECT week FROM occupied_rooms").fetchall(), [(14,)])
+        self.assertEqual(get_changed_pairs(self.conn)[0], set())
+
+    def test_moved_lesson_marks_both_weeks(self):
+        self.conn.execute("UPDATE schedule SET week = 16 WHERE week = 15")
+        self.conn.commit()
+        self.assertEqual(get_changed_pairs(self.conn)[0], {(2, 15), (2, 16)})
+
+    def test_shared_slot_row_does_not_depend_on_scan_order(self):
+        self.conn.execute("INSERT INTO groups (id, name) VALUES (0, 'A0')")
+        save_schedule(self.conn, 0, 14, [{
+            "date": 'Вт, 13 мая', "time": '09:00 – 10:30', "subject": "Other",
+            "teachers": ["T"], "rooms": ['ГУК Б-416'],
+        }])
+        refresh_occupancy(self.conn, {(0, 14)})
+        self.assertEqual(
+            self.conn.execute(
+                "SELECT group_name, subject, teacher FROM occupied_rooms WHERE week = 14"
+            ).fetchall(),
+            [('A0', 'Other', 'T')]
+        )
+
+    def test_shared_room_slot_keeps_all_groups(self):
+        self.conn.execute("INSERT INTO groups (id, name) VALUES (3, 'G3')")
+        add_lesson(self.conn, 3, 14, 'Вт, 13 мая', '09:00 – 10:30', 'ГУК Б-416')
+        refresh_occupancy(self.conn, {(3, 14)})
+        self.assertEqual(
+            self.conn.execute(
+                "SELECT group_name, groups FROM occupied_rooms WHERE week = 14"
+            ).fetchall(),
+            [('G1', 'G1, G3')]
+        )
+
+    def test_iso_date_from_schedule_and_backfilled(self):
+        self.assertEqual(
+            self.conn.execute("SELECT week, date FROM occupied_rooms ORDER BY week").fetchall(),
+            [(14, '2025-05-13'), (15, '2025-05-20')]
+        )
+        # строки из старой БД без даты получают её при setup_db
+        self.conn.execute("UPDATE occupied_rooms SET date = NULL")
+        setup_db(self.conn)
+        self.assertEqual(
+            self.conn.execute("SELECT count(*) FROM occupied_rooms WHERE date IS NULL").fetchone(),
+            (0,)
+        )
+
+    def test_raw_insert_is_resolved_by_readers(self):
+        # строка в обход save_schedule: date_iso/start_min/end_min остаются NULL
+        self.conn.execute("""
+            INSERT INTO schedule (group_id, week, date, time, subject, teachers, rooms)
+            VALUES (1, 14, 'Ср, 14 мая', '13:00 – 14:30', 'Raw', '["T"]', '["ГУК Б-416"]')
+        """)
+        self.conn.commit()
+        refresh_occupancy(self.conn, {(1, 14)})
+        self.assertEqual(
+            self.conn.execute("SELECT date, start_time, subject FROM occupied_rooms "
+                              "WHERE day = 'Ср, 14 мая'").fetchall(),
+            [('2025-05-14', '13:00', 'Raw')]
+        )
+        self.assertEqual(
+            self.conn.execute("SELECT mask FROM room_slots WHERE day = 'Ср, 14 мая'").fetchone(),
+            (0b100,)
+        )
+        index = build_room_index(self.conn)
+        self.assertEqual(index["rooms"]["ГУК Б-416"][date(2025, 5, 14)], [(780, 870)])
+        self.assertEqual(
+            [(l["date"], l["start"], l["subject"]) for l in load_lessons(self.conn, "group", "G1")],
+            [(date(2025, 5, 13), 540, 'S'), (date(2025, 5, 14), 780, 'Raw')]
+        )
+
+    def test_update_of_time_resets_resolved_columns(self):
+        self.conn.execute("UPDATE schedule SET time = '14:45 – 16:15' WHERE week = 14")
+        self.conn.commit()
+        self.assertEqual(
+            self.conn.execute("SELECT date_iso, start_min FROM schedule WHERE week = 14").fetchone(),
+            (None, None)
+        )
+        refresh_occupancy(self.conn, {(1, 14)})
+        self.assertEqual(
+            self.conn.execute("SELECT date, start_time FROM occupied_rooms WHERE week = 14").fetchall(),
+            [('2025-05-13', '14:45')]
+        )
+        # пересчитанные писателем колонки триггер не трогает
+        self.conn.execute("UPDATE schedule SET time = '09:00 – 10:30', date_iso = '2025-05-13', "
+                          "start_min = 540, end_min = 630 WHERE week = 14")
+        self.assertEqual(
+            self.conn.execute("SELECT start_min FROM schedule WHERE week = 14").fetchone(), (540,)
+        )
+
+    def test_schedule_columns_resolved_at_ingest(self):
+        rows = self.conn.execute(
+            "SELECT week, date_iso, start_min, end_min FROM schedule ORDER BY id"
+        ).fetchall()
+        self.assertEqual(rows, [(14, '2025-05-13', 540, 630), (15, '2025-05-20', 645, 735)])
+        # старые строки без колонок заполняются при init_db
+        self.conn.execute("UPDATE schedule SET date_iso = NULL, start_min = NULL")
+        init_db(self.conn)
+        self.assertEqual(
+            self.conn.execute("SELECT week, date_iso, start_min, end_min FROM schedule ORDER BY id")
+            .fetchall(), rows
+        )
+
+
+class StreamingRefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        init_db(self.conn)
+        self.conn.execute("INSERT INTO groups (id, name) VALUES (1, 'G1'), (2, 'G2'), (3, 'G3')")
+        setup_db(self.conn)
+        for gid in (3, 1, 2):
+            for week, date in ((14, 'Вт, 13 мая'), (15, 'Вт, 20 мая')):
+                add_lesson(self.conn, gid, week, date, '09:00 – 10:30', 'ГУК Б-416')
+                add_lesson(self.conn, gid, week, date, f'1{gid}:00 – 1{gid}:30', 'ГУК Б-417')
+        # повтор той же пары той же группы (например, две подгруппы)
+        add_lesson(self.conn, 1, 14, 'Вт, 13 мая', '09:00 – 10:30', 'ГУК Б-416')
+
+    def tearDown(self):
+        self.conn.close()
+
+    def dump(self):
+        return (
+            self.conn.execute("SELECT week, day, start_time, room, group_name, groups "
+                              "FROM occupied_rooms ORDER BY 1, 2, 3, 4").fetchall(),
+            self.conn.execute("SELECT * FROM room_slots ORDER BY 1, 2, 3").fetchall(),
+        )
+
+    def test_small_chunks_match_one_pass(self):
+        refresh_occupancy(self.conn, None, chunk_size=1, batch_size=1)
+        small = self.dump()
+        self.conn.execute("DELETE FROM occupied_rooms")
+        self.conn.execute("DELETE FROM room_slots")
+        refresh_occupancy(self.conn, None)
+        self.assertEqual(self.dump(), small)
+        occupied, slots = small
+        self.assertEqual(len(occupied), 2 * 4)
+        self.assertEqual(occupied[0], (14, 'Вт, 13 мая', '09:00', 'ГУК Б-416', 'G1', 'G1, G2, G3'))
+        self.assertEqual(len(slots), 4)
+
+    def test_same_data_in_other_scan_order_is_not_a_change(self):
+        refresh_occupancy(self.conn, None)
+        version = get_meta(self.conn, "occupancy.version")
+        before = self.dump()
+        # та же пара G1 заново — теперь она читается из schedule последней
+        self.conn.execute("DELETE FROM schedule WHERE group_id = 1 AND week = 14")
+        add_lesson(self.conn, 1, 14, 'Вт, 13 мая', '09:00 – 10:30', 'ГУК Б-416')
+        add_lesson(self.conn, 1, 14, 'Вт, 13 мая', '11:00 – 11:30', 'ГУК Б-417')
+        refresh_occupancy(self.conn, {(1, 14)})
+        self.assertEqual(self.dump(), before)
+        self.assertEqual(get_meta(self.conn, "occupancy.version"), version)
+
+    def test_failure_rolls_back_and_keeps_error(self):
+        refresh_occupancy(self.conn, None)
+        before = self.dump()
+        self.conn.execute("DELETE FROM schedule WHERE week = 15")
+        self.conn.commit()
+        with mock.patch.object(filter_db, "get_room_slots", side_effect=RuntimeError("boom")):
+            with self.assertRaisesRegex(RuntimeError, "boom"):
+                refresh_occupancy(self.conn, {(1, 15)})
+        self.assertEqual(self.dump(), before)
+        for table in ("occupied_new", "occupied_merged", "room_slots_new"):
+            self.assertEqual(self.conn.execute(f"SELECT count(*) FROM temp.{table}").fetchone(), (0,))
+
+        refresh_occupancy(self.conn, {(1, 15)})
+        self.assertEqual({row[0] for row in self.dump()[0]}, {14})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
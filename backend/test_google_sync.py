@@ -0,0 +1,274 @@
+import os
+import sys
+
+# Корень репозитория в sys.path, чтобы импортировался пакет backend
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import datetime
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from backend.api import delete_events, google_sync
+from backend.api.api_executor import ApiExecutor
+from backend.api.migrations import migrate
+from backend.benchmarks.synthetic import generate_occupied
+from backend.tests.fakes import FakeCalendarService
+
+
+class BatchedSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "sync.db")
+        generate_occupied(self.db_path, 120)
+        migrate(self.db_path)  # calendar_sync и колонки occupied_rooms — только миграцией
+        self.executor = ApiExecutor(rate=1e6, burst=10 ** 6, sleep=lambda s: None)
+        self.patches = [
+            mock.patch.object(google_sync, "DB_PATH", self.db_path),
+            mock.patch.object(google_sync, "get_executor", lambda: self.executor),
+            mock.patch.object(delete_events, "get_executor", lambda: self.executor),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.executor.shutdown()
+        self.tmp.cleanup()
+
+    def stored_ids(self):
+        conn = sqlite3.connect(self.db_path)
+        ids = [r[0] for r in conn.execute("SELECT google_event_id FROM occupied_rooms")]
+        conn.close()
+        return ids
+
+    def test_group_sync_uses_batches_and_saves_ids(self):
+        service = FakeCalendarService()
+        google_sync.sync_group_to_calendar("G1", service=service)
+
+        events = service.events_store[google_sync.CALENDAR_ID]
+        self.assertEqual(len(events), 120)
+        self.assertEqual((service.calls, service.batches), (3, 3))
+        self.assertEqual(sorted(self.stored_ids()), sorted(events))
+
+        # повторная синхронизация без изменений в API не ходит
+        google_sync.sync_group_to_calendar("G1", service=service)
+        self.assertEqual(len(service.events_store[google_sync.CALENDAR_ID]), 120)
+        self.assertEqual(service.calls, 3)
+
+    def test_lost_ids_do_not_duplicate_events(self):
+        service = FakeCalendarService()
+        google_sync.sync_group_to_calendar("G1", service=service)
+        first = sorted(service.events_store[google_sync.CALENDAR_ID])
+
+        # пересборка occupied_rooms теряет google_event_id, а новая БД — и calendar_sync
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute("UPDATE occupied_rooms SET google_event_id = NULL")
+            conn.execute("DELETE FROM calendar_sync")
+        conn.close()
+
+        google_sync.sync_group_to_calendar("G1", service=service)
+        self.assertEqual(sorted(service.events_store[google_sync.CALENDAR_ID]), first)
+        # insert-пакеты получили 409 и были повторены как update
+        self.assertEqual(service.calls, 3 + 3 + 3)
+        self.assertEqual(sorted(self.stored_ids()), first)
+
+    def test_only_changes_are_pushed(self):
+        service = FakeCalendarService()
+        google_sync.sync_group_to_calendar("G1", service=service)
+        store = service.events_store[google_sync.CALENDAR_ID]
+
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute("UPDATE occupied_rooms SET teacher = 'T2' WHERE subject = 'S0'")
+            conn.execute("DELETE FROM occupied_rooms WHERE subject = 'S1'")
+        conn.close()
+
+        counts = {"done": 0, "failed": 0, "total": 0}
+
+        def progress(done=0, failed=0, total=None):
+            counts["done"] += done
+            counts["failed"] += failed
+            counts["total"] += total or 0
+
+        with mock.patch("builtins.print") as printed:
+            google_sync.sync_group_to_calendar("G1", service=service, progress=progress)
+        self.assertEqual(service.calls, 3 + 1)
+        self.assertEqual(counts, {"done": 120, "failed": 0, "total": 120})
+        self.assertEqual(len(store), 119)
+        self.assertTrue(any("Преподаватель: T2" in e["description"] for e in store.values()))
+        printed.assert_any_call(
+            "[GOOGLE_SYNC] Итог: пропущено 118, создано 0, обновлено 1, удалено 1, ошибок 0"
+        )
+
+    def test_deleted_event_is_recreated_with_same_id(self):
+        service = FakeCalendarService()
+        google_sync.sync_group_to_calendar("G1", service=service)
+        gone = next(iter(service.events_store[google_sync.CALENDAR_ID]))
+        del service.events_store[google_sync.CALENDAR_ID][gone]
+
+        counts = {"done": 0, "failed": 0}
+
+        def progress(done=0, failed=0, total=None):
+            counts["done"] += done
+            counts["failed"] += failed
+
+        # пора сверяться с календарём: хеш совпадает, но события там больше нет
+        with mock.patch.object(google_sync, "RECONCILE_INTERVAL", datetime.timedelta(0)):
+            google_sync.sync_group_to_calendar("G1", service=service, progress=progress)
+        self.assertEqual(counts, {"done": 120, "failed": 0})
+        self.assertIn(gone, service.events_store[google_sync.CALENDAR_ID])
+        # список + update (404) + повторный insert того же id
+        self.assertEqual(service.calls, 3 + 1 + 2)
+
+    def test_reconcile_costs_only_list_calls(self):
+        service = FakeCalendarService(page_size=50)
+        google_sync.sync_group_to_calendar("G1", service=service)
+        # до срока сверки повтор без изменений в API не ходит
+        google_sync.sync_group_to_calendar("G1", service=service)
+        self.assertEqual(service.calls, 3)
+        with mock.patch.object(google_sync, "RECONCILE_INTERVAL", datetime.timedelta(0)):
+            google_sync.sync_group_to_calendar("G1", service=service)
+        self.assertEqual(service.calls, 3 + 3)  # три страницы списка, ни одной записи
+        self.assertEqual(len(service.events_store[google_sync.CALENDAR_ID]), 120)
+
+    def test_watermark_skips_unchanged_occupancy(self):
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute("INSERT INTO meta (key, value) VALUES ('occupancy.version', '7')")
+        conn.close()
+
+        service = FakeCalendarService()
+        google_sync.sync_group_to_calendar("G1", service=service)
+        google_sync.sync_group_to_calendar("G1", service=service)
+        self.assertEqual(service.calls, 3)
+
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute("UPDATE meta SET value = '8' WHERE key = 'occupancy.version'")
+            conn.execute("DELETE FROM occupied_rooms WHERE subject = 'S5'")
+        conn.close()
+        google_sync.sync_group_to_calendar("G1", service=service)
+        self.assertEqual(service.calls, 4)
+        self.assertEqual(len(service.events_store[google_sync.CALENDAR_ID]), 119)
+
+    def test_shared_lesson_collapses_into_one_event(self):
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute("DELETE FROM occupied_rooms")
+            conn.execute(
+                "INSERT INTO occupied_rooms (week, day, start_time, end_time, room, "
+                "subject, teacher, group_name, groups, date) "
+                "VALUES (16, '26 мая 2025', '09:00', '10:30', 'ГУК Б-416', 'Лекция', 'T', 'G1', 'G1, G2', "
+                "'2025-05-26')"
+            )
+        conn.close()
+
+        service = FakeCalendarService()
+        google_sync.sync_group_to_calendar("G1", service=service)
+        google_sync.sync_group_to_calendar("G2", service=service)
+
+        events = list(service.events_store[google_sync.CALENDAR_ID].values())
+        self.assertEqual(len(events), 1)
+        self.assertIn("Группы: G1, G2", events[0]["description"])
+        self.assertEqual(events[0]["id"], google_sync.lesson_event_id(
+            16, "2025-05-26", "09:00", "10:30", "ГУК Б-416", "Лекция"))
+
+    def test_event_id_is_valid_base32hex(self):
+        event_id = google_sync.lesson_event_id(16, "2025-05-26", "09:00", "10:30", "ГУК Б-416", "S")
+        self.assertRegex(event_id, r"^[0-9a-v]{32}$")
+        self.assertEqual(event_id, google_sync.lesson_event_id(
+            16, "2025-05-26", "09:00", "10:30", "ГУК Б-416", "S"))
+
+    def test_rate_limited_items_are_retried(self):
+        service = FakeCalendarService()
+        service.inject_errors(429, 503)
+        google_sync.sync_group_to_calendar("G1", service=service)
+        self.assertEqual(len(service.events_store[google_sync.CALENDAR_ID]), 120)
+        self.assertEqual(len(self.stored_ids()), 120)
+        self.assertEqual(self.executor.stats()["retries"], 2)
+        # 3 пакета + 1 повтор двух отклонённых операций
+        self.assertEqual(service.calls, 4)
+
+    def test_synced_events_deleted_in_batches(self):
+        service = FakeCalendarService()
+        google_sync.sync_group_to_calendar("G1", service=service)
+        store = service.events_store[google_sync.CALENDAR_ID]
+        # чужое событие в том же календаре не трогаем
+        store["foreign"] = {"id": "foreign"}
+
+        self.assertEqual(delete_events.delete_synced_events(
+            "G2", service=service, db_path=self.db_path)["deleted"], 0)
+        result = delete_events.delete_synced_events("G1", weeks=[16], service=service, db_path=self.db_path)
+        self.assertEqual(result, {"deleted": 120, "failed": 0})
+        self.assertEqual(list(store), ["foreign"])
+        self.assertEqual(service.calls, 3 + 3)
+        self.assertEqual(set(self.stored_ids()), {None})
+
+        conn = sqlite3.connect(self.db_path)
+        self.assertEqual(conn.execute("SELECT count(*) FROM calendar_sync").fetchone(), (0,))
+        conn.close()
+
+        # следующая синхронизация создаёт события заново
+        google_sync.sync_group_to_calendar("G1", service=service)
+        self.assertEqual(len(store), 121)
+
+    def test_range_delete_survives_network_errors(self):
+        service = FakeCalendarService()
+        store = service._calendar(google_sync.CALENDAR_ID)
+        store.update({eid: {"id": eid} for eid in ("a", "b", "c")})
+        delete = service._delete
+
+        def flaky_delete(calendar_id, event_id):
+            if event_id == "b":
+                raise TimeoutError("timed out")
+            return delete(calendar_id, event_id)
+
+        with mock.patch.object(service, "_delete", flaky_delete), \
+                mock.patch.object(delete_events, "get_calendar_service", lambda: service):
+            delete_events.delete_events_in_range("26.05.2025", "26.05.2025")
+        # таймаут одного события не прерывает удаление остальных
+        self.assertEqual(list(store), ["b"])
+
+
+class OccupiedDatesMigrationTest(unittest.TestCase):
+    def test_null_dates_resolved_by_week(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "old.db")
+            conn = sqlite3.connect(db_path)
+            # occupied_rooms из старой БД: без колонки date
+            conn.execute("""
+                CREATE TABLE occupied_rooms (
+                    week INTEGER, day TEXT, start_time TEXT, end_time TEXT, room TEXT,
+                    subject TEXT, teacher TEXT, group_name TEXT,
+                    PRIMARY KEY (week, day, start_time, end_time, room)
+                )
+            """)
+            # 10 февраля — первая неделя семестра, а не «следующий год», как угадывал parse_date_str
+            conn.executemany(
+                "INSERT INTO occupied_rooms VALUES (?, ?, '09:00', '10:30', 'ГУК Б-416', 'S', 'T', 'G1')",
+                [(1, "Пн, 10 февраля"), (18, "Пн, 9 июня")]
+            )
+            conn.commit()
+            conn.close()
+            with mock.patch("backend.database.dates.SEMESTER_START", datetime.date(2025, 2, 10)):
+                migrate(db_path)
+            conn = sqlite3.connect(db_path)
+            dates = conn.execute("SELECT week, date FROM occupied_rooms ORDER BY week").fetchall()
+            conn.close()
+        self.assertEqual(dates, [(1, "2025-02-10"), (18, "2025-06-09")])
+
+    def test_rows_without_date_are_not_guessed(self):
+        row = (1, 16, "Пн, 26 мая", "09:00", "10:30", "ГУК Б-416", "S", "T", "G1", None, None, None)
+        (data,) = google_sync._group_events([row]).values()
+        self.assertIsNone(data["date"])
+        self.assertIsNone(google_sync._event_body(("16", "Пн, 26 мая", "09:00 - 10:30", "", ""), data))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,112 @@
+import os
+import sys
+
+# Корень репозитория в sys.path, чтобы импортировался пакет backend
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from backend.api import google_sync
+from backend.api.api_executor import ApiExecutor
+from backend.api.jobs import JobQueue, WorkerPool
+from backend.api.migrations import migrate
+from backend.tests.fakes import FakeCalendarService
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "jobs.db")
+        migrate(self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        conn.executemany(
+            "INSERT INTO occupied_rooms "
+            "(week, day, start_time, end_time, room, subject, teacher, group_name, date) "
+            "VALUES (16, ?, ?, ?, ?, 'S', 'T', 'G1', ?)",
+            [('Пн, 26 мая 2025', '09:00', '10:30', 'ГУК Б-416', '2025-05-26'),
+             ('Пн, 26 мая 2025', '10:45', '12:15', 'ГУК Б-416', '2025-05-26'),
+             ('Вт, 27 мая 2025', '09:00', '10:30', 'ГУК Б-417', '2025-05-27')]
+        )
+        conn.commit()
+        conn.close()
+
+        self.service = FakeCalendarService()
+        self.executor = ApiExecutor(rate=1e6, burst=10 ** 6, sleep=lambda s: None)
+        # google_sync.DB_PATH не подменяем: обработчики должны брать БД очереди
+        self.patches = [
+            mock.patch.object(google_sync, "get_calendar_service", lambda: self.service),
+            mock.patch.object(google_sync, "get_executor", lambda: self.executor),
+        ]
+        for p in self.patches:
+            p.start()
+        self.queue = JobQueue(self.db_path)
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.executor.shutdown()
+        self.tmp.cleanup()
+
+    def test_queue_does_not_create_schema(self):
+        # DDL только в migrate(): очередь над неразмеченной БД таблицу не создаёт
+        path = os.path.join(self.tmp.name, "empty.db")
+        queue = JobQueue(path)
+        with self.assertRaises(sqlite3.OperationalError):
+            queue.get(1)
+
+    def test_duplicate_group_jobs_coalesce(self):
+        first, coalesced = self.queue.enqueue("sync_group", {"group": "G1"}, "sync_group:G1")
+        self.assertFalse(coalesced)
+        again, coalesced = self.queue.enqueue("sync_group", {"group": "G1"}, "sync_group:G1")
+        self.assertEqual((again, coalesced), (first, True))
+        other, _ = self.queue.enqueue("sync_group", {"group": "G2"}, "sync_group:G2")
+        self.assertNotEqual(other, first)
+
+    def test_worker_runs_sync_and_reports_progress(self):
+        job_id, _ = self.queue.enqueue("sync_group", {"group": "G1"}, "sync_group:G1")
+        pool = WorkerPool(self.queue, workers=1)
+        self.assertTrue(pool.run_one())
+        self.assertFalse(pool.run_one())
+
+        job = self.queue.get(job_id)
+        self.assertEqual(job["status"], "done")
+        self.assertEqual((job["total"], job["done"], job["failed"]), (3, 3, 0))
+        self.assertEqual(len(self.service.events_store[google_sync.CALENDAR_ID]), 3)
+
+        # запущенная задача больше не склеивается с новыми
+        new_id, coalesced = self.queue.enqueue("sync_group", {"group": "G1"}, "sync_group:G1")
+        self.assertNotEqual(new_id, job_id)
+        self.assertFalse(coalesced)
+
+    def test_failed_job_is_marked(self):
+        job_id, _ = self.queue.enqueue("unknown", {}, None)
+        WorkerPool(self.queue, workers=1).run_one()
+        job = self.queue.get(job_id)
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("KeyError", job["error"])
+
+    def test_pool_threads_drain_queue(self):
+        job_id, _ = self.queue.enqueue(
+            "sync_range", {"start_date": "2025-05-26", "end_date": "2025-05-26"}, None
+        )
+        pool = WorkerPool(self.queue, workers=2, poll_interval=0.05).start()
+        try:
+            for _ in range(100):
+                if self.queue.get(job_id)["status"] == "done":
+                    break
+                time.sleep(0.05)
+        finally:
+            pool.stop(timeout=2)
+        job = self.queue.get(job_id)
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["done"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,88 @@
+import os
+import sys
+
+# Корень репозитория в sys.path, чтобы импортировался пакет backend
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import json
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from backend import metrics
+
+
+class MetricsTest(unittest.TestCase):
+    def test_histogram_exposition(self):
+        histogram = metrics.Histogram("test_seconds", "Тест", ("route",), buckets=(0.1, 1.0))
+        child = histogram.labels('/a"b')
+        for value in (0.05, 0.5, 5.0):
+            child.observe(value)
+        self.assertEqual(histogram.collect(), [
+            "# HELP test_seconds Тест",
+            "# TYPE test_seconds histogram",
+            'test_seconds_bucket{route="/a\\"b",le="0.1"} 1',
+            'test_seconds_bucket{route="/a\\"b",le="1.0"} 2',
+            'test_seconds_bucket{route="/a\\"b",le="+Inf"} 3',
+            'test_seconds_sum{route="/a\\"b"} 5.55',
+            'test_seconds_count{route="/a\\"b"} 3',
+        ])
+        with self.assertRaises(ValueError):
+            histogram.labels()
+
+    def test_statement_labels(self):
+        self.assertEqual(metrics.statement_label(
+            "SELECT s.id FROM schedule s JOIN groups g ON s.group_id = g.id"), "SELECT schedule")
+        self.assertEqual(metrics.statement_label(
+            "INSERT OR IGNORE INTO outbox (chat_id) VALUES (?)"), "INSERT outbox")
+        self.assertEqual(metrics.statement_label(
+            "UPDATE outbox SET status = 'sent' WHERE id IN (SELECT id FROM outbox)"), "UPDATE outbox")
+        self.assertEqual(metrics.statement_label(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT)"), "CREATE meta")
+        self.assertEqual(metrics.statement_label("BEGIN IMMEDIATE"), "BEGIN")
+
+    def test_timed_connection(self):
+        conn = sqlite3.connect(":memory:", factory=metrics.TimedConnection)
+        conn.execute("CREATE TABLE timed_t (x INTEGER)")
+        conn.executemany("INSERT INTO timed_t VALUES (?)", [(1,), (2,)])
+        self.assertEqual(conn.execute("SELECT count(*) FROM timed_t").fetchone()[0], 2)
+        conn.close()
+        text = metrics.render()
+        for statement in ("CREATE timed_t", "INSERT timed_t", "SELECT timed_t"):
+            self.assertIn(f'sqlite_query_duration_seconds_count{{statement="{statement}"}} 1', text)
+
+    def test_multiprocess_render(self):
+        counter = metrics.Counter("test_mp_total", "Тест", ("result",))
+        histogram = metrics.Histogram("test_mp_seconds", "Тест", buckets=(0.1, 1.0))
+        counter.labels("hit").inc(2)
+        histogram.labels().observe(0.05)
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(metrics, "MULTIPROC_DIR", tmp):
+            metrics.flush()
+            with open(os.path.join(tmp, f"{os.getpid()}.json"), encoding="utf-8") as f:
+                own = json.load(f)
+            self.assertEqual(own["test_mp_total"]["samples"], [[["hit"], 2]])
+            # снимок другого воркера: тот же счётчик, новая метка и ещё одно наблюдение
+            other = {
+                "test_mp_total": dict(own["test_mp_total"], samples=[[["hit"], 3], [["miss"], 1]]),
+                "test_mp_seconds": dict(own["test_mp_seconds"], samples=[[[], [[0, 1, 0], 0.5, 1]]]),
+            }
+            with open(os.path.join(tmp, "1.json"), "w", encoding="utf-8") as f:
+                json.dump(other, f)
+            with open(os.path.join(tmp, "2.json"), "w", encoding="utf-8") as f:
+                f.write("{")  # недописанный снимок пропускается
+            text = metrics.render()
+        self.assertIn('test_mp_total{result="hit"} 5', text)
+        self.assertIn('test_mp_total{result="miss"} 1', text)
+        self.assertIn('test_mp_seconds_bucket{le="0.1"} 1', text)
+        self.assertIn('test_mp_seconds_bucket{le="1.0"} 2', text)
+        self.assertIn("test_mp_seconds_sum 0.55", text)
+        self.assertIn("test_mp_seconds_count 2", text)
+        # без каталога — только свой процесс
+        self.assertIn('test_mp_total{result="hit"} 2', metrics.render())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,242 @@
+import os
+import sys
+
+# Корень репозитория в sys.path, чтобы импортировался пакет backend
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from backend.database.database import create_change_triggers, init_db, save_schedule
+from backend.notifier import check_changes, outbox
+from backend.notifier.diff import (
+    ADDED, MOVED, REMOVED, ROOM, TEACHER, diff_lessons, normalize, render_change,
+)
+from backend.notifier.fanout import render_digest
+from backend.notifier.subscriptions import subscribe
+from backend.notifier.telegram_bot import TelegramSender
+
+
+class FakeSender:
+    def __init__(self):
+        self.sent = []
+        self.fail_chats = set()
+        self.lock = threading.Lock()
+
+    def send(self, chat_id, text):
+        with self.lock:
+            self.sent.append((chat_id, text))
+        return {"ok": chat_id not in self.fail_chats}
+
+
+class CheckChangesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "notify.db")
+        open(self.db_path, "w").close()
+        self.conn = check_changes.connect(self.db_path)
+        self.conn.executemany("INSERT INTO groups (id, name, link) VALUES (?, ?, '')",
+                              [(1, "G1"), (2, "G2")])
+        for gid, room in ((1, "ГУК Б-416"), (2, "ГУК Б-417")):
+            save_schedule(self.conn, gid, 14, [{
+                "date": "Пн, 12 мая", "time": "09:00 – 10:30", "subject": f"S{gid}",
+                "teachers": ["Иванов И.И."], "rooms": [room],
+            }])
+        self.sender = FakeSender()
+        self.outbox = outbox.connect(self.db_path)
+
+    def tearDown(self):
+        self.outbox.close()
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def log_change(self, schedule_id, old="{}", new="{}"):
+        self.conn.execute(
+            "INSERT INTO changes_log (schedule_id, changed_at, old_data, new_data) "
+            "VALUES (?, '2025-05-12 10:00:00', ?, ?)", (schedule_id, old, new)
+        )
+        self.conn.commit()
+
+    def check(self, batch_size=10):
+        return check_changes.check_new_changes(
+            self.conn, batch_size=batch_size, all_changes_chat=""
+        )
+
+    def deliver(self):
+        return outbox.deliver_batch(self.outbox, self.sender)
+
+    def test_first_run_starts_from_end_of_log(self):
+        self.assertEqual(self.check(), 0)
+        self.assertEqual(self.sender.sent, [])
+        # записи триггеров о создании занятий в setUp — история до первого запуска
+        self.assertEqual(check_changes.last_seen_id(self.conn), 2)
+
+    def test_changes_coalesce_into_one_digest_per_chat(self):
+        subscribe(self.conn, 100, "group", "G1")
+        subscribe(self.conn, 200, "room", "ГУК Б-417")
+        subscribe(self.conn, 300, "teacher", "Иванов И.И.")
+        self.check()
+        self.conn.execute("UPDATE schedule SET rooms = '[\"ГУК Б-420\"]' WHERE id = 1")
+        self.conn.execute("UPDATE schedule SET teachers = '[\"Петров П.П.\"]' WHERE id = 2")
+        self.conn.commit()
+        save_schedule(self.conn, 1, 14, [{
+            "date": "Вт, 13 мая", "time": "10:45 – 12:15", "subject": "S3",
+            "teachers": ["Иванов И.И."], "rooms": ["ГУК Б-416"],
+        }])
+        self.assertEqual(self.check(), 3)
+        self.assertEqual(self.deliver(), {"sent": 3, "retry": 0, "dead": 0})
+
+        digests = dict(self.sender.sent)
+        self.assertEqual(sorted(digests), ["100", "200", "300"])
+        self.assertIn("<b>G1</b> · неделя 14", digests["100"])
+        self.assertIn("🚪 Пн, 12 мая 09:00 – 10:30 S1: ГУК Б-416 → ГУК Б-420", digests["100"])
+        self.assertIn("➕ Вт, 13 мая 10:45 – 12:15 S3 (ГУК Б-416)", digests["100"])
+        self.assertNotIn("G2", digests["100"])
+        self.assertIn("👤 Пн, 12 мая 09:00 – 10:30 S2: Иванов И.И. → Петров П.П.", digests["200"])
+        self.assertEqual(digests["300"].count("\n"), 5)  # заголовок, 2 группы, 3 изменения
+        self.assertEqual(self.check(), 0)
+        self.assertEqual(self.deliver()["sent"], 0)
+        self.assertEqual(len(self.sender.sent), 3)
+
+    def test_duplicate_reinsert_is_not_a_change(self):
+        subscribe(self.conn, 100, "group", "G1")
+        self.check()
+        # повторный парсинг той же недели дописывает те же занятия
+        save_schedule(self.conn, 1, 14, [{
+            "date": "Пн, 12 мая", "time": "09:00 – 10:30", "subject": "S1",
+            "teachers": ["Иванов И.И."], "rooms": ["ГУК Б-416"],
+        }])
+        self.assertEqual(self.check(), 1)
+        self.assertEqual(self.deliver()["sent"], 0)
+
+    def test_schedule_writes_are_captured_by_triggers(self):
+        subscribe(self.conn, 100, "room", "ГУК Б-418")
+        self.check()
+        self.conn.execute("UPDATE schedule SET rooms = '[\"ГУК Б-418\"]' WHERE id = 1")
+        self.conn.execute("UPDATE schedule SET date_iso = NULL WHERE id = 2")  # не изменение занятия
+        self.conn.execute("DELETE FROM schedule WHERE id = 2")
+        self.conn.commit()
+        rows = self.conn.execute(
+            "SELECT schedule_id, change_type, old_data IS NULL, new_data IS NULL "
+            "FROM changes_log WHERE id > 2 ORDER BY id"
+        ).fetchall()
+        self.assertEqual([tuple(r) for r in rows], [(1, "update", 0, 0), (2, "delete", 0, 1)])
+
+        self.assertEqual(self.check(), 2)
+        self.deliver()
+        self.assertEqual(len(self.sender.sent), 1)
+        self.assertIn("🚪 Пн, 12 мая 09:00 – 10:30 S1: ГУК Б-416 → ГУК Б-418", self.sender.sent[0][1])
+        self.assertNotIn("S2", self.sender.sent[0][1])
+
+    def test_creating_triggers_leaves_transaction_open(self):
+        conn = sqlite3.connect(":memory:")
+        init_db(conn)
+        conn.execute("DROP TRIGGER schedule_log_update")
+        conn.execute("INSERT INTO groups (name) VALUES ('X')")
+        create_change_triggers(conn)
+        self.assertTrue(conn.in_transaction)
+        conn.rollback()
+        self.assertEqual(conn.execute("SELECT count(*) FROM groups").fetchone(), (0,))
+        # триггер создавался в той же транзакции и откатился вместе с ней
+        self.assertEqual(conn.execute(
+            "SELECT count(*) FROM sqlite_master WHERE name = 'schedule_log_update'").fetchone(), (0,))
+        conn.close()
+
+    def test_failed_delivery_is_retried_later(self):
+        subscribe(self.conn, 100, "group", "G1")
+        subscribe(self.conn, 200, "group", "G1")
+        self.check()
+        self.log_change(1, old=None, new=None)
+        self.assertEqual(self.check(), 1)
+
+        self.sender.fail_chats.add("100")
+        self.assertEqual(self.deliver(), {"sent": 1, "retry": 1, "dead": 0})
+        self.assertEqual(outbox.outbox_stats(self.outbox)["queued"], 1)
+        # повтор ещё не наступил
+        self.sender.fail_chats.clear()
+        self.assertEqual(self.deliver()["sent"], 0)
+
+        self.outbox.execute("UPDATE outbox SET next_attempt_at = '2000-01-01'")
+        self.assertEqual(self.deliver(), {"sent": 1, "retry": 0, "dead": 0})
+        chats = [chat for chat, _ in self.sender.sent]
+        self.assertEqual((sorted(chats[:2]), chats[2]), (["100", "200"], "100"))
+        stats = outbox.outbox_stats(self.outbox)
+        self.assertEqual((stats["queued"], stats["sent"]), (0, 2))
+        # повторная отметка уже доставленного ничего не меняет
+        outbox.record_results(self.outbox, [(1, 0, {"ok": False})])
+        self.assertEqual(outbox.outbox_stats(self.outbox)["sent"], 2)
+
+    def test_retry_delay_honours_retry_after(self):
+        self.assertEqual(outbox.retry_delay(0), outbox.BASE_DELAY)
+        self.assertEqual(outbox.retry_delay(0, retry_after=30), 30)
+        self.assertEqual(outbox.retry_delay(20), outbox.MAX_DELAY)
+
+    def test_digest_fits_telegram_limit(self):
+        text = render_digest([f"• [UPDATE] Дисциплина {i}" for i in range(1000)])
+        self.assertLessEqual(len(text), 4096)
+        self.assertIn("… и ещё", text)
+
+
+def lesson(date, time, subject, teachers=("T",), rooms=("R",)):
+    return normalize({"date": date, "time": time, "subject": subject,
+                      "teachers": list(teachers), "rooms": list(rooms)})
+
+
+class DiffTest(unittest.TestCase):
+    def test_changes_are_classified(self):
+        old = [lesson("Пн", "09:00", "Физика"), lesson("Пн", "10:45", "Химия"),
+               lesson("Вт", "09:00", "История"), lesson("Ср", "09:00", "Право"),
+               lesson("Чт", "09:00", "Логика")]
+        new = [lesson("Пн", "09:00", "Физика", rooms=("R2",)),
+               lesson("Пн", "10:45", "Химия", teachers=("T2",)),
+               lesson("Пт", "13:00", "История"), lesson("Ср", "09:00", "Право"),
+               lesson("Сб", "09:00", "Экономика")]
+        changes = diff_lessons(old, new)
+        self.assertEqual(
+            sorted((c["type"], (c["new"] or c["old"])["subject"]) for c in changes),
+            [(ADDED, "Экономика"), (MOVED, "История"), (REMOVED, "Логика"),
+             (ROOM, "Физика"), (TEACHER, "Химия")]
+        )
+        moved = next(c for c in changes if c["type"] == MOVED)
+        self.assertEqual(render_change(moved), "🔁 История: Вт 09:00 → Пт 13:00 (R)")
+
+    def test_duplicates_and_order_do_not_matter(self):
+        a, b = lesson("Пн", "09:00", "Физика"), lesson("Пн", "10:45", "Химия")
+        self.assertEqual(diff_lessons([a, b], [b, a, a]), [])
+
+
+class TelegramSenderTest(unittest.TestCase):
+    def test_per_chat_interval_and_retry_after(self):
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        sender = TelegramSender(token="t", api_url="http://stand-in", rate=0,
+                                per_chat_interval=1.0, sleep=sleep, clock=lambda: now[0])
+        replies = iter([{"ok": False, "error_code": 429, "parameters": {"retry_after": 3}},
+                        {"ok": True}, {"ok": True}])
+
+        class Response:
+            def json(self):
+                return next(replies)
+
+        class Session:
+            def post(self, url, json, timeout):
+                return Response()
+
+        sender._sessions.get = lambda: Session()
+        self.assertTrue(sender.send(1, "a")["ok"])
+        self.assertTrue(sender.send(1, "b")["ok"])
+        # 429 -> пауза retry_after; повтор и второе сообщение — не чаще раза в секунду
+        self.assertEqual(sleeps, [3, 1.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
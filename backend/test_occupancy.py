@@ -0,0 +1,95 @@
+import os
+import sys
+
+# Корень репозитория в sys.path, чтобы импортировался пакет backend
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import sqlite3
+import unittest
+
+from backend.database.occupancy import (
+    FULL_MASK, SLOTS, load_grid, occupied_cube, free_slots, slot_mask,
+)
+
+
+def make_conn(rows):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE room_slots (
+            week INTEGER, day TEXT, room TEXT, mask INTEGER NOT NULL,
+            PRIMARY KEY (week, day, room)
+        )
+    """)
+    conn.executemany("INSERT INTO room_slots VALUES (?, ?, ?, ?)", rows)
+    return conn
+
+
+class SlotMaskTest(unittest.TestCase):
+    def test_exact_pair(self):
+        self.assertEqual(slot_mask(9 * 60, 10 * 60 + 30), 0b1)
+        self.assertEqual(slot_mask(20 * 60, 21 * 60 + 30), 1 << 6)
+
+    def test_overlaps_neighbours(self):
+        # 10:00–11:00 задевает первую и вторую пары
+        self.assertEqual(slot_mask(10 * 60, 11 * 60), 0b11)
+        self.assertEqual(slot_mask(0, 24 * 60), FULL_MASK)
+
+    def test_touching_bounds_and_breaks(self):
+        # конец ровно в начале пары и перерыв между парами пар не занимают
+        self.assertEqual(slot_mask(8 * 60, 9 * 60), 0)
+        self.assertEqual(slot_mask(10 * 60 + 30, 10 * 60 + 45), 0)
+        self.assertEqual(slot_mask(21 * 60 + 30, 22 * 60), 0)
+
+
+class GridTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = make_conn([
+            (14, "Вт, 13 мая", "ГУК Б-416", 0b0000101),
+            (14, "Ср, 14 мая", "ГУК Б-417", FULL_MASK),
+            (15, "Вт, 20 мая", "ГУК Б-416", 0b1000000),
+        ])
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_load_grid_all_rooms(self):
+        grid = load_grid(self.conn)
+        self.assertEqual(grid.rooms, ["ГУК Б-416", "ГУК Б-417"])
+        self.assertEqual(grid.days, [(14, "Вт, 13 мая"), (14, "Ср, 14 мая"), (15, "Вт, 20 мая")])
+        self.assertEqual(grid.masks.tolist(), [[0b101, 0, 0b1000000], [0, FULL_MASK, 0]])
+
+    def test_load_grid_filters(self):
+        grid = load_grid(self.conn, rooms=["ГУК Б-416", "ГУК Б-420"], week=14)
+        self.assertEqual(grid.days, [(14, "Вт, 13 мая"), (14, "Ср, 14 мая")])
+        # аудитория без пар остаётся в матрице полностью свободной
+        self.assertEqual(grid.masks.tolist(), [[0b101, 0], [0, 0]])
+
+    def test_occupied_cube(self):
+        cube = occupied_cube(load_grid(self.conn))
+        self.assertEqual(cube.shape, (2, 3, len(SLOTS)))
+        self.assertEqual(cube[0, 0].tolist(), [True, False, True, False, False, False, False])
+        self.assertTrue(cube[1, 1].all())
+        self.assertFalse(cube[1, 0].any())
+
+    def test_free_slots_order(self):
+        grid = load_grid(self.conn, rooms=["ГУК Б-416", "ГУК Б-417"], week=14)
+        free = free_slots(grid)
+        # 2 аудитории × 2 дня × 7 пар; 416 во вторник занята на 1-й и 3-й, 417 в среду — весь день
+        self.assertEqual(len(free), 2 * 2 * 7 - 2 - 7)
+        self.assertEqual(free[:3], [
+            (14, "Вт, 13 мая", "09:00", "10:30", "ГУК Б-417"),
+            (14, "Вт, 13 мая", "10:45", "12:15", "ГУК Б-416"),
+            (14, "Вт, 13 мая", "10:45", "12:15", "ГУК Б-417"),
+        ])
+        self.assertNotIn((14, "Ср, 14 мая", "09:00", "10:30", "ГУК Б-417"), free)
+        self.assertEqual(free[-1], (14, "Ср, 14 мая", "20:00", "21:30", "ГУК Б-416"))
+
+    def test_empty(self):
+        grid = load_grid(make_conn([]))
+        self.assertEqual((grid.rooms, grid.days, free_slots(grid)), ([], [], []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,30 +1,49 @@
 import os
 import sys
 
-# Вставляем папку "backend" в sys.path, чтобы Python увидел подпакеты api/ и database/
-HERE = os.path.dirname(__file__)
-if HERE not in sys.path:
-    sys.path.insert(0, HERE)
+# Корень репозитория в sys.path, чтобы импортировался пакет backend
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
 
 import unittest
+import sqlite3
 import datetime
+import json
+import tempfile
 
-# Импортируем нашу логику создания БД
-from database import create_tables, DB_PATH
-# Импортируем Flask-приложение из api.routes
-import api.routes as routes
+from backend.database import save_schedule
+from backend.api import profiling
+from backend.api.app import create_app
+from backend.api.migrations import SCHEMA_VERSION, migrate, schema_version
 
-# Заменяем реальные Google API на заглушки
-routes.sync_group_to_calendar = lambda group: None
-routes.sync_events_in_date_range = lambda start, end: None
+# Каждый запуск — на новой временной БД, схему готовит миграция фабрики
+TEST_DIR = tempfile.TemporaryDirectory()
+DB_PATH = os.path.join(TEST_DIR.name, 'test_routes.db')
+app = create_app({
+    'TESTING': True,
+    'DATABASE': DB_PATH,
+    'MIGRATE_ON_START': True,
+    # Задачи синхронизации только ставятся в очередь, к Google API никто не ходит
+    'JOB_WORKERS': 0,
+    'EVENT_LISTENER': False,
+})
 
-app = routes.app
-app.config['TESTING'] = True
 
-# Перед каждым запуском тестов удаляем старую БД, чтобы всё было с нуля
-if os.path.exists(DB_PATH):
-    os.remove(DB_PATH)
-create_tables()
+def tearDownModule():
+    TEST_DIR.cleanup()
+
+
+class AppFactoryTest(unittest.TestCase):
+    def test_requires_migrated_schema(self):
+        db = os.path.join(TEST_DIR.name, 'factory.db')
+        with self.assertRaises(RuntimeError):
+            create_app({'DATABASE': db, 'JOB_WORKERS': 0, 'EVENT_LISTENER': False})
+        self.assertTrue(migrate(db))
+        self.assertFalse(migrate(db))  # повторная миграция ничего не делает
+        self.assertEqual(schema_version(db), SCHEMA_VERSION)
+        factory_app = create_app({'DATABASE': db, 'JOB_WORKERS': 0, 'EVENT_LISTENER': False})
+        self.assertEqual(factory_app.test_client().get('/groups').get_json(), [])
 
 
 class RoutesTest(unittest.TestCase):
@@ -43,6 +62,14 @@ class RoutesTest(unittest.TestCase):
             return resp.get_json().get('access_token')
         return None
 
+    def delete_groups(self, *group_ids):
+        conn = sqlite3.connect(DB_PATH)
+        for gid in group_ids:
+            conn.execute("DELETE FROM schedule WHERE group_id = ?", (gid,))
+            conn.execute("DELETE FROM groups WHERE id = ?", (gid,))
+        conn.commit()
+        conn.close()
+
     def test_groups_empty(self):
         r = self.client.get('/groups')
         self.assertEqual(r.status_code, 200)
@@ -65,6 +92,188 @@ class RoutesTest(unittest.TestCase):
         self.assertEqual(r2.status_code, 200)
         self.assertIsInstance(r2.get_json(), list)
 
+    def test_free_rooms_from_grid(self):
+        conn = sqlite3.connect(DB_PATH)
+        conn.executemany("INSERT INTO room_slots (week, day, room, mask) VALUES (?, ?, ?, ?)", [
+            (90, 'Пн, 1 сен', 'ГУК Б-416', 0b1111110),  # свободна только первая пара
+            (90, 'Пн, 1 сен', 'ГАК-307', 0),            # не IT-аудитория
+        ])
+        conn.commit()
+        try:
+            r1 = self.client.get('/free_rooms?week=90')
+            self.assertEqual(r1.status_code, 200)
+            it = r1.get_json()
+            # 416 свободна на 1-й паре, остальные 14 IT-аудиторий — весь день
+            self.assertEqual(len(it), 1 + 14 * 7)
+            self.assertEqual(it[0], {'week': 90, 'day': 'Пн, 1 сен', 'start_time': '09:00',
+                                     'end_time': '10:30', 'room': 'ГУК Б-324'})
+            self.assertEqual([r['start_time'] for r in it if r['room'] == 'ГУК Б-416'], ['09:00'])
+            self.assertNotIn('ГАК-307', {r['room'] for r in it})
+
+            r2 = self.client.get('/free_rooms?week=90&all=1').get_json()
+            self.assertEqual([(r['room'], r['start_time']) for r in r2][:2],
+                             [('ГАК-307', '09:00'), ('ГУК Б-416', '09:00')])
+            self.assertEqual(len(r2), 7 + 1)
+        finally:
+            conn.execute("DELETE FROM room_slots WHERE week = 90")
+            conn.commit()
+            conn.close()
+
+    def test_rooms_find(self):
+        # без даты — 400
+        r0 = self.client.get('/rooms/find')
+        self.assertEqual(r0.status_code, 400)
+
+        conn = sqlite3.connect(DB_PATH)
+        gid = conn.execute("INSERT INTO groups (name) VALUES ('ROOMS-1')").lastrowid
+        save_schedule(conn, gid, 16, [
+            {'date': 'Чт, 29 мая 2025', 'time': time, 'subject': 'S', 'teachers': [], 'rooms': [room]}
+            for time, room in (('09:00 – 10:30', 'ГУК Б-416'),
+                               ('10:45 – 12:15', 'ГУК Б-417'),
+                               ('13:00 – 14:30', '--каф.'))
+        ])
+        try:
+            base = '/rooms/find?start_date=29.05.2025&duration=180&rooms=ГУК Б-416,ГУК Б-417'
+            r1 = self.client.get(base)
+            self.assertEqual(r1.status_code, 200)
+            first = r1.get_json()[0]
+            self.assertEqual(first['rooms'], ['ГУК Б-416'])
+            self.assertEqual((first['date'], first['start_time'], first['end_time']),
+                             ('2025-05-29', '10:30', '13:30'))
+
+            # две соседние аудитории одновременно
+            r2 = self.client.get(base + '&count=2')
+            self.assertEqual(r2.status_code, 200)
+            self.assertEqual(r2.get_json()[0]['rooms'], ['ГУК Б-416', 'ГУК Б-417'])
+            self.assertEqual(r2.get_json()[0]['start_time'], '12:15')
+
+            # окно длиннее свободного дня — пусто
+            r3 = self.client.get(base + '&earliest=09:00&latest=12:00')
+            self.assertEqual(r3.get_json(), [])
+
+            # перенос пары в другую аудиторию на месте (UPDATE) сразу виден поиску
+            conn.execute("UPDATE schedule SET rooms = '[\"ГУК Б-418\"]' "
+                         "WHERE group_id = ? AND rooms LIKE '%416%'", (gid,))
+            conn.commit()
+            r4 = self.client.get(base + '&earliest=09:00&latest=12:00')
+            self.assertEqual([(w['rooms'], w['start_time']) for w in r4.get_json()][:1],
+                             [(['ГУК Б-416'], '09:00')])
+        finally:
+            conn.execute("DELETE FROM schedule WHERE group_id = ?", (gid,))
+            conn.execute("DELETE FROM groups WHERE id = ?", (gid,))
+            conn.commit()
+            conn.close()
+
+    def test_rooms_utilization(self):
+        r1 = self.client.get('/rooms/utilization')
+        self.assertEqual(r1.status_code, 200)
+        self.assertIn('never_used', r1.get_json())
+        etag = r1.headers.get('ETag')
+        self.assertTrue(etag)
+        # данные не менялись — 304 без тела
+        r2 = self.client.get('/rooms/utilization', headers={'If-None-Match': etag})
+        self.assertEqual(r2.status_code, 304)
+
+        # корпус кириллицей: ETag всё равно кодируется в latin-1, как требует WSGI-сервер
+        r3 = self.client.get('/rooms/utilization?building=ГУК Б')
+        self.assertEqual(r3.status_code, 200)
+        r3.headers['ETag'].encode('latin-1')
+        self.assertNotEqual(r3.headers['ETag'], etag)
+        self.assertEqual(self.client.get('/rooms/utilization?building=ГУК Б',
+                                         headers={'If-None-Match': r3.headers['ETag']}).status_code, 304)
+
+    def test_ics_feeds(self):
+        conn = sqlite3.connect(DB_PATH)
+        g1 = conn.execute("INSERT INTO groups (name) VALUES ('ICS-1')").lastrowid
+        g2 = conn.execute("INSERT INTO groups (name) VALUES ('ICS-2')").lastrowid
+        for gid in (g1, g2):
+            save_schedule(conn, gid, 16, [{
+                'date': 'Чт, 29 мая 2025', 'time': '09:00 – 10:30', 'subject': 'Физика, лекция',
+                'teachers': ['Иванов И.И.'], 'rooms': ['ГУК Б-416'],
+            }])
+        conn.commit()
+        conn.close()
+        self.addCleanup(self.delete_groups, g1, g2)
+
+        r = self.client.get('/calendar/ICS-1.ics')
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r.content_type.startswith('text/calendar'))
+        body = r.get_data(as_text=True)
+        self.assertIn('DTSTART;TZID=Europe/Moscow:20250529T090000\r\n', body)
+        self.assertIn('DTEND;TZID=Europe/Moscow:20250529T103000\r\n', body)
+        self.assertIn('SUMMARY:Физика\\, лекция', body)
+        self.assertIsNotNone(r.headers.get('ETag'))
+        self.assertIsNotNone(r.headers.get('Last-Modified'))
+
+        r304 = self.client.get('/calendar/ICS-1.ics',
+                               headers={'If-None-Match': r.headers['ETag']})
+        self.assertEqual(r304.status_code, 304)
+
+        # занятие двух групп — одно событие в ленте преподавателя с тем же UID
+        teacher = self.client.get('/calendar/teacher/Иванов И.И..ics').get_data(as_text=True)
+        self.assertEqual(teacher.count('BEGIN:VEVENT'), 1)
+        self.assertIn('ICS-1\\, ICS-2', teacher)
+        uid = [l for l in body.split('\r\n') if l.startswith('UID:')][0]
+        self.assertIn(uid, teacher)
+        self.assertEqual(self.client.get('/calendar/room/ГУК Б-416.ics').status_code, 200)
+        self.assertEqual(self.client.get('/calendar/NOPE.ics').status_code, 404)
+
+        # перенос пары в другую аудиторию на месте (UPDATE) меняет ленту и её ETag
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute("UPDATE schedule SET rooms = '[\"ГУК Б-418\"]' WHERE group_id = ?", (g1,))
+        conn.commit()
+        conn.close()
+        moved = self.client.get('/calendar/ICS-1.ics', headers={'If-None-Match': r.headers['ETag']})
+        self.assertEqual(moved.status_code, 200)
+        self.assertIn('LOCATION:ГУК Б-418', moved.get_data(as_text=True))
+        self.assertNotEqual(moved.headers['ETag'], r.headers['ETag'])
+
+    def test_notifier_outbox_stats(self):
+        resp = self.client.get('/notifier/outbox')
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('queued', resp.get_json())
+        self.assertIn('latency_p95_s', resp.get_json())
+
+    def test_metrics(self):
+        self.client.get('/groups')
+        self.client.get('/calendar/NOPE.ics')
+        resp = self.client.get('/metrics')
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.content_type.startswith('text/plain'))
+        text = resp.get_data(as_text=True)
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/groups",status="200"}', text)
+        self.assertIn('route="/calendar/<group>.ics",status="404"', text)
+        self.assertIn('sqlite_query_duration_seconds_count{statement="SELECT groups"}', text)
+        self.assertIn('cache_requests_total{cache="ics",result="miss"}', text)
+
+    def test_profiling_mode(self):
+        saved = {name: getattr(profiling, name) for name in (
+            'ENABLED', 'SAMPLE_RATE', 'SLOW_REQUEST_MS', 'PROFILE_DIR', 'SLOW_QUERY_MS', 'SLOW_QUERY_LOG')}
+        with tempfile.TemporaryDirectory() as tmp:
+            profiling.ENABLED, profiling.SAMPLE_RATE, profiling.SLOW_REQUEST_MS = True, 1.0, 0
+            profiling.PROFILE_DIR = os.path.join(tmp, 'profiles')
+            profiling.SLOW_QUERY_MS = 1e-6
+            profiling.SLOW_QUERY_LOG = os.path.join(tmp, 'slow.jsonl')
+            try:
+                resp = self.client.get('/schedule?group=FOO&week=1')
+            finally:
+                for name, value in saved.items():
+                    setattr(profiling, name, value)
+            self.assertEqual(resp.status_code, 200)
+            timing = resp.headers['Server-Timing']
+            for name in ('connect', 'query', 'decode', 'serialize', 'total'):
+                self.assertIn(f'{name};dur=', timing)
+            dumps = os.listdir(os.path.join(tmp, 'profiles'))
+            self.assertEqual(len(dumps), 1)
+            self.assertTrue(dumps[0].endswith('.prof'))
+            with open(os.path.join(tmp, 'slow.jsonl'), encoding='utf-8') as f:
+                entry = json.loads(f.readline())
+            self.assertEqual(entry['params'], ['str', 'str'])
+            self.assertTrue(entry['sql'].startswith('SELECT s.id'))
+            self.assertTrue(entry['plan'])
+        # без API_PROFILE заголовка нет
+        self.assertNotIn('Server-Timing', self.client.get('/groups').headers)
+
     def test_schedule_post_auth(self):
         # без токена — 401
         r0 = self.client.post('/schedule', json={})
@@ -85,20 +294,36 @@ class RoutesTest(unittest.TestCase):
         )
         self.assertEqual(r1.status_code, 403)
 
-        # преподаватель — 201
+        # преподаватель, несуществующая группа — 404
         self.register('t@x.com','pw','teacher')
         tok = self.login('t@x.com','pw')
-        r2 = self.client.post(
-            '/schedule',
-            headers={'Authorization': f'Bearer {tok}'},
-            json={
-                'group_name':'G1','week':2,'day':'Вт, 10.06.2025',
-                'start_time':'10:00','end_time':'11:30',
-                'subject':'Math','teacher':'Dr','room':'R2',
-                'event_type':'разовое','recurrence_pattern':''
-            }
-        )
-        self.assertEqual(r2.status_code, 201)
+        lesson = {
+            'group_name':'POST-1','week':2,'date':'Вт, 10.06.2025',
+            'time':'10:00 – 11:30','subject':'Math',
+            'teachers':['Dr'],'rooms':['R2']
+        }
+        r2 = self.client.post('/schedule', headers={'Authorization': f'Bearer {tok}'}, json=lesson)
+        self.assertEqual(r2.status_code, 404)
+
+        # преподаватель — 201, занятие видно в расписании группы
+        conn = sqlite3.connect(DB_PATH)
+        gid = conn.execute("INSERT INTO groups (name) VALUES ('POST-1')").lastrowid
+        conn.commit()
+        try:
+            r3 = self.client.post('/schedule', headers={'Authorization': f'Bearer {tok}'}, json=lesson)
+            self.assertEqual(r3.status_code, 201)
+            rows = self.client.get('/schedule?group=POST-1&week=2').get_json()
+            self.assertEqual([(r['date'], r['time'], r['rooms'], r['is_custom']) for r in rows],
+                             [('Вт, 10.06.2025', '10:00 – 11:30', ['R2'], True)])
+            self.assertEqual(
+                conn.execute("SELECT date_iso, start_min, end_min FROM schedule WHERE group_id = ?",
+                             (gid,)).fetchone(),
+                ('2025-06-10', 600, 690))
+        finally:
+            conn.execute("DELETE FROM schedule WHERE group_id = ?", (gid,))
+            conn.execute("DELETE FROM groups WHERE id = ?", (gid,))
+            conn.commit()
+            conn.close()
 
     def test_calendar_sync(self):
         # /calendar/sync_group без токена — 401
@@ -113,7 +338,22 @@ class RoutesTest(unittest.TestCase):
             headers={'Authorization': f'Bearer {tok}'},
             json={'group':'G1'}
         )
-        self.assertEqual(r1.status_code, 200)
+        self.assertEqual(r1.status_code, 202)
+        job_id = r1.get_json()['job_id']
+
+        # повторный запрос по той же группе склеивается с ожидающей задачей
+        r1b = self.client.post(
+            '/calendar/sync_group',
+            headers={'Authorization': f'Bearer {tok}'},
+            json={'group':'G1'}
+        )
+        self.assertEqual(r1b.get_json()['job_id'], job_id)
+        self.assertTrue(r1b.get_json()['coalesced'])
+
+        job = self.client.get(f'/jobs/{job_id}')
+        self.assertEqual(job.status_code, 200)
+        self.assertEqual(job.get_json()['status'], 'queued')
+        self.assertEqual(self.client.get('/jobs/999999').status_code, 404)
 
         # /calendar/sync_range без дат — 400
         r2 = self.client.post(
@@ -123,14 +363,14 @@ class RoutesTest(unittest.TestCase):
         )
         self.assertEqual(r2.status_code, 400)
 
-        # с валидными датами — 200
+        # с валидными датами — 202, задача поставлена в очередь
         today = datetime.date.today().strftime('%d.%m.%Y')
         r3 = self.client.post(
             '/calendar/sync_range',
             headers={'Authorization': f'Bearer {tok}'},
             json={'start_date': today, 'end_date': today}
         )
-        self.assertEqual(r3.status_code, 200)
+        self.assertEqual(r3.status_code, 202)
 
 
 if __name__ == '__main__':
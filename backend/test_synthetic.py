@@ -0,0 +1,60 @@
+import os
+import sys
+
+# Корень репозитория в sys.path, чтобы импортировался пакет backend
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import sqlite3
+import tempfile
+import unittest
+
+from backend.benchmarks.load_test import percentile, summarize
+from backend.benchmarks.synthetic import MAX_TEACHER_LOAD, generate_university
+
+
+class UniversityGeneratorTest(unittest.TestCase):
+    def test_timetable_has_no_conflicts(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "university.db")
+            stats = generate_university(db_path, groups=60, weeks=3, seed=1)
+            conn = sqlite3.connect(db_path)
+            try:
+                self.assertEqual(stats["groups"], conn.execute("SELECT count(DISTINCT name) FROM groups").fetchone()[0])
+                self.assertEqual(stats["lessons"], conn.execute("SELECT count(*) FROM schedule").fetchone()[0])
+                # аудитория в одном слоте — одно занятие (лекцию потока слушают несколько групп)
+                clashes = conn.execute("""
+                    SELECT count(*) FROM (
+                        SELECT rooms, date_iso, start_min FROM schedule
+                        GROUP BY rooms, date_iso, start_min
+                        HAVING count(DISTINCT subject || teachers) > 1)
+                """).fetchone()[0]
+                self.assertEqual(clashes, 0)
+                busiest = conn.execute("""
+                    SELECT max(n) FROM (SELECT count(DISTINCT date_iso || start_min) n
+                                        FROM schedule WHERE week = 1 GROUP BY teachers)
+                """).fetchone()[0]
+                self.assertLessEqual(busiest, MAX_TEACHER_LOAD)
+                # загрузка не считается изменениями, а триггеры после неё на месте
+                self.assertEqual(conn.execute("SELECT count(*) FROM changes_log").fetchone()[0], 0)
+                conn.execute("DELETE FROM schedule WHERE id = 1")
+                self.assertEqual(conn.execute("SELECT count(*) FROM changes_log").fetchone()[0], 1)
+            finally:
+                conn.close()
+
+
+class LoadReportTest(unittest.TestCase):
+    def test_percentiles_and_summary(self):
+        values = [i / 1000 for i in range(1, 101)]
+        self.assertEqual((percentile(values, 50), percentile(values, 99)), (0.05, 0.099))
+        self.assertIsNone(percentile([], 50))
+        report = summarize([("groups", 200, 0.01), ("groups", 500, 0.02), ("schedule", 0, 1.0)], 2.0)
+        self.assertEqual(report["total"]["requests"], 3)
+        self.assertEqual(report["total"]["errors"], 2)
+        self.assertEqual(report["endpoints"]["groups"]["p99_ms"], 20.0)
+        self.assertEqual(report["endpoints"]["schedule"]["rps"], 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
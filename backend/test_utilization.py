@@ -0,0 +1,99 @@
+import os
+import sys
+
+# Корень репозитория в sys.path, чтобы импортировался пакет backend
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import sqlite3
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from backend.database import utilization
+from backend.database.occupancy import OccupancyGrid
+from backend.database.utilization import compute_utilization
+
+
+class ComputeUtilizationTest(unittest.TestCase):
+    def setUp(self):
+        # 3 аудитории × 2 дня × 7 пар = 42 слота, занято 4
+        self.report = compute_utilization(OccupancyGrid(
+            rooms=["ГАК-307", "ГУК Б-416", "ГУК Б-417"],
+            days=[(14, "Пн, 12 мая"), (14, "Вт, 13 мая")],
+            masks=np.array([[0, 0], [0b11, 0b01], [0b01, 0]], dtype=np.uint8),
+        ))
+
+    def test_totals(self):
+        self.assertEqual((self.report["rooms_total"], self.report["days_total"]), (3, 2))
+        self.assertEqual(self.report["overall"], round(4 / 42, 4))
+        self.assertEqual(self.report["never_used"], ["ГАК-307"])
+
+    def test_rooms_sorted_by_share(self):
+        self.assertEqual(self.report["rooms"], [
+            {"room": "ГУК Б-416", "booked": 3, "share": round(3 / 14, 4)},
+            {"room": "ГУК Б-417", "booked": 1, "share": round(1 / 14, 4)},
+            {"room": "ГАК-307", "booked": 0, "share": 0.0},
+        ])
+
+    def test_buildings(self):
+        self.assertEqual(self.report["buildings"], [
+            {"building": "ГАК", "rooms": 1, "share": 0.0},
+            {"building": "ГУК Б", "rooms": 2, "share": round(4 / 28, 4)},
+        ])
+
+    def test_weeks_weekdays_and_slots(self):
+        self.assertEqual(self.report["by_week"], [{"week": 14, "days": 2, "share": round(4 / 42, 4)}])
+        self.assertEqual(self.report["by_weekday"], [
+            {"weekday": "Пн", "days": 1, "share": round(3 / 21, 4)},
+            {"weekday": "Вт", "days": 1, "share": round(1 / 21, 4)},
+        ])
+        shares = [s["share"] for s in self.report["by_slot"]]
+        self.assertEqual(shares, [0.5, round(1 / 6, 4), 0.0, 0.0, 0.0, 0.0, 0.0])
+
+    def test_peak_hours(self):
+        self.assertEqual(
+            [(p["weekday"], p["start_time"], p["share"]) for p in self.report["peak"]],
+            [("Пн", "09:00", round(2 / 3, 4)), ("Пн", "10:45", round(1 / 3, 4)),
+             ("Вт", "09:00", round(1 / 3, 4))]
+        )
+
+    def test_unknown_weekday_is_skipped(self):
+        report = compute_utilization(OccupancyGrid(
+            rooms=["ГУК Б-416"],
+            days=[(14, "Пн, 12 мая"), (14, "12 мая")],
+            masks=np.array([[0b01, 0b11]], dtype=np.uint8),
+        ))
+        # день без «Пн, …» не засчитывается воскресенью, но остаётся в общих долях
+        self.assertEqual(report["by_weekday"], [{"weekday": "Пн", "days": 1, "share": round(1 / 7, 4)}])
+        self.assertEqual([p["weekday"] for p in report["peak"]], ["Пн"])
+        self.assertEqual(report["overall"], round(3 / 14, 4))
+
+    def test_empty_grid(self):
+        report = compute_utilization(OccupancyGrid(["ГУК Б-416"], [], np.zeros((1, 0), dtype=np.uint8)))
+        self.assertEqual((report["overall"], report["rooms"], report["never_used"]), (0.0, [], []))
+
+
+class UtilizationCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute("CREATE TABLE room_slots (week INTEGER, day TEXT, room TEXT, mask INTEGER)")
+        self.conn.execute("INSERT INTO room_slots VALUES (14, 'Пн, 12 мая', 'ГУК Б-416', 1)")
+        patcher = mock.patch.object(utilization, "_cache", utilization.OrderedDict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.conn.close)
+
+    def test_cache_is_bounded(self):
+        with mock.patch.object(utilization, "CACHE_SIZE", 2):
+            for building in ("ГУК Б", "x", "y", "ГУК Б"):
+                utilization.get_utilization(self.conn, week=14, building=building)
+        # перебор building из запроса не растит кеш дальше предела
+        self.assertEqual(list(utilization._cache), [(14, "y"), (14, "ГУК Б")])
+
+
+if __name__ == "__main__":
+    unittest.main()
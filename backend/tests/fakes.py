@@ -0,0 +1,154 @@
+"""
+Локальная подделка сервиса Google Calendar API v3 для тестов и бенчмарков.
+Повторяет ту часть интерфейса googleapiclient, которой пользуется backend.api:
+service.events().insert/update/delete/list(...).execute() и пакетные запросы
+service.new_batch_http_request(callback=...).
+"""
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+
+class FakeHttpError(Exception):
+    """Аналог googleapiclient.errors.HttpError: код ответа в .resp.status."""
+
+    def __init__(self, status: int, reason: str = ""):
+        super().__init__(f"HTTP {status} {reason}".strip())
+        self.resp = SimpleNamespace(status=status)
+        self.status_code = status
+
+
+class FakeRequest:
+    def __init__(self, service, fn):
+        self._service = service
+        self._fn = fn
+
+    def execute(self):
+        self._service._http()
+        return self._fn()
+
+
+class FakeBatch:
+    """Аналог BatchHttpRequest: все операции уходят одним HTTP-вызовом."""
+
+    MAX_SIZE = 50
+
+    def __init__(self, service, callback=None):
+        self._service = service
+        self._callback = callback
+        self._ops = []
+
+    def add(self, request, callback=None, request_id=None):
+        if len(self._ops) >= self.MAX_SIZE:
+            raise ValueError(f"В пакете не больше {self.MAX_SIZE} запросов")
+        request_id = request_id or str(len(self._ops) + 1)
+        self._ops.append((request, callback or self._callback, request_id))
+
+    def execute(self):
+        self._service._http()
+        self._service.batches += 1
+        for request, callback, request_id in self._ops:
+            try:
+                response, exception = request._fn(), None
+            except FakeHttpError as e:
+                response, exception = None, e
+            if callback:
+                callback(request_id, response, exception)
+
+
+class FakeEvents:
+    def __init__(self, service):
+        self._service = service
+
+    def insert(self, calendarId, body):
+        return FakeRequest(self._service, lambda: self._service._insert(calendarId, body))
+
+    def update(self, calendarId, eventId, body):
+        return FakeRequest(self._service, lambda: self._service._update(calendarId, eventId, body))
+
+    def delete(self, calendarId, eventId):
+        return FakeRequest(self._service, lambda: self._service._delete(calendarId, eventId))
+
+    def list(self, calendarId, pageToken=None, **kwargs):
+        return FakeRequest(self._service, lambda: self._service._list(calendarId, pageToken))
+
+
+class FakeCalendarService:
+    """
+    Хранит события в памяти: events_store[calendar_id][event_id] = body.
+    latency — искусственная задержка каждого HTTP-вызова в секундах,
+    calls — счётчик HTTP-вызовов (пакет считается одним), batches — из них пакетных.
+    inject_errors(429, 503, ...) — следующие операции завершатся этими кодами.
+    """
+
+    def __init__(self, latency: float = 0.0, page_size: int = 250):
+        self.latency = latency
+        self.page_size = page_size
+        self.events_store = {}
+        self.calls = 0
+        self.batches = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._errors = []
+
+    def events(self):
+        return FakeEvents(self)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+    def inject_errors(self, *statuses):
+        with self._lock:
+            self._errors.extend(statuses)
+
+    def _maybe_fail(self):
+        with self._lock:
+            status = self._errors.pop(0) if self._errors else None
+        if status:
+            raise FakeHttpError(status, "injected")
+
+    def _http(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _calendar(self, calendar_id):
+        return self.events_store.setdefault(calendar_id, {})
+
+    def _insert(self, calendar_id, body):
+        self._maybe_fail()
+        with self._lock:
+            event_id = body.get("id") or f"evt{next(self._ids)}"
+            if event_id in self._calendar(calendar_id):
+                raise FakeHttpError(409, "duplicate")
+            event = dict(body, id=event_id)
+            self._calendar(calendar_id)[event_id] = event
+        return event
+
+    def _update(self, calendar_id, event_id, body):
+        self._maybe_fail()
+        with self._lock:
+            if event_id not in self._calendar(calendar_id):
+                raise FakeHttpError(404, "notFound")
+            event = dict(body, id=event_id)
+            self._calendar(calendar_id)[event_id] = event
+        return event
+
+    def _delete(self, calendar_id, event_id):
+        self._maybe_fail()
+        with self._lock:
+            if self._calendar(calendar_id).pop(event_id, None) is None:
+                raise FakeHttpError(410, "deleted")
+        return ""
+
+    def _list(self, calendar_id, page_token):
+        with self._lock:
+            items = sorted(self._calendar(calendar_id).values(), key=lambda e: e["id"])
+        start = int(page_token or 0)
+        page = items[start:start + self.page_size]
+        resp = {"items": page}
+        if start + self.page_size < len(items):
+            resp["nextPageToken"] = str(start + self.page_size)
+        return resp